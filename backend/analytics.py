@@ -0,0 +1,214 @@
+"""
+Spend analytics for GroziOne backend
+Loads a user's grocery items into a pandas DataFrame with a single query and
+answers dashboard aggregates (spend per period and store, rolling averages,
+top items) with vectorized operations on a cached, version-stamped frame
+"""
+
+import asyncio
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cache import TTLCache
+
+ANALYTICS_CACHE_USERS = int(os.getenv("ANALYTICS_CACHE_USERS", "256"))
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "600"))
+
+# Analytics period -> (pandas period frequency, date_range frequency of its start dates)
+PERIODS = {
+    "week": ("W-SUN", "W-MON"),
+    "month": ("M", "MS")
+}
+TOP_ITEM_SORTS = ("spend", "purchases")
+
+
+def build_frame(columns: Dict[str, list]) -> pd.DataFrame:
+    """Typed DataFrame of a user's items, oldest first; rows with unreadable dates are dropped"""
+    frame = pd.DataFrame({
+        "date": pd.to_datetime(pd.Series(columns["date"], dtype="object"), errors="coerce", format="ISO8601"),
+        "store": pd.Categorical(columns["store"]),
+        "product_key": pd.Categorical(columns["product_key"]),
+        "product_name": pd.Series(columns["product_name"], dtype="object"),
+        "price": np.array(columns["price"], dtype=np.float64),
+        "amount": np.array(columns["amount"], dtype=np.float64),
+        "unit": pd.Categorical(columns["unit"]),
+        "unit_price": np.array(columns["unit_price"], dtype=np.float64),
+    })
+    return frame.dropna(subset=["date"]).sort_values("date", kind="stable").reset_index(drop=True)
+
+
+def period_starts(dates: pd.Series, period: str) -> pd.Series:
+    """Start date of the week (Monday) or month each date falls in"""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}. Supported: {', '.join(PERIODS)}")
+    return dates.dt.to_period(PERIODS[period][0]).dt.start_time.rename("period")
+
+
+def filter_dates(frame: pd.DataFrame, date_from: Optional[str] = None, date_to: Optional[str] = None) -> pd.DataFrame:
+    """Rows dated within [date_from, date_to]"""
+    mask = np.ones(len(frame), dtype=bool)
+    if date_from:
+        mask &= (frame["date"] >= pd.Timestamp(date_from)).to_numpy()
+    if date_to:
+        mask &= (frame["date"] <= pd.Timestamp(date_to)).to_numpy()
+    return frame[mask]
+
+
+def spend_by_period(frame: pd.DataFrame, period: str = "month", by_store: bool = False,
+                    date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict]:
+    """Total spend and item count per period, optionally split by store"""
+    frame = filter_dates(frame, date_from, date_to)
+    keys = [period_starts(frame["date"], period)] + ([frame["store"]] if by_store else [])
+    grouped = frame.groupby(keys, observed=True)["price"].agg(["sum", "count"]).reset_index()
+
+    records = {
+        "period": grouped["period"].dt.strftime("%Y-%m-%d").tolist(),
+        "total": grouped["sum"].round(2).tolist(),
+        "items": grouped["count"].tolist()
+    }
+    if by_store:
+        records["store"] = grouped["store"].astype(str).tolist()
+    return [dict(zip(records, values)) for values in zip(*records.values())]
+
+
+def rolling_spend(frame: pd.DataFrame, period: str = "week", window: int = 4) -> List[Dict]:
+    """Spend per period with its rolling mean over ``window`` periods; empty periods count as zero"""
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    totals = frame.groupby(period_starts(frame["date"], period))["price"].sum()
+    if totals.empty:
+        return []
+
+    totals = totals.reindex(
+        pd.date_range(totals.index.min(), totals.index.max(), freq=PERIODS[period][1]),
+        fill_value=0.0
+    )
+    averages = totals.rolling(window, min_periods=1).mean()
+    return [
+        {"period": start, "total": total, "rollingAverage": average}
+        for start, total, average in zip(
+            totals.index.strftime("%Y-%m-%d"), totals.round(2).tolist(), averages.round(2).tolist()
+        )
+    ]
+
+
+def top_items(frame: pd.DataFrame, limit: int = 10, sort: str = "spend",
+              date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict]:
+    """Products with the highest spend or most purchases"""
+    if sort not in TOP_ITEM_SORTS:
+        raise ValueError(f"Unknown sort: {sort}. Supported: {', '.join(TOP_ITEM_SORTS)}")
+    frame = filter_dates(frame, date_from, date_to)
+    grouped = frame.groupby("product_key", observed=True).agg(
+        name=("product_name", "last"),
+        spend=("price", "sum"),
+        purchases=("price", "size"),
+        stores=("store", "nunique"),
+        unit=("unit", "last"),
+        avg_unit_price=("unit_price", "mean"),
+        last_bought=("date", "max")
+    )
+    tie_break = "purchases" if sort == "spend" else "spend"
+    top = grouped.sort_values([sort, tie_break], ascending=False, kind="stable").head(limit)
+
+    return [
+        {
+            "productId": key,
+            "name": row.name,
+            "spend": round(row.spend, 2),
+            "purchases": int(row.purchases),
+            "stores": int(row.stores),
+            "unit": row.unit,
+            "avgUnitPrice": round(row.avg_unit_price, 4) if not np.isnan(row.avg_unit_price) else None,
+            "lastBought": row.last_bought.strftime("%Y-%m-%d")
+        }
+        for key, row in zip(top.index, top.itertuples(index=False))
+    ]
+
+
+def spend_summary(frame: pd.DataFrame) -> Dict:
+    """Overall totals and averages"""
+    if frame.empty:
+        return {
+            "totalSpent": 0.0, "items": 0, "stores": 0, "products": 0,
+            "firstDate": None, "lastDate": None, "averagePerWeek": 0.0, "averageItemPrice": 0.0
+        }
+    total = float(frame["price"].sum())
+    first, last = frame["date"].iloc[0], frame["date"].iloc[-1]
+    weeks = (last - first).days // 7 + 1
+    return {
+        "totalSpent": round(total, 2),
+        "items": len(frame),
+        "stores": int(frame["store"].nunique()),
+        "products": int(frame["product_key"].nunique()),
+        "firstDate": first.strftime("%Y-%m-%d"),
+        "lastDate": last.strftime("%Y-%m-%d"),
+        "averagePerWeek": round(total / weeks, 2),
+        "averageItemPrice": round(total / len(frame), 2)
+    }
+
+
+class SpendAnalytics:
+    """Per-user spend aggregates over cached pandas frames.
+
+    A user's items are loaded with one query into a frame cached under the
+    user's data version. Writes to the user's items bump that version
+    through the database invalidation hook, so a frame is never served
+    after the data behind it changed; frames of idle users age out of the
+    LRU. Aggregation runs in a worker thread to keep the event loop free.
+    """
+
+    def __init__(self, db, maxsize: int = ANALYTICS_CACHE_USERS, ttl: float = ANALYTICS_CACHE_TTL):
+        self.db = db
+        self.cache = TTLCache("analytics_frames", maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._versions: Dict[int, int] = {}
+
+    def _cache_key(self, user_id: int) -> tuple:
+        with self._lock:
+            return user_id, self._versions.get(user_id, 0)
+
+    def invalidate(self, table: str, user_id: Optional[int]):
+        """Database invalidation hook: retire the frame of the user written to
+
+        Only writes to that user's items, or the user being changed or
+        deleted, matter; user creation (no user id) leaves every frame alone.
+        """
+        if table not in ("grocery_items", "users") or user_id is None:
+            return
+        stale_key = self._cache_key(user_id)
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self.cache.invalidate(stale_key)
+
+    async def frame(self, user_id: int) -> pd.DataFrame:
+        """The user's items as a DataFrame, loaded on first use after each write"""
+        async def load():
+            columns = await self.db.get_grocery_item_columns(user_id)
+            return await asyncio.to_thread(build_frame, columns)
+
+        return await self.cache.get_or_compute(self._cache_key(user_id), load)
+
+    async def spend(self, user_id: int, period: str = "month", by_store: bool = False,
+                    date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict]:
+        frame = await self.frame(user_id)
+        return await asyncio.to_thread(spend_by_period, frame, period, by_store, date_from, date_to)
+
+    async def rolling(self, user_id: int, period: str = "week", window: int = 4) -> List[Dict]:
+        frame = await self.frame(user_id)
+        return await asyncio.to_thread(rolling_spend, frame, period, window)
+
+    async def top_items(self, user_id: int, limit: int = 10, sort: str = "spend",
+                        date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict]:
+        frame = await self.frame(user_id)
+        return await asyncio.to_thread(top_items, frame, limit, sort, date_from, date_to)
+
+    async def summary(self, user_id: int) -> Dict:
+        frame = await self.frame(user_id)
+        return await asyncio.to_thread(spend_summary, frame)
+
+
+__all__ = ["SpendAnalytics", "build_frame", "rolling_spend", "spend_by_period", "spend_summary", "top_items"]
@@ -0,0 +1,125 @@
+"""
+JWT handling for GroziOne backend
+Issues access and refresh tokens, caches the claims of verified tokens in an
+LRU that expires with each token, and rejects tokens issued to a user
+before that user's revocation cut-off or belonging to a revoked session
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+import jwt
+
+from cache import TTLCache
+
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
+
+class TokenRevokedError(jwt.InvalidTokenError):
+    """Raised for a validly signed token that was revoked with its user or session"""
+
+
+class RevocationIndex:
+    """Per-user token revocation cut-offs.
+
+    Revoking a user's tokens records the current time; every token whose
+    ``iat`` is earlier is rejected from then on, whenever it expires. That
+    keeps one float per user instead of a list of token ids, and lets the
+    user sign in again straight away.
+
+    Single sessions (one login and its refreshes, the ``sid`` claim) are
+    revoked by id and remembered until ``expires_at``, after which none of
+    their tokens would be accepted anyway. Both kinds of entry are persisted
+    by the database and loaded back at startup.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[int, float]] = (),
+                 sessions: Iterable[Tuple[str, float]] = ()):
+        self._lock = threading.Lock()
+        self._revoked_before: Dict[int, float] = dict(entries)
+        self._revoked_sessions: Dict[str, float] = dict(sessions)
+
+    def revoke(self, user_id: int, before: float):
+        with self._lock:
+            self._revoked_before[user_id] = max(before, self._revoked_before.get(user_id, 0.0))
+
+    def revoke_session(self, session_id: str, expires_at: float):
+        now = time.time()
+        with self._lock:
+            self._revoked_sessions[session_id] = expires_at
+            for expired in [sid for sid, until in self._revoked_sessions.items() if until < now]:
+                del self._revoked_sessions[expired]
+
+    def is_revoked(self, user_id: Optional[int], issued_at: Optional[float],
+                   session_id: Optional[str] = None) -> bool:
+        if session_id is not None and session_id in self._revoked_sessions:
+            return True
+        cutoff = self._revoked_before.get(user_id)
+        # Tokens without an iat predate revocation support
+        return cutoff is not None and (issued_at or 0.0) < cutoff
+
+    def __len__(self) -> int:
+        return len(self._revoked_before)
+
+    @property
+    def revoked_sessions(self) -> int:
+        return len(self._revoked_sessions)
+
+
+class TokenVerifier:
+    """Issues and verifies signed access and refresh tokens.
+
+    Verified claims are cached under the SHA-256 digest of the token (never
+    the token itself) until the token's ``exp``, so repeat requests skip
+    signature checking. Revocation is checked on every call, cached or not.
+    """
+
+    def __init__(self, secret: str, algorithm: str, revocations: RevocationIndex,
+                 cache_size: int = JWT_CACHE_SIZE):
+        self.secret = secret
+        self.algorithm = algorithm
+        self.revocations = revocations
+        self.cache = TTLCache("jwt_claims", maxsize=cache_size, ttl=300)
+
+    def issue(self, claims: Dict, expires_delta: timedelta, token_type: str = ACCESS_TOKEN) -> str:
+        now = time.time()
+        payload = dict(claims)
+        payload.update({
+            # Kept fractional so a token issued just after a revocation is not caught by it
+            "iat": now,
+            "exp": int(now + expires_delta.total_seconds()),
+            "type": token_type
+        })
+        return jwt.encode(payload, self.secret, algorithm=self.algorithm)
+
+    def verify(self, token: str, token_type: str = ACCESS_TOKEN) -> Dict:
+        """Claims of a valid, unrevoked token of ``token_type``; raises jwt.PyJWTError otherwise"""
+        digest = hashlib.sha256(token.encode()).digest()
+        claims = self.cache.get(digest)
+        if claims is None:
+            claims = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+            ttl = claims["exp"] - time.time() if "exp" in claims else self.cache.ttl
+            if ttl > 0:
+                self.cache.set(digest, claims, ttl=ttl)
+
+        # Tokens issued before token types were introduced are access tokens
+        if claims.get("type", ACCESS_TOKEN) != token_type:
+            raise jwt.InvalidTokenError("Wrong token type")
+        if self.revocations.is_revoked(claims.get("user_id"), claims.get("iat"), claims.get("sid")):
+            raise TokenRevokedError("Token has been revoked")
+        return claims
+
+    def stats(self) -> Dict:
+        """Cache counters and revocation index sizes"""
+        return dict(self.cache.stats(), revoked_users=len(self.revocations),
+                    revoked_sessions=self.revocations.revoked_sessions)
+
+
+__all__ = ["ACCESS_TOKEN", "REFRESH_TOKEN", "RevocationIndex", "TokenRevokedError", "TokenVerifier"]
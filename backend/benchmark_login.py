@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+GroziOne login throughput benchmark
+
+Runs concurrent POST /api/login requests against the app in-process, on a
+throwaway database, and reports logins per second, latency percentiles and
+the worst event-loop stall seen while they ran. Half of the seeded users
+start with legacy SHA-256 hashes, so the first round also exercises the
+rehash-on-login path.
+
+Usage:
+    python benchmark_login.py [--users 50] [--requests 500] [--concurrency 32]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+
+async def watch_event_loop(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Largest delay past ``interval`` observed between wake-ups of the loop"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run_round(client, users: int, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def login(index: int):
+        nonlocal failures
+        username = f"bench{index % users}"
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/api/login", json={"username": username, "password": f"pw-{username}"})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failures += 1
+
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_event_loop(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_stall = await watcher
+
+    latencies.sort()
+    return {
+        "logins_per_second": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "max_loop_stall_ms": worst_stall * 1000,
+        "failures": failures
+    }
+
+
+async def main(args):
+    import httpx
+    from database import db
+    from server import app
+
+    with db.get_connection() as conn:
+        conn.executemany(
+            'INSERT INTO users (username, password_hash, role, created_at) VALUES (?, ?, ?, ?)',
+            [
+                (f"bench{i}",
+                 # Every other user keeps a legacy unsalted hash until first login
+                 hashlib.sha256(f"pw-bench{i}".encode()).hexdigest() if i % 2
+                 else db.passwords.hash_sync(f"pw-bench{i}"),
+                 "user", "2025-01-01T00:00:00")
+                for i in range(args.users)
+            ]
+        )
+
+    print(f"Scheme: {db.passwords.context.default_scheme()}, workers: {db.passwords.workers}, "
+          f"users: {args.users}, requests: {args.requests}, concurrency: {args.concurrency}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name in ("first round (legacy hashes upgraded)", "second round"):
+            result = await run_round(client, args.users, args.requests, args.concurrency)
+            print(f"{name}: {result['logins_per_second']:.1f} logins/s, "
+                  f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, "
+                  f"max event loop stall {result['max_loop_stall_ms']:.1f} ms, failures {result['failures']}")
+    print(f"Hasher: {db.passwords.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Must be set before the database module is imported
+        os.environ["DATABASE_PATH"] = os.path.join(workdir, "benchmark.db")
+        os.environ.setdefault("RECEIPT_CACHE_PATH", os.path.join(workdir, "receipt_cache.db"))
+        asyncio.run(main(arguments))
@@ -0,0 +1,139 @@
+"""
+In-process caching for GroziOne backend
+Size-bounded LRU with per-entry TTL, explicit invalidation and optional
+stale-while-revalidate
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    When ``stale_ttl`` is greater than zero, ``get_or_compute`` keeps serving
+    an expired entry for up to ``stale_ttl`` extra seconds while a single
+    background task recomputes it (stale-while-revalidate). Invalidated
+    entries are dropped immediately and are never served stale.
+    """
+
+    def __init__(self, name: str, maxsize: int = 128, ttl: float = 30.0, stale_ttl: float = 0.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._refreshing = set()
+        self._tasks = set()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _lookup(self, key: Hashable) -> Tuple[Any, bool]:
+        """Return (value, is_stale), or (_MISSING, False) if absent or too old"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return _MISSING, False
+            expires_at, value = entry
+            if now < expires_at:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return value, False
+            if now < expires_at + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self._stale_hits += 1
+                return value, True
+            del self._entries[key]
+            self._misses += 1
+            return _MISSING, False
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a fresh cached value"""
+        value, stale = self._lookup(key)
+        if value is _MISSING or stale:
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entries if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _set_if_current(self, key: Hashable, value: Any, generation: int):
+        # Don't store a value computed before an invalidation happened
+        if generation == self._generation:
+            self.set(key, value)
+
+    def invalidate(self, key: Hashable = _MISSING):
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock:
+            self._generation += 1
+            if key is _MISSING:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._invalidations += 1
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Get a cached value, computing and storing it on a miss"""
+        generation = self._generation
+        value, stale = self._lookup(key)
+        if value is _MISSING:
+            value = await compute()
+            self._set_if_current(key, value, generation)
+            return value
+
+        if stale and key not in self._refreshing:
+            self._refreshing.add(key)
+            task = asyncio.create_task(self._refresh(key, compute, self._generation))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return value
+
+    async def _refresh(self, key: Hashable, compute: Callable[[], Awaitable[Any]], generation: int):
+        try:
+            self._set_if_current(key, await compute(), generation)
+        except Exception as e:
+            logger.warning(f"Background refresh of {self.name} cache failed: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self._hits + self._stale_hits + self._misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "hit_ratio": round((self._hits + self._stale_hits) / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations
+            }
+
+
+__all__ = ["TTLCache"]
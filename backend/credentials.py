@@ -0,0 +1,131 @@
+"""
+Password hashing for GroziOne backend
+Hashes and verifies passwords with a salted KDF (passlib) on a dedicated,
+bounded thread pool so logins never stall the event loop, and upgrades
+legacy unsalted SHA-256 hashes the next time their owner logs in
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+# Preferred scheme first; older schemes still verify and are rehashed on login.
+# The default needs nothing beyond passlib; "argon2" or "bcrypt" work when
+# their backend packages are installed.
+PASSWORD_SCHEMES = [s.strip() for s in os.getenv("PASSWORD_SCHEMES", "pbkdf2_sha256").split(",") if s.strip()]
+PASSWORD_PBKDF2_ROUNDS = int(os.getenv("PASSWORD_PBKDF2_ROUNDS", "100000"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))
+
+# Unsalted hex SHA-256, as stored before KDF hashing was introduced
+LEGACY_SCHEME = "hex_sha256"
+
+
+class CredentialBusyError(Exception):
+    """Raised when too many password operations are already queued"""
+
+
+def build_context(schemes: List[str] = PASSWORD_SCHEMES, pbkdf2_rounds: int = PASSWORD_PBKDF2_ROUNDS) -> CryptContext:
+    """CryptContext hashing with ``schemes[0]`` and flagging every other scheme for rehash"""
+    schemes = list(dict.fromkeys(schemes + [LEGACY_SCHEME]))
+    return CryptContext(
+        schemes=schemes,
+        deprecated=schemes[1:],
+        pbkdf2_sha256__rounds=pbkdf2_rounds
+    )
+
+
+class PasswordHasher:
+    """Runs KDF hashing and verification on its own bounded thread pool.
+
+    PBKDF2 (hashlib), bcrypt and argon2 all release the GIL while hashing,
+    so worker threads run in parallel with each other and the event loop.
+    At most ``max_pending`` operations may be queued or running; further
+    callers wait up to ``queue_timeout`` seconds for a slot and then get a
+    CredentialBusyError, so a login storm turns into 503s rather than a
+    growing backlog. Hashing never runs on the database executor.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 queue_timeout: float = PASSWORD_HASH_QUEUE_TIMEOUT, context: Optional[CryptContext] = None):
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self.queue_timeout = queue_timeout
+        self.context = context or build_context()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kdf")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        return self._semaphore
+
+    async def _run(self, func, *args):
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise CredentialBusyError("Too many login attempts in progress, please retry shortly")
+
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            semaphore.release()
+
+    def hash_sync(self, password: str) -> str:
+        """Hash on the calling thread; for startup and scripts, not request handlers"""
+        return self.context.hash(password)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the preferred scheme"""
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, password_hash: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Check a password against a stored hash.
+
+        Returns (valid, new_hash); new_hash is set when the stored hash uses
+        a legacy scheme or weaker settings and should be replaced. A missing
+        hash still costs one verification so unknown usernames take as long
+        as wrong passwords.
+        """
+        if password_hash is None or not self.context.identify(password_hash):
+            await self._run(self.context.dummy_verify)
+            return False, None
+        valid, new_hash = await self._run(self.context.verify_and_update, password, password_hash)
+        if valid and new_hash:
+            self._rehashed += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict:
+        """Pool metrics for monitoring"""
+        return {
+            "scheme": self.context.default_scheme(),
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "rehashed": self._rehashed
+        }
+
+
+__all__ = ["CredentialBusyError", "PasswordHasher", "build_context"]
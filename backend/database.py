@@ -1,22 +1,539 @@
 import sqlite3
+import asyncio
+import base64
+import functools
 import json
+import os
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import logging
 
+from auth_tokens import RevocationIndex
+from credentials import PasswordHasher
+from products import ProductIndex, backfill_product_ids, backfill_unit_prices, quantity_columns
+from store_names import DEFAULT_STORE_ALIASES, StoreCanonicalizer
+
 logger = logging.getLogger(__name__)
 
+# Connection tuning (see https://www.sqlite.org/pragma.html)
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "20000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
+# Database executor sizing and backpressure
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "4"))
+DB_MAX_PENDING = int(os.getenv("DB_MAX_PENDING", "64"))
+DB_QUEUE_TIMEOUT = float(os.getenv("DB_QUEUE_TIMEOUT", "5"))
+
+
+class DatabaseBusyError(Exception):
+    """Raised when the database work queue stays full past the queue timeout"""
+
+
+class ConnectionPool:
+    """Per-thread pool of long-lived SQLite connections.
+
+    Each thread gets one connection which is opened on first use and reused
+    for every later call, so requests no longer pay connect/teardown cost.
+    Connections run in WAL mode with a busy timeout, which lets readers
+    proceed while a writer holds the lock instead of failing with
+    "database is locked". Compiled statements are reused through sqlite3's
+    per-connection statement cache.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        self._created = 0
+        self._acquired = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE_SIZE
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it if needed"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections[threading.get_ident()] = conn
+                self._created += 1
+        with self._lock:
+            self._acquired += 1
+        return conn
+
+    def close_all(self):
+        """Close every pooled connection"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to close database connection: {e}")
+        self._local = threading.local()
+
+    def stats(self) -> Dict:
+        """Pool metrics for monitoring"""
+        with self._lock:
+            return {
+                "open_connections": len(self._connections),
+                "connections_created": self._created,
+                "acquisitions": self._acquired,
+                "reuses": self._acquired - self._created,
+                "statement_cache_size": DB_STATEMENT_CACHE_SIZE
+            }
+
+
+class DatabaseExecutor:
+    """Bounded thread pool that runs blocking SQLite work off the event loop.
+
+    At most ``max_pending`` calls may be queued or running at once. Further
+    callers wait for a free slot and get a DatabaseBusyError if none frees up
+    within ``queue_timeout`` seconds, so overload turns into fast 503s instead
+    of an unbounded backlog.
+    """
+
+    def __init__(self, max_workers: int = DB_EXECUTOR_WORKERS,
+                 max_pending: int = DB_MAX_PENDING,
+                 queue_timeout: float = DB_QUEUE_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqlite")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(self, func, *args, **kwargs):
+        """Run ``func`` on a worker thread and await its result"""
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise DatabaseBusyError("Database is busy, please retry shortly")
+
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            semaphore.release()
+
+    def shutdown(self):
+        """Wait for queued work and stop the worker threads"""
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict:
+        """Executor metrics for monitoring"""
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "rejected": self._rejected
+        }
+
+
+def run_in_db_executor(method):
+    """Expose a synchronous SQLiteDatabase method as a coroutine run on the DB executor"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await self.executor.run(method, self, *args, **kwargs)
+    return wrapper
+
+
+def _table_columns(cursor, table: str) -> List[str]:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [column[1] for column in cursor.fetchall()]
+
+
+def _add_legacy_columns(cursor):
+    """Bring databases created before user accounts up to the current schema"""
+    if 'user_id' not in _table_columns(cursor, 'receipt_scans'):
+        cursor.execute('ALTER TABLE receipt_scans ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1')
+
+    user_columns = _table_columns(cursor, 'users')
+    if 'email' not in user_columns:
+        # SQLite cannot add a UNIQUE column, so enforce uniqueness with an index
+        cursor.execute('ALTER TABLE users ADD COLUMN email TEXT')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users (email)')
+    if 'last_login' not in user_columns:
+        cursor.execute('ALTER TABLE users ADD COLUMN last_login TEXT')
+    if 'is_active' not in user_columns:
+        cursor.execute('ALTER TABLE users ADD COLUMN is_active INTEGER DEFAULT 1')
+
+
+# Schema migrations as (version, description, steps). Each step is either a
+# SQL statement or a callable taking a cursor. Migrations run in order inside
+# a transaction and PRAGMA user_version records the last one applied, so
+# append new entries with the next version number and never edit old ones.
+MIGRATIONS = [
+    (1, "Add user_id, email, last_login and is_active columns", [
+        _add_legacy_columns,
+    ]),
+    (2, "Add indexes for per-user item and scan queries", [
+        # Listing (user_id = ? ORDER BY created_at DESC, id DESC)
+        'CREATE INDEX IF NOT EXISTS idx_grocery_items_user_created ON grocery_items (user_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_grocery_items_user_store ON grocery_items (user_id, store)',
+        'CREATE INDEX IF NOT EXISTS idx_grocery_items_user_name ON grocery_items (user_id, item_name COLLATE NOCASE)',
+        'CREATE INDEX IF NOT EXISTS idx_receipt_scans_user_created ON receipt_scans (user_id, created_at)',
+    ]),
+    (3, "Add store_summaries aggregate maintained by triggers", [
+        '''
+        CREATE TABLE IF NOT EXISTS store_summaries (
+            user_id INTEGER NOT NULL,
+            store TEXT NOT NULL,
+            total_spent REAL NOT NULL DEFAULT 0,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, store)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO store_summaries (user_id, store, total_spent, item_count)
+        SELECT user_id, store, SUM(price), COUNT(*) FROM grocery_items GROUP BY user_id, store
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_store_summaries_insert
+        AFTER INSERT ON grocery_items
+        BEGIN
+            INSERT INTO store_summaries (user_id, store, total_spent, item_count)
+            VALUES (NEW.user_id, NEW.store, NEW.price, 1)
+            ON CONFLICT (user_id, store) DO UPDATE SET
+                total_spent = total_spent + excluded.total_spent,
+                item_count = item_count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_store_summaries_delete
+        AFTER DELETE ON grocery_items
+        BEGIN
+            UPDATE store_summaries
+            SET total_spent = total_spent - OLD.price, item_count = item_count - 1
+            WHERE user_id = OLD.user_id AND store = OLD.store;
+            DELETE FROM store_summaries
+            WHERE user_id = OLD.user_id AND store = OLD.store AND item_count <= 0;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_store_summaries_update
+        AFTER UPDATE OF user_id, store, price ON grocery_items
+        BEGIN
+            UPDATE store_summaries
+            SET total_spent = total_spent - OLD.price, item_count = item_count - 1
+            WHERE user_id = OLD.user_id AND store = OLD.store;
+            DELETE FROM store_summaries
+            WHERE user_id = OLD.user_id AND store = OLD.store AND item_count <= 0;
+            INSERT INTO store_summaries (user_id, store, total_spent, item_count)
+            VALUES (NEW.user_id, NEW.store, NEW.price, 1)
+            ON CONFLICT (user_id, store) DO UPDATE SET
+                total_spent = total_spent + excluded.total_spent,
+                item_count = item_count + 1;
+        END
+        ''',
+    ]),
+    (4, "Add activity_daily counters for the admin activity timeline", [
+        '''
+        CREATE TABLE IF NOT EXISTS activity_daily (
+            activity_date TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO activity_daily (activity_date, count)
+        SELECT DATE(created_at), COUNT(*) FROM (
+            SELECT created_at FROM grocery_items
+            UNION ALL
+            SELECT created_at FROM receipt_scans
+        )
+        GROUP BY DATE(created_at)
+        ''',
+        *[
+            f'''
+            CREATE TRIGGER IF NOT EXISTS trg_activity_daily_{table}_insert
+            AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO activity_daily (activity_date, count)
+                VALUES (DATE(NEW.created_at), 1)
+                ON CONFLICT (activity_date) DO UPDATE SET count = count + 1;
+            END
+            '''
+            for table in ('grocery_items', 'receipt_scans')
+        ],
+        *[
+            f'''
+            CREATE TRIGGER IF NOT EXISTS trg_activity_daily_{table}_delete
+            AFTER DELETE ON {table}
+            BEGIN
+                UPDATE activity_daily SET count = count - 1
+                WHERE activity_date = DATE(OLD.created_at);
+            END
+            '''
+            for table in ('grocery_items', 'receipt_scans')
+        ],
+    ]),
+    (5, "Add scan_jobs table for asynchronous receipt scanning", [
+        '''
+        CREATE TABLE IF NOT EXISTS scan_jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_scan_jobs_user_created ON scan_jobs (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_scan_jobs_status ON scan_jobs (status)',
+    ]),
+    (6, "Add store_aliases table for store name canonicalization", [
+        '''
+        CREATE TABLE IF NOT EXISTS store_aliases (
+            alias TEXT PRIMARY KEY,
+            canonical TEXT NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        lambda cursor: cursor.executemany(
+            'INSERT OR IGNORE INTO store_aliases (alias, canonical) VALUES (?, ?)',
+            DEFAULT_STORE_ALIASES
+        ),
+    ]),
+    (7, "Add product normalization index and grocery_items.product_id", [
+        'ALTER TABLE grocery_items ADD COLUMN product_id TEXT',
+        '''
+        CREATE TABLE IF NOT EXISTS products (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            name TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        ''',
+        # Every normalized name a user has bought -> its product
+        '''
+        CREATE TABLE IF NOT EXISTS product_keys (
+            user_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            PRIMARY KEY (user_id, key)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_product_keys_product ON product_keys (product_id)',
+        # Inverted index of product words ("w:milk") and key trigrams ("g:mil")
+        '''
+        CREATE TABLE IF NOT EXISTS product_terms (
+            user_id INTEGER NOT NULL,
+            term TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            PRIMARY KEY (user_id, term, product_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_grocery_items_user_product ON grocery_items (user_id, product_id)',
+        lambda cursor: backfill_product_ids(cursor),
+    ]),
+    (8, "Add parsed amount, unit and unit_price columns to grocery_items", [
+        'ALTER TABLE grocery_items ADD COLUMN amount REAL',
+        'ALTER TABLE grocery_items ADD COLUMN unit TEXT',
+        'ALTER TABLE grocery_items ADD COLUMN unit_price REAL',
+        lambda cursor: backfill_unit_prices(cursor),
+        # Per-product unit price lookups for comparison and price history
+        'CREATE INDEX IF NOT EXISTS idx_grocery_items_user_product_unit ON grocery_items (user_id, product_id, unit, unit_price)',
+    ]),
+    (9, "Add price_history time series maintained by triggers", [
+        # Clustered on (user, product, date) so a range query reads one
+        # contiguous run of the table; every column lives in the key's b-tree
+        '''
+        CREATE TABLE IF NOT EXISTS price_history (
+            user_id INTEGER NOT NULL,
+            product_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            store TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            unit_price REAL NOT NULL,
+            price REAL NOT NULL,
+            PRIMARY KEY (user_id, product_id, date, store, item_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO price_history (user_id, product_id, date, store, item_id, unit, unit_price, price)
+        SELECT user_id, product_id, date, store, id, unit, unit_price, price FROM grocery_items
+        WHERE product_id IS NOT NULL AND unit_price IS NOT NULL
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_price_history_insert
+        AFTER INSERT ON grocery_items
+        WHEN NEW.product_id IS NOT NULL AND NEW.unit_price IS NOT NULL
+        BEGIN
+            INSERT OR REPLACE INTO price_history (user_id, product_id, date, store, item_id, unit, unit_price, price)
+            VALUES (NEW.user_id, NEW.product_id, NEW.date, NEW.store, NEW.id, NEW.unit, NEW.unit_price, NEW.price);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_price_history_delete
+        AFTER DELETE ON grocery_items
+        BEGIN
+            DELETE FROM price_history
+            WHERE user_id = OLD.user_id AND product_id = OLD.product_id AND date = OLD.date
+              AND store = OLD.store AND item_id = OLD.id;
+        END
+        ''',
+        # Corrections to an item replace its point rather than adding one
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_price_history_update
+        AFTER UPDATE OF user_id, product_id, date, store, unit, unit_price, price ON grocery_items
+        BEGIN
+            DELETE FROM price_history
+            WHERE user_id = OLD.user_id AND product_id = OLD.product_id AND date = OLD.date
+              AND store = OLD.store AND item_id = OLD.id;
+            INSERT OR REPLACE INTO price_history (user_id, product_id, date, store, item_id, unit, unit_price, price)
+            SELECT NEW.user_id, NEW.product_id, NEW.date, NEW.store, NEW.id, NEW.unit, NEW.unit_price, NEW.price
+            WHERE NEW.product_id IS NOT NULL AND NEW.unit_price IS NOT NULL;
+        END
+        ''',
+    ]),
+    (10, "Add token_revocations table", [
+        # Tokens issued to the user before revoked_before (Unix time) are rejected
+        '''
+        CREATE TABLE IF NOT EXISTS token_revocations (
+            user_id INTEGER PRIMARY KEY,
+            revoked_before REAL NOT NULL
+        )
+        ''',
+    ]),
+    (11, "Add store_backfills table", [
+        # Store name rules (StoreCanonicalizer.fingerprint) already applied to saved names
+        '''
+        CREATE TABLE IF NOT EXISTS store_backfills (
+            fingerprint TEXT PRIMARY KEY,
+            completed_at TEXT NOT NULL
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    (12, "Add sessions table for refresh token rotation", [
+        # One row per login; refresh_jti is the only refresh token of the
+        # session still accepted, expires_at (Unix time) when it runs out
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            refresh_jti TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            revoked_at REAL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)',
+    ]),
+]
+
+
+# API field name -> grocery_items column, used for field projection
+GROCERY_ITEM_FIELDS = {
+    "id": "id",
+    "itemName": "item_name",
+    "store": "store",
+    "quantity": "quantity",
+    "price": "price",
+    "date": "date",
+    "created_at": "created_at",
+    "productId": "product_id",
+    "amount": "amount",
+    "unit": "unit",
+    "unitPrice": "unit_price"
+}
+
+
+# Sort options for the price comparison -> ORDER BY clause
+COMPARISON_SORTS = {
+    "savings": "savings DESC, item_key, unit",
+    "savings_pct": "savings_pct DESC, item_key, unit",
+    "name": "lower(item_name), item_key, unit",
+    "stores": "store_count DESC, savings DESC, item_key, unit"
+}
+
+
+# Price history bucket -> SQL expression for the start date of its period
+PRICE_HISTORY_BUCKETS = {
+    "day": "date",
+    # Monday of the date's week
+    "week": "date(date, 'weekday 0', '-6 days')",
+    "month": "strftime('%Y-%m-01', date)"
+}
+
+
+def encode_cursor(created_at: str, item_id: str) -> str:
+    """Encode a keyset position as an opaque URL-safe cursor"""
+    raw = json.dumps([created_at, item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(created_at), str(item_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
 class SQLiteDatabase:
     def __init__(self, db_path: str = "grozione.db"):
         self.db_path = Path(db_path)
+        self.pool = ConnectionPool(self.db_path)
+        self.executor = DatabaseExecutor()
+        self.passwords = PasswordHasher()
+        self._invalidation_hooks: List[Callable[[str, Optional[int]], None]] = []
         self.init_database()
         self.migrate_db()
+        self.revocations = self._load_revocations()
+        self.stores = self._load_store_canonicalizer()
+        self.products = ProductIndex()
     
     def init_database(self):
         """Initialize the SQLite database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
 
             # Create users table
@@ -93,9 +610,8 @@ class SQLiteDatabase:
             # Create default admin user if not exists
             cursor.execute('SELECT COUNT(*) FROM users WHERE username = ?', ('admin',))
             if cursor.fetchone()[0] == 0:
-                import hashlib
                 from datetime import datetime
-                admin_password = hashlib.sha256('admin123'.encode()).hexdigest()
+                admin_password = self.passwords.hash_sync('admin123')
                 cursor.execute('''
                     INSERT INTO users (username, password_hash, role, created_at)
                     VALUES (?, ?, ?, ?)
@@ -106,62 +622,91 @@ class SQLiteDatabase:
             logger.info("Database initialized successfully")
 
     def migrate_db(self):
-        """Run database migrations to update schema"""
+        """Apply pending schema migrations, tracked through PRAGMA user_version"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        current_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        pending = [m for m in MIGRATIONS if m[0] > current_version]
+
+        if not pending:
+            logger.info(f"Database schema is up to date (version {current_version})")
+            return
+
+        for version, description, steps in pending:
+            logger.info(f"Applying migration {version}: {description}...")
+            try:
+                cursor.execute("BEGIN")
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+                logger.info(f"✅ Migration {version} completed")
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Migration {version} failed: {e}")
+                raise
+
+    def _load_revocations(self) -> RevocationIndex:
+        """Build the revocation index, dropping sessions whose tokens have all expired"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
+            conn.execute('DELETE FROM sessions WHERE expires_at < ?', (time.time(),))
+            return RevocationIndex(
+                conn.execute('SELECT user_id, revoked_before FROM token_revocations').fetchall(),
+                conn.execute('SELECT id, expires_at FROM sessions WHERE revoked_at IS NOT NULL').fetchall()
+            )
 
-            # Migration 1: Add user_id to receipt_scans
-            cursor.execute("PRAGMA table_info(receipt_scans)")
-            rs_columns = [column[1] for column in cursor.fetchall()]
+    def _load_store_canonicalizer(self) -> StoreCanonicalizer:
+        """Build the store name index from the alias table"""
+        conn = self.get_connection()
+        aliases = conn.execute('SELECT alias, canonical FROM store_aliases').fetchall()
+        return StoreCanonicalizer(aliases)
 
-            if 'user_id' not in rs_columns:
-                logger.info("Migrating receipt_scans table to add user_id column...")
-                try:
-                    cursor.execute('''
-                        ALTER TABLE receipt_scans
-                        ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1
-                    ''')
-                    conn.commit()
-                    logger.info("✅ Migration completed: Added user_id to receipt_scans")
-                except Exception as e:
-                    logger.error(f"Migration failed: {e}")
-
-            # Migration 2: Add email, last_login, is_active to users
-            cursor.execute("PRAGMA table_info(users)")
-            user_columns = [column[1] for column in cursor.fetchall()]
-
-            migrations_needed = []
-            if 'email' not in user_columns:
-                migrations_needed.append(('email', 'ALTER TABLE users ADD COLUMN email TEXT UNIQUE'))
-            if 'last_login' not in user_columns:
-                migrations_needed.append(('last_login', 'ALTER TABLE users ADD COLUMN last_login TEXT'))
-            if 'is_active' not in user_columns:
-                migrations_needed.append(('is_active', 'ALTER TABLE users ADD COLUMN is_active INTEGER DEFAULT 1'))
-
-            if migrations_needed:
-                logger.info(f"Migrating users table to add {len(migrations_needed)} columns...")
-                try:
-                    for col_name, sql in migrations_needed:
-                        cursor.execute(sql)
-                        logger.info(f"✅ Added {col_name} column to users table")
-                    conn.commit()
-                    logger.info("✅ Migration completed: Updated users table")
-                except Exception as e:
-                    logger.error(f"Migration failed: {e}")
-            else:
-                logger.info("Database schema is up to date")
+    def canonical_store_name(self, name: Optional[str]) -> str:
+        """Canonical form of a store name, e.g. TESCO SUPERSTORE -> Tesco"""
+        return self.stores.resolve(name)
 
     def get_connection(self):
-        """Get a database connection"""
-        return sqlite3.connect(self.db_path)
+        """Get the pooled database connection for the current thread"""
+        return self.pool.acquire()
+
+    def add_invalidation_hook(self, hook: Callable[[str, Optional[int]], None]):
+        """Register a callback fired after writes as hook(table, user_id)"""
+        self._invalidation_hooks.append(hook)
+
+    def _fire_invalidation(self, table: str, user_id: Optional[int] = None):
+        for hook in self._invalidation_hooks:
+            try:
+                hook(table, user_id)
+            except Exception as e:
+                logger.error(f"Invalidation hook failed for {table}: {e}")
+
+    def get_pool_stats(self) -> Dict:
+        """Get connection pool metrics"""
+        return self.pool.stats()
+
+    def get_executor_stats(self) -> Dict:
+        """Get database executor metrics"""
+        return self.executor.stats()
+
+    def close(self):
+        """Stop the executor and close all pooled connections"""
+        self.executor.shutdown()
+        self.passwords.shutdown()
+        self.pool.close_all()
 
     # User Authentication operations
+    # Passwords are hashed on the password hasher's pool before the database
+    # executor is involved, so slow KDF work never holds a database thread
     async def create_user(self, username: str, password: str, role: str = 'user', email: str = None) -> Dict:
         """Create a new user"""
-        import hashlib
-
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        password_hash = await self.passwords.hash(password)
+        return await self._create_user(username, password_hash, role, email)
 
+    @run_in_db_executor
+    def _create_user(self, username: str, password_hash: str, role: str, email: Optional[str]) -> Dict:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             try:
@@ -170,6 +715,7 @@ class SQLiteDatabase:
                     VALUES (?, ?, ?, ?, ?)
                 ''', (username, email, password_hash, role, datetime.utcnow().isoformat()))
                 conn.commit()
+                self._fire_invalidation("users")
 
                 return {
                     "success": True,
@@ -194,35 +740,129 @@ class SQLiteDatabase:
                     }
 
     async def authenticate_user(self, username: str, password: str) -> Dict:
-        """Authenticate user login"""
-        import hashlib
+        """Authenticate user login, upgrading a legacy password hash on success"""
+        user = await self._get_login(username)
+        valid, new_hash = await self.passwords.verify(password, user[3] if user else None)
+        if not valid:
+            return {
+                "success": False,
+                "message": "Invalid username or password"
+            }
 
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        if new_hash:
+            await self._replace_password_hash(user[0], user[3], new_hash)
+        return {
+            "success": True,
+            "user": {
+                "id": user[0],
+                "username": user[1],
+                "role": user[2]
+            }
+        }
 
+    @run_in_db_executor
+    def _get_login(self, username: str) -> Optional[tuple]:
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, username, role FROM users
-                WHERE username = ? AND password_hash = ?
-            ''', (username, password_hash))
+            return conn.execute(
+                'SELECT id, username, role, password_hash FROM users WHERE username = ?', (username,)
+            ).fetchone()
 
-            user = cursor.fetchone()
+    @run_in_db_executor
+    def _replace_password_hash(self, user_id: int, old_hash: str, new_hash: str):
+        # Skipped if the password changed while the new hash was computed
+        with self.get_connection() as conn:
+            conn.execute(
+                'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                (new_hash, user_id, old_hash)
+            )
+
+    @run_in_db_executor
+    def get_user_by_id(self, user_id: int) -> Optional[Dict]:
+        """Get an active user's current identity, for issuing fresh tokens"""
+        with self.get_connection() as conn:
+            user = conn.execute(
+                'SELECT id, username, role FROM users WHERE id = ? AND is_active = 1', (user_id,)
+            ).fetchone()
             if user:
                 return {
-                    "success": True,
-                    "user": {
-                        "id": user[0],
-                        "username": user[1],
-                        "role": user[2]
-                    }
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": "Invalid username or password"
+                    "id": user[0],
+                    "username": user[1],
+                    "role": user[2]
                 }
+            return None
+
+    def _revoke_tokens(self, conn: sqlite3.Connection, user_id: int) -> float:
+        """Record a revocation cut-off for the user's tokens in the caller's transaction.
+
+        Returns the cut-off; the caller applies it to the in-memory index
+        once the transaction has committed.
+        """
+        revoked_before = time.time()
+        conn.execute('''
+            INSERT INTO token_revocations (user_id, revoked_before) VALUES (?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET revoked_before = MAX(revoked_before, excluded.revoked_before)
+        ''', (user_id, revoked_before))
+        return revoked_before
+
+    @run_in_db_executor
+    def revoke_user_tokens(self, user_id: int):
+        """Invalidate every token issued to the user so far"""
+        with self.get_connection() as conn:
+            revoked_before = self._revoke_tokens(conn, user_id)
+            conn.commit()
+        self.revocations.revoke(user_id, revoked_before)
 
-    async def get_user_by_email(self, email: str) -> Optional[Dict]:
+    @run_in_db_executor
+    def create_session(self, user_id: int, expires_at: float) -> Dict:
+        """Start a login session; returns its id and the jti of its first refresh token"""
+        session = {"session_id": uuid.uuid4().hex, "refresh_jti": uuid.uuid4().hex}
+        with self.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO sessions (id, user_id, refresh_jti, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (session["session_id"], user_id, session["refresh_jti"], datetime.utcnow().isoformat(), expires_at))
+        return session
+
+    @run_in_db_executor
+    def rotate_session(self, session_id: str, refresh_jti: str, expires_at: float) -> Optional[str]:
+        """Replace the session's refresh token, returning the jti of the new one.
+
+        Only the latest refresh token of a live session can be exchanged, and
+        only once. Presenting an older one means it was copied, so the whole
+        session is revoked and None is returned.
+        """
+        new_jti = uuid.uuid4().hex
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE sessions SET refresh_jti = ?, expires_at = ?
+                WHERE id = ? AND refresh_jti = ? AND revoked_at IS NULL
+            ''', (new_jti, expires_at, session_id, refresh_jti))
+            if cursor.rowcount == 1:
+                return new_jti
+        logger.warning(f"Refresh token reused or session revoked; ending session {session_id}")
+        self._revoke_session(session_id)
+        return None
+
+    @run_in_db_executor
+    def revoke_session(self, session_id: str, user_id: int):
+        """Invalidate the access and refresh tokens of one of the user's sessions"""
+        self._revoke_session(session_id, user_id)
+
+    def _revoke_session(self, session_id: str, user_id: Optional[int] = None):
+        with self.get_connection() as conn:
+            conn.execute(
+                'UPDATE sessions SET revoked_at = COALESCE(revoked_at, ?) WHERE id = ? AND user_id = COALESCE(?, user_id)',
+                (time.time(), session_id, user_id)
+            )
+            row = conn.execute(
+                'SELECT expires_at FROM sessions WHERE id = ? AND user_id = COALESCE(?, user_id) AND revoked_at IS NOT NULL',
+                (session_id, user_id)
+            ).fetchone()
+        if row:
+            self.revocations.revoke_session(session_id, row[0])
+
+    @run_in_db_executor
+    def get_user_by_email(self, email: str) -> Optional[Dict]:
         """Get user by email"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -241,7 +881,8 @@ class SQLiteDatabase:
                 }
             return None
 
-    async def create_password_reset_token(self, user_id: int) -> str:
+    @run_in_db_executor
+    def create_password_reset_token(self, user_id: int) -> str:
         """Create a password reset token for a user"""
         import secrets
 
@@ -261,8 +902,12 @@ class SQLiteDatabase:
 
         return token
 
-    async def verify_reset_token(self, token: str) -> Optional[int]:
+    @run_in_db_executor
+    def verify_reset_token(self, token: str) -> Optional[int]:
         """Verify password reset token and return user_id if valid"""
+        return self._verify_reset_token(token)
+
+    def _verify_reset_token(self, token: str) -> Optional[int]:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
@@ -288,17 +933,18 @@ class SQLiteDatabase:
 
     async def reset_password(self, token: str, new_password: str) -> Dict:
         """Reset user password using token"""
-        import hashlib
+        password_hash = await self.passwords.hash(new_password)
+        return await self._reset_password(token, password_hash)
 
-        user_id = await self.verify_reset_token(token)
+    @run_in_db_executor
+    def _reset_password(self, token: str, password_hash: str) -> Dict:
+        user_id = self._verify_reset_token(token)
         if not user_id:
             return {
                 "success": False,
                 "message": "Invalid or expired reset token"
             }
 
-        password_hash = hashlib.sha256(new_password.encode()).hexdigest()
-
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
@@ -312,14 +958,18 @@ class SQLiteDatabase:
                 UPDATE password_reset_tokens SET used = 1 WHERE token = ?
             ''', (token,))
 
+            # Sessions opened with the old password end here
+            revoked_before = self._revoke_tokens(conn, user_id)
             conn.commit()
+        self.revocations.revoke(user_id, revoked_before)
 
         return {
             "success": True,
             "message": "Password reset successfully"
         }
 
-    async def get_users(self) -> List[Dict]:
+    @run_in_db_executor
+    def get_users(self) -> List[Dict]:
         """Get all users (admin only)"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -337,10 +987,14 @@ class SQLiteDatabase:
             ]
 
     async def update_user(self, user_id: int, username: Optional[str] = None,
-                         password: Optional[str] = None, role: Optional[str] = None) -> Dict:
+                          password: Optional[str] = None, role: Optional[str] = None) -> Dict:
         """Update user details (admin only)"""
-        import hashlib
+        password_hash = await self.passwords.hash(password) if password is not None else None
+        return await self._update_user(user_id, username, password_hash, role)
 
+    @run_in_db_executor
+    def _update_user(self, user_id: int, username: Optional[str], password_hash: Optional[str],
+                     role: Optional[str]) -> Dict:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
@@ -352,8 +1006,7 @@ class SQLiteDatabase:
                 update_fields.append("username = ?")
                 params.append(username)
 
-            if password is not None:
-                password_hash = hashlib.sha256(password.encode()).hexdigest()
+            if password_hash is not None:
                 update_fields.append("password_hash = ?")
                 params.append(password_hash)
 
@@ -372,14 +1025,18 @@ class SQLiteDatabase:
 
             try:
                 cursor.execute(query, params)
-                conn.commit()
-
                 if cursor.rowcount == 0:
+                    conn.commit()
                     return {
                         "success": False,
                         "message": "User not found"
                     }
 
+                # Outstanding tokens carry the old username and role
+                revoked_before = self._revoke_tokens(conn, user_id)
+                conn.commit()
+                self.revocations.revoke(user_id, revoked_before)
+                self._fire_invalidation("users", user_id)
                 return {
                     "success": True,
                     "message": "User updated successfully"
@@ -390,7 +1047,8 @@ class SQLiteDatabase:
                     "message": "Username already exists"
                 }
 
-    async def delete_user(self, user_id: int) -> Dict:
+    @run_in_db_executor
+    def delete_user(self, user_id: int) -> Dict:
         """Delete a user (admin only)"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -407,14 +1065,18 @@ class SQLiteDatabase:
 
             # Delete user (cascade will handle related records if configured)
             cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+            revoked_before = self._revoke_tokens(conn, user_id)
             conn.commit()
+            self.revocations.revoke(user_id, revoked_before)
+            self._fire_invalidation("users", user_id)
 
             return {
                 "success": True,
                 "message": f"User '{user[0]}' deleted successfully"
             }
 
-    async def get_user_activity_stats(self) -> Dict:
+    @run_in_db_executor
+    def get_user_activity_stats(self) -> Dict:
         """Get user activity statistics for admin dashboard"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -427,50 +1089,36 @@ class SQLiteDatabase:
             cursor.execute('SELECT role, COUNT(*) FROM users GROUP BY role')
             users_by_role = dict(cursor.fetchall())
 
-            # Get user activity (users with grocery items)
+            # Get user activity (users with grocery items), from the per-store aggregate
             cursor.execute('''
-                SELECT COUNT(DISTINCT user_id) FROM grocery_items
+                SELECT COUNT(DISTINCT user_id) FROM store_summaries
             ''')
             active_users = cursor.fetchone()[0]
 
-            # Get per-user statistics
-            # First check if receipt_scans has user_id column
-            cursor.execute("PRAGMA table_info(receipt_scans)")
-            rs_columns = [column[1] for column in cursor.fetchall()]
-            has_user_id = 'user_id' in rs_columns
-
-            if has_user_id:
-                cursor.execute('''
-                    SELECT
-                        u.id,
-                        u.username,
-                        u.role,
-                        u.created_at,
-                        COUNT(DISTINCT gi.id) as item_count,
-                        COUNT(DISTINCT rs.id) as scan_count,
-                        MAX(gi.created_at) as last_activity
-                    FROM users u
-                    LEFT JOIN grocery_items gi ON u.id = gi.user_id
-                    LEFT JOIN receipt_scans rs ON u.id = rs.user_id
-                    GROUP BY u.id, u.username, u.role, u.created_at
-                    ORDER BY last_activity DESC
-                ''')
-            else:
-                # Fallback query without receipt_scans join
-                cursor.execute('''
-                    SELECT
-                        u.id,
-                        u.username,
-                        u.role,
-                        u.created_at,
-                        COUNT(DISTINCT gi.id) as item_count,
-                        0 as scan_count,
-                        MAX(gi.created_at) as last_activity
-                    FROM users u
-                    LEFT JOIN grocery_items gi ON u.id = gi.user_id
-                    GROUP BY u.id, u.username, u.role, u.created_at
-                    ORDER BY last_activity DESC
-                ''')
+            # Get per-user statistics. Each count is aggregated on its own
+            # (item counts from store_summaries, last activity and scan counts
+            # through the per-user indexes) so no items x scans join is built.
+            cursor.execute('''
+                SELECT
+                    u.id,
+                    u.username,
+                    u.role,
+                    u.created_at,
+                    COALESCE(items.item_count, 0) as item_count,
+                    COALESCE(scans.scan_count, 0) as scan_count,
+                    (SELECT MAX(gi.created_at) FROM grocery_items gi
+                     WHERE gi.user_id = u.id) as last_activity
+                FROM users u
+                LEFT JOIN (
+                    SELECT user_id, SUM(item_count) as item_count
+                    FROM store_summaries GROUP BY user_id
+                ) items ON items.user_id = u.id
+                LEFT JOIN (
+                    SELECT user_id, COUNT(*) as scan_count
+                    FROM receipt_scans GROUP BY user_id
+                ) scans ON scans.user_id = u.id
+                ORDER BY last_activity DESC
+            ''')
 
             user_activities = []
             for row in cursor.fetchall():
@@ -484,18 +1132,11 @@ class SQLiteDatabase:
                     "last_activity": row[6]
                 })
 
-            # Get recent activity timeline (last 30 days)
+            # Get recent activity timeline (last 30 days) from the daily counters
             cursor.execute('''
-                SELECT
-                    DATE(created_at) as activity_date,
-                    COUNT(*) as count
-                FROM (
-                    SELECT created_at FROM grocery_items
-                    UNION ALL
-                    SELECT created_at FROM receipt_scans
-                )
-                WHERE created_at >= datetime('now', '-30 days')
-                GROUP BY DATE(created_at)
+                SELECT activity_date, count
+                FROM activity_daily
+                WHERE activity_date >= DATE('now', '-30 days') AND count > 0
                 ORDER BY activity_date DESC
             ''')
 
@@ -516,7 +1157,8 @@ class SQLiteDatabase:
             }
 
     # Status Check operations
-    async def create_status_check(self, client_name: str) -> Dict:
+    @run_in_db_executor
+    def create_status_check(self, client_name: str) -> Dict:
         """Create a new status check entry"""
         status_check = {
             "id": str(uuid.uuid4()),
@@ -534,7 +1176,8 @@ class SQLiteDatabase:
         
         return status_check
     
-    async def get_status_checks(self, limit: int = 1000) -> List[Dict]:
+    @run_in_db_executor
+    def get_status_checks(self, limit: int = 1000) -> List[Dict]:
         """Get all status checks"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -554,62 +1197,334 @@ class SQLiteDatabase:
         ]
     
     # Grocery Items operations
-    async def add_grocery_item(self, item_data: Dict, user_id: int = 1) -> Dict:
-        """Add a new grocery item"""
-        grocery_item = {
+    def _new_grocery_item(self, item_data: Dict, user_id: int) -> Dict:
+        """Build a grocery_items row from API item data"""
+        item = {
             "id": str(uuid.uuid4()),
             "item_name": item_data.get("itemName", "Unknown Item"),
-            "store": item_data.get("store", "Unknown Store"),
+            "store": self.canonical_store_name(item_data.get("store", "Unknown Store")),
             "quantity": item_data.get("quantity", "1 kg"),
             "price": float(item_data.get("price", 0)),
             "date": item_data.get("date", datetime.utcnow().strftime('%Y-%m-%d')),
             "created_at": datetime.utcnow().isoformat(),
             "user_id": user_id
         }
-        
+        item.update(quantity_columns(item["quantity"], item["price"], item["item_name"]))
+        return item
+
+    def _insert_grocery_items(self, cursor, grocery_items: List[Dict]):
+        # Product ids are resolved on the insert's cursor so new products and
+        # their index terms commit or roll back together with the items
+        for item in grocery_items:
+            item["product_id"] = self.products.resolve(cursor, item["user_id"], item["item_name"])
+        cursor.executemany('''
+            INSERT INTO grocery_items (id, item_name, store, quantity, price, date, created_at, user_id, product_id,
+                                       amount, unit, unit_price)
+            VALUES (:id, :item_name, :store, :quantity, :price, :date, :created_at, :user_id, :product_id,
+                    :amount, :unit, :unit_price)
+        ''', grocery_items)
+
+    @run_in_db_executor
+    def add_grocery_item(self, item_data: Dict, user_id: int = 1) -> Dict:
+        """Add a new grocery item"""
+        grocery_item = self._new_grocery_item(item_data, user_id)
+
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO grocery_items (id, item_name, store, quantity, price, date, created_at, user_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                grocery_item["id"],
-                grocery_item["item_name"],
-                grocery_item["store"],
-                grocery_item["quantity"],
-                grocery_item["price"],
-                grocery_item["date"],
-                grocery_item["created_at"],
-                grocery_item["user_id"]
-            ))
-            conn.commit()
-        
+            self._insert_grocery_items(conn.cursor(), [grocery_item])
+        self._fire_invalidation("grocery_items", user_id)
+
         return grocery_item
-    
-    async def get_grocery_items(self, limit: int = 1000, user_id: int = 1) -> List[Dict]:
-        """Get all grocery items"""
+
+    @run_in_db_executor
+    def add_grocery_items_batch(self, items_data: List[Dict], user_id: int = 1,
+                                scan_data: Optional[Dict] = None) -> Dict:
+        """Add many grocery items, and optionally their receipt scan, in one transaction"""
+        grocery_items = [self._new_grocery_item(item_data, user_id) for item_data in items_data]
+        scan_id = None
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, item_name, store, quantity, price, date, created_at
-                FROM grocery_items WHERE user_id = ? ORDER BY created_at DESC LIMIT ?
-            ''', (user_id, limit))
+            self._insert_grocery_items(cursor, grocery_items)
+            if scan_data is not None:
+                scan_id = self._insert_receipt_scan(cursor, scan_data, user_id)
+
+        self._fire_invalidation("grocery_items", user_id)
+        if scan_id is not None:
+            self._fire_invalidation("receipt_scans", user_id)
+
+        return {
+            "items": grocery_items,
+            "scan_id": scan_id
+        }
+
+    @run_in_db_executor
+    def get_grocery_item_columns(self, user_id: int) -> Dict[str, list]:
+        """All of a user's items in one query, as column name -> list of values"""
+        columns = ["date", "store", "product_key", "product_name", "price", "amount", "unit", "unit_price"]
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT g.date, g.store, COALESCE(g.product_id, lower(trim(g.item_name))),
+                       COALESCE(p.name, g.item_name), g.price, g.amount, g.unit, g.unit_price
+                FROM grocery_items g LEFT JOIN products p ON p.id = g.product_id
+                WHERE g.user_id = ?
+            ''', (user_id,)).fetchall()
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        return {column: list(column_values) for column, column_values in zip(columns, values)}
+
+    @run_in_db_executor
+    def get_grocery_items_page(self, user_id: int, limit: int = 100, cursor: Optional[str] = None,
+                               fields: Optional[List[str]] = None, store: Optional[str] = None,
+                               date_from: Optional[str] = None, date_to: Optional[str] = None) -> Dict:
+        """Get one page of grocery items, newest first, using keyset pagination on (created_at, id)"""
+        fields = fields or list(GROCERY_ITEM_FIELDS)
+        unknown = [f for f in fields if f not in GROCERY_ITEM_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        # created_at and id are always read so the next cursor can be built
+        columns = [GROCERY_ITEM_FIELDS[f] for f in fields] + ["created_at", "id"]
+
+        conditions = ["user_id = ?"]
+        params = [user_id]
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend([cursor_created_at, cursor_id])
+        if store:
+            conditions.append("store = ?")
+            params.append(self.canonical_store_name(store))
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+
+        # Fetch one extra row to find out whether another page exists
+        params.append(limit + 1)
+        query = f"""
+            SELECT {', '.join(columns)} FROM grocery_items
+            WHERE {' AND '.join(conditions)}
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        """
+
+        with self.get_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1]) if has_more else None
+
+        return {
+            "items": [dict(zip(fields, row)) for row in rows],
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+
+    @run_in_db_executor
+    def get_price_comparison(self, user_id: int, limit: int = 50, offset: int = 0,
+                             sort: str = "savings") -> Dict:
+        """Compare unit prices of the same product across stores.
+
+        Items are grouped by product id and base unit (kg, l or pcs), so
+        receipt abbreviations and pack sizes of the same product compare
+        together (rows without a product id fall back to the lower-cased,
+        trimmed name). Only groups bought at more than one store with a unit
+        price difference are returned, each with its cheapest and most
+        expensive entry per unit. Savings are what the most expensive
+        purchase would have cost less at the cheapest unit price.
+        """
+        if sort not in COMPARISON_SORTS:
+            raise ValueError(f"Unknown sort: {sort}. Supported: {', '.join(COMPARISON_SORTS)}")
+
+        comparable_groups = """
+            WITH keyed AS (
+                SELECT id, item_name, store, quantity, price, date, created_at, amount, unit, unit_price,
+                       COALESCE(product_id, lower(trim(item_name))) AS item_key
+                FROM grocery_items WHERE user_id = ?
+            ),
+            items AS (
+                SELECT *,
+                       ROW_NUMBER() OVER (PARTITION BY item_key, unit
+                                          ORDER BY unit_price ASC, created_at DESC) AS cheapest_rank,
+                       ROW_NUMBER() OVER (PARTITION BY item_key, unit
+                                          ORDER BY unit_price DESC, created_at DESC) AS dearest_rank
+                FROM keyed
+            ),
+            groups AS (
+                SELECT item_key, unit,
+                       COUNT(*) AS entry_count,
+                       COUNT(DISTINCT store) AS store_count,
+                       (MAX(unit_price) - MIN(unit_price)) * 100.0 / MAX(unit_price) AS savings_pct,
+                       json_group_array(json_object('id', id, 'store', store, 'quantity', quantity, 'price', price,
+                                                    'unitPrice', unit_price)) AS all_stores
+                FROM items
+                GROUP BY item_key, unit
+                HAVING COUNT(DISTINCT store) > 1 AND MAX(unit_price) > MIN(unit_price)
+            ),
+            comparisons AS (
+                SELECT g.item_key, g.unit, c.item_name, g.entry_count, g.store_count,
+                       e.price - c.unit_price * e.amount AS savings, g.savings_pct, g.all_stores,
+                       c.id AS c_id, c.store AS c_store, c.quantity AS c_quantity, c.price AS c_price,
+                       c.date AS c_date, c.amount AS c_amount, c.unit_price AS c_unit_price,
+                       e.id AS e_id, e.store AS e_store, e.quantity AS e_quantity, e.price AS e_price,
+                       e.date AS e_date, e.amount AS e_amount, e.unit_price AS e_unit_price
+                FROM groups g
+                JOIN items c ON c.item_key = g.item_key AND c.unit = g.unit AND c.cheapest_rank = 1
+                JOIN items e ON e.item_key = g.item_key AND e.unit = g.unit AND e.dearest_rank = 1
+            )
+        """
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(comparable_groups + "SELECT COUNT(*), COALESCE(SUM(savings), 0) FROM comparisons",
+                           (user_id,))
+            total, total_savings = cursor.fetchone()
+
+            cursor.execute(comparable_groups + f"""
+                SELECT item_key, item_name, entry_count, store_count, savings, savings_pct, all_stores,
+                       c_id, c_store, c_quantity, c_price, c_date, c_amount, c_unit_price,
+                       e_id, e_store, e_quantity, e_price, e_date, e_amount, e_unit_price, unit
+                FROM comparisons
+                ORDER BY {COMPARISON_SORTS[sort]}
+                LIMIT ? OFFSET ?
+            """, (user_id, limit, offset))
             rows = cursor.fetchall()
-        
-        return [
-            {
-                "id": row[0],
-                "itemName": row[1],
-                "store": row[2],
-                "quantity": row[3],
-                "price": row[4],
-                "date": row[5],
-                "created_at": row[6]
+
+        def entry(values, unit):
+            entry = dict(zip(("id", "store", "quantity", "price", "date", "amount", "unitPrice"), values))
+            entry["unit"] = unit
+            return entry
+
+        return {
+            "items": [
+                {
+                    "itemName": row[1],
+                    "productId": row[0],
+                    "unit": row[21],
+                    "entryCount": row[2],
+                    "storeCount": row[3],
+                    "savings": round(row[4], 2),
+                    "savingsPercentage": round(row[5], 1),
+                    "allStores": json.loads(row[6]),
+                    "cheapest": entry(row[7:14], row[21]),
+                    "mostExpensive": entry(row[14:21], row[21])
+                }
+                for row in rows
+            ],
+            "total": total,
+            "total_savings": round(total_savings, 2),
+            "limit": limit,
+            "offset": offset
+        }
+
+    @run_in_db_executor
+    def get_price_history(self, user_id: int, product_id: Optional[str] = None, item_name: Optional[str] = None,
+                          bucket: str = "week", date_from: Optional[str] = None, date_to: Optional[str] = None,
+                          stores: Optional[List[str]] = None, by_store: bool = False) -> Optional[Dict]:
+        """Unit price of one product over time, downsampled into day, week or month buckets.
+
+        The product is given by id or by an item name matched the same way
+        new items are. Each point has the min, average and max unit price of
+        the purchases in its period (per store with ``by_store``). Returns
+        None when the product is unknown.
+        """
+        if bucket not in PRICE_HISTORY_BUCKETS:
+            raise ValueError(f"Unknown bucket: {bucket}. Supported: {', '.join(PRICE_HISTORY_BUCKETS)}")
+        if not product_id and not item_name:
+            raise ValueError("Either product_id or item_name is required")
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if not product_id:
+                product_id = self.products.lookup(cursor, user_id, item_name)
+            product = cursor.execute(
+                'SELECT id, name FROM products WHERE id = ? AND user_id = ?', (product_id, user_id)
+            ).fetchone() if product_id else None
+            if not product:
+                return None
+
+            conditions = ["user_id = ?", "product_id = ?"]
+            params = [user_id, product_id]
+            if date_from:
+                conditions.append("date >= ?")
+                params.append(date_from)
+            if date_to:
+                conditions.append("date <= ?")
+                params.append(date_to)
+            if stores:
+                canonical = sorted({self.canonical_store_name(store) for store in stores})
+                conditions.append(f"store IN ({', '.join('?' for _ in canonical)})")
+                params.extend(canonical)
+
+            group = ["period", "unit"] + (["store"] if by_store else [])
+            rows = cursor.execute(f"""
+                SELECT {PRICE_HISTORY_BUCKETS[bucket]} AS period, unit, {'store' if by_store else 'NULL'},
+                       MIN(unit_price), AVG(unit_price), MAX(unit_price), COUNT(*), SUM(price)
+                FROM price_history
+                WHERE {' AND '.join(conditions)}
+                GROUP BY {', '.join(group)}
+                ORDER BY {', '.join(group)}
+            """, params).fetchall()
+
+        points = []
+        for row in rows:
+            point = {
+                "period": row[0],
+                "unit": row[1],
+                "minUnitPrice": round(row[3], 4),
+                "avgUnitPrice": round(row[4], 4),
+                "maxUnitPrice": round(row[5], 4),
+                "purchases": row[6],
+                "totalSpent": round(row[7], 2)
             }
-            for row in rows
-        ]
-    
-    async def update_grocery_item(self, item_id: str, item_data: Dict, user_id: int = 1) -> Dict:
+            if by_store:
+                point["store"] = row[2]
+            points.append(point)
+
+        return {
+            "productId": product[0],
+            "name": product[1],
+            "bucket": bucket,
+            "points": points
+        }
+
+    @run_in_db_executor
+    def get_store_summary(self, user_id: int, preview: int = 0) -> List[Dict]:
+        """Get total spend and item count per store from the store_summaries aggregate.
+
+        With ``preview`` > 0, each store also includes its most recent items.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT store, total_spent, item_count FROM store_summaries
+                WHERE user_id = ? ORDER BY total_spent DESC
+            ''', (user_id,))
+            summaries = [
+                {
+                    "store": row[0],
+                    "totalSpent": round(row[1], 2),
+                    "itemCount": row[2]
+                }
+                for row in cursor.fetchall()
+            ]
+
+            if preview > 0:
+                for summary in summaries:
+                    cursor.execute('''
+                        SELECT id, item_name, store, quantity, price, date, created_at
+                        FROM grocery_items WHERE user_id = ? AND store = ?
+                        ORDER BY created_at DESC, id DESC LIMIT ?
+                    ''', (user_id, summary["store"], preview))
+                    summary["items"] = [
+                        dict(zip(GROCERY_ITEM_FIELDS, row)) for row in cursor.fetchall()
+                    ]
+
+        return summaries
+
+    @run_in_db_executor
+    def update_grocery_item(self, item_id: str, item_data: Dict, user_id: int = 1) -> Dict:
         """Update a grocery item"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -623,16 +1538,21 @@ class SQLiteDatabase:
 
             # Update the item
             item_name = item_data.get("itemName", existing_item[1])
-            store = item_data.get("store", existing_item[2])
+            store = self.canonical_store_name(item_data["store"]) if "store" in item_data else existing_item[2]
             quantity = item_data.get("quantity", existing_item[3])
             price = float(item_data.get("price", existing_item[4]))
+            product_id = self.products.resolve(cursor, user_id, item_name)
+            parsed = quantity_columns(quantity, price, item_name)
 
             cursor.execute('''
                 UPDATE grocery_items
-                SET item_name = ?, store = ?, quantity = ?, price = ?
+                SET item_name = ?, store = ?, quantity = ?, price = ?, product_id = ?,
+                    amount = ?, unit = ?, unit_price = ?
                 WHERE id = ? AND user_id = ?
-            ''', (item_name, store, quantity, price, item_id, user_id))
+            ''', (item_name, store, quantity, price, product_id,
+                  parsed["amount"], parsed["unit"], parsed["unit_price"], item_id, user_id))
             conn.commit()
+            self._fire_invalidation("grocery_items", user_id)
 
             # Return updated item
             return {
@@ -642,46 +1562,196 @@ class SQLiteDatabase:
                 "quantity": quantity,
                 "price": price,
                 "date": existing_item[5],
-                "created_at": existing_item[6]
+                "created_at": existing_item[6],
+                "productId": product_id,
+                "amount": parsed["amount"],
+                "unit": parsed["unit"],
+                "unitPrice": parsed["unit_price"]
             }
 
-    async def delete_grocery_item(self, item_id: str, user_id: int = 1) -> bool:
+    @run_in_db_executor
+    def delete_grocery_item(self, item_id: str, user_id: int = 1) -> bool:
         """Delete a grocery item by ID"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM grocery_items WHERE id = ? AND user_id = ?", (item_id, user_id))
             conn.commit()
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+        if deleted:
+            self._fire_invalidation("grocery_items", user_id)
+        return deleted
     
+    @run_in_db_executor
+    def backfill_store_names(self, force: bool = True) -> Dict:
+        """Rewrite stored store names to their canonical form.
+
+        Works per (user, store) pair from the store_summaries aggregate so each
+        update uses the (user_id, store) index, one short transaction at a time.
+        New names are canonicalized as they are saved, so unless ``force`` is
+        set this only runs when the aliases or matching rules have changed
+        since the last completed backfill.
+        """
+        conn = self.get_connection()
+        fingerprint = self.stores.fingerprint()
+        if not force and conn.execute(
+            'SELECT 1 FROM store_backfills WHERE fingerprint = ?', (fingerprint,)
+        ).fetchone():
+            return {"skipped": True, "stores_renamed": {}, "items_updated": 0, "scans_updated": 0}
+
+        pairs = conn.execute('SELECT user_id, store FROM store_summaries').fetchall()
+        renamed = {}
+        items_updated = 0
+        affected_users = set()
+
+        for user_id, store in pairs:
+            canonical = self.canonical_store_name(store)
+            if canonical == store:
+                continue
+            with conn:
+                cursor = conn.execute(
+                    'UPDATE grocery_items SET store = ? WHERE user_id = ? AND store = ?',
+                    (canonical, user_id, store)
+                )
+            items_updated += cursor.rowcount
+            renamed[store] = canonical
+            affected_users.add(user_id)
+
+        scans_updated = 0
+        for (store,) in conn.execute('SELECT DISTINCT store_name FROM receipt_scans WHERE store_name IS NOT NULL').fetchall():
+            canonical = self.canonical_store_name(store)
+            if canonical != store:
+                with conn:
+                    scans_updated += conn.execute(
+                        'UPDATE receipt_scans SET store_name = ? WHERE store_name = ?', (canonical, store)
+                    ).rowcount
+
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO store_backfills (fingerprint, completed_at) VALUES (?, ?)',
+                (fingerprint, datetime.utcnow().isoformat())
+            )
+
+        for user_id in affected_users:
+            self._fire_invalidation("grocery_items", user_id)
+        if renamed:
+            logger.info(f"Canonicalized {len(renamed)} store names across {items_updated} grocery items")
+        return {
+            "skipped": False,
+            "stores_renamed": renamed,
+            "items_updated": items_updated,
+            "scans_updated": scans_updated
+        }
+
     # Receipt Scan operations
-    async def save_receipt_scan(self, scan_data: Dict, user_id: int = 1) -> str:
-        """Save receipt scan results"""
+    def _insert_receipt_scan(self, cursor, scan_data: Dict, user_id: int) -> str:
         scan_id = str(uuid.uuid4())
+        cursor.execute('''
+            INSERT INTO receipt_scans
+            (id, filename, file_size, processing_status, confidence_score,
+             store_name, total_amount, items_count, scan_result, created_at, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            scan_id,
+            scan_data.get("filename", "unknown"),
+            scan_data.get("file_size", 0),
+            scan_data.get("processing_status", "success"),
+            scan_data.get("confidence_score", 0.0),
+            self.canonical_store_name(scan_data["store_name"]) if scan_data.get("store_name") else None,
+            scan_data.get("total_amount"),
+            scan_data.get("items_count", 0),
+            json.dumps(scan_data.get("scan_result", {})),
+            datetime.utcnow().isoformat(),
+            user_id
+        ))
+        return scan_id
 
+    @run_in_db_executor
+    def save_receipt_scan(self, scan_data: Dict, user_id: int = 1) -> str:
+        """Save receipt scan results"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO receipt_scans
-                (id, filename, file_size, processing_status, confidence_score,
-                 store_name, total_amount, items_count, scan_result, created_at, user_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                scan_id,
-                scan_data.get("filename", "unknown"),
-                scan_data.get("file_size", 0),
-                scan_data.get("processing_status", "success"),
-                scan_data.get("confidence_score", 0.0),
-                scan_data.get("store_name"),
-                scan_data.get("total_amount"),
-                scan_data.get("items_count", 0),
-                json.dumps(scan_data.get("scan_result", {})),
-                datetime.utcnow().isoformat(),
-                user_id
-            ))
-            conn.commit()
+            scan_id = self._insert_receipt_scan(conn.cursor(), scan_data, user_id)
+        self._fire_invalidation("receipt_scans", user_id)
 
         return scan_id
 
+    # Scan Job operations
+    @run_in_db_executor
+    def create_scan_job(self, job_id: str, user_id: int, filename: str, file_size: int) -> Dict:
+        """Record a newly queued receipt scan job"""
+        job = {
+            "id": job_id,
+            "user_id": user_id,
+            "filename": filename,
+            "file_size": file_size,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None
+        }
+
+        with self.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO scan_jobs (id, user_id, filename, file_size, status, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (job_id, user_id, filename, file_size, job["status"], job["created_at"]))
+
+        return job
+
+    @run_in_db_executor
+    def update_scan_job(self, job_id: str, status: str, result: Optional[Dict] = None,
+                        error: Optional[str] = None):
+        """Move a scan job to a new status, storing its result or error when finished"""
+        now = datetime.utcnow().isoformat()
+        with self.get_connection() as conn:
+            if status == "processing":
+                conn.execute(
+                    "UPDATE scan_jobs SET status = ?, started_at = ? WHERE id = ?",
+                    (status, now, job_id)
+                )
+            else:
+                conn.execute('''
+                    UPDATE scan_jobs SET status = ?, result = ?, error = ?, finished_at = ?
+                    WHERE id = ?
+                ''', (status, json.dumps(result) if result is not None else None, error, now, job_id))
+
+    @run_in_db_executor
+    def get_scan_job(self, job_id: str, user_id: int) -> Optional[Dict]:
+        """Get a scan job belonging to a user"""
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT id, user_id, filename, file_size, status, result, error,
+                       created_at, started_at, finished_at
+                FROM scan_jobs WHERE id = ? AND user_id = ?
+            ''', (job_id, user_id)).fetchone()
+
+        if not row:
+            return None
+
+        return {
+            "id": row[0],
+            "user_id": row[1],
+            "filename": row[2],
+            "file_size": row[3],
+            "status": row[4],
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": row[6],
+            "created_at": row[7],
+            "started_at": row[8],
+            "finished_at": row[9]
+        }
+
+    @run_in_db_executor
+    def fail_interrupted_scan_jobs(self) -> int:
+        """Mark jobs left queued or processing by a previous process as failed"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE scan_jobs SET status = 'failed', error = ?, finished_at = ?
+                WHERE status IN ('queued', 'processing')
+            ''', ("Interrupted by server restart", datetime.utcnow().isoformat()))
+            return cursor.rowcount
+
 # Global database instance
 import os
 from pathlib import Path
@@ -0,0 +1,312 @@
+"""
+Product name normalization for GroziOne backend
+Turns receipt item names ("TSC SEMI SKM MLK 2PT") into comparable product
+keys ("milk semi skimmed") and matches them to the user's known products
+through a persistent token/trigram inverted index, and parses quantities
+("2 x 500g") into amounts in base units for per-kg/per-litre prices
+"""
+
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+PRODUCT_MATCH_THRESHOLD = float(os.getenv("PRODUCT_MATCH_THRESHOLD", "0.85"))
+# Most-overlapping indexed products that are scored against a new name
+PRODUCT_CANDIDATES = 20
+
+# Common receipt abbreviations; values may expand to several words
+ABBREVIATIONS = {
+    "mlk": "milk", "mk": "milk", "skm": "skimmed", "skmd": "skimmed", "skim": "skimmed",
+    "sskm": "semi skimmed", "ss": "semi skimmed", "whl": "whole", "wh": "whole",
+    "brd": "bread", "wht": "white", "brwn": "brown", "brn": "brown",
+    "wmeal": "wholemeal", "wml": "wholemeal", "chkn": "chicken", "chk": "chicken",
+    "bf": "beef", "grnd": "ground", "btr": "butter", "chs": "cheese",
+    "ched": "cheddar", "chdr": "cheddar", "mat": "mature", "yog": "yoghurt", "ygt": "yoghurt",
+    "yogurt": "yoghurt", "crm": "cream", "dbl": "double", "sgl": "single", "choc": "chocolate",
+    "bisc": "biscuits", "biscs": "biscuits", "tom": "tomato", "toms": "tomatoes",
+    "pot": "potato", "pots": "potatoes", "bnna": "banana", "bnnas": "bananas", "veg": "vegetable",
+    "org": "organic", "frz": "frozen", "frzn": "frozen", "fz": "frozen", "fr": "free",
+    "rng": "range", "lg": "large", "lge": "large", "med": "medium", "sml": "small",
+    "swt": "sweet", "sw": "sweet", "grn": "green", "rd": "red", "ylw": "yellow",
+    "appl": "apple", "apls": "apples", "orng": "orange", "strwb": "strawberries",
+    "strawb": "strawberries", "juc": "juice", "jce": "juice", "wtr": "water", "spkl": "sparkling",
+    "pnt": "peanut", "sce": "sauce", "pza": "pizza", "sld": "salad", "stk": "steak",
+    "smkd": "smoked", "unsmkd": "unsmoked", "bcn": "bacon", "saus": "sausages",
+    "brst": "breast", "flt": "fillet", "flts": "fillets",
+}
+
+# Store own-brand prefixes and filler words that don't identify a product
+STOP_WORDS = {
+    "tsc", "tesco", "asda", "aldi", "lidl", "sains", "sainsburys", "js", "morrisons", "ms",
+    "coop", "waitrose", "iceland", "finest", "value", "everyday", "essential", "essentials",
+    "the", "and", "with", "of", "in", "a", "each", "ea", "x", "pk", "pack",
+}
+
+# Words ending in "s" that are not plurals
+NOT_PLURALS = {"hummus", "asparagus", "couscous", "swiss", "citrus", "molasses", "grass", "cress", "chips"}
+
+SIZE_PATTERN = re.compile(
+    r'(?<![a-z0-9.])(\d+(?:[.,]\d+)?)\s*'
+    r'(kg|kilos?|g|gms?|grams?|gr|l|ltrs?|litres?|liters?|ml|cl|pts?|pints?|oz|lbs?)(?![a-z])'
+)
+SIZE_UNITS = {
+    "kg": "kg", "kilo": "kg", "kilos": "kg",
+    "g": "g", "gm": "g", "gms": "g", "gram": "g", "grams": "g", "gr": "g",
+    "l": "l", "ltr": "l", "ltrs": "l", "litre": "l", "litres": "l", "liter": "l", "liters": "l",
+    "ml": "ml", "cl": "cl",
+    "pt": "pt", "pts": "pt", "pint": "pt", "pints": "pt",
+    "oz": "oz", "lb": "lb", "lbs": "lb",
+}
+
+# Size unit -> (base unit, factor); unit prices are per kg, per litre or per piece
+BASE_UNITS = {
+    "kg": ("kg", 1.0), "g": ("kg", 0.001), "oz": ("kg", 0.0283495), "lb": ("kg", 0.453592),
+    "l": ("l", 1.0), "ml": ("l", 0.001), "cl": ("l", 0.01), "pt": ("l", 0.568261),
+}
+COUNT_UNIT = "pcs"
+
+QUANTITY_PATTERN = re.compile(r'^\s*(\d+(?:[.,]\d+)?)\s*([a-z]*)\.?\s*$')
+MULTIPACK_PATTERN = re.compile(r'^\s*(\d+)\s*[x*×]\s*(.+)$')
+
+
+def singular(token: str) -> str:
+    if len(token) <= 3 or token in NOT_PLURALS or token.endswith("ss"):
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("oes"):
+        return token[:-2]
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def extract_size(item_name: str) -> Optional[Dict]:
+    """Pack size printed in an item name, e.g. "MLK 2PT" -> {"amount": 2.0, "unit": "pt"}"""
+    match = SIZE_PATTERN.search(item_name.lower())
+    if not match:
+        return None
+    return {"amount": float(match.group(1).replace(",", ".")), "unit": SIZE_UNITS[match.group(2)]}
+
+
+def to_base_unit(amount: float, unit: str) -> Dict:
+    """Convert an amount in a size unit ("500", "g") to its base unit (0.5 kg)"""
+    base, factor = BASE_UNITS[unit]
+    return {"amount": round(amount * factor, 6), "unit": base}
+
+
+def parse_quantity(quantity, item_name: str = "") -> Dict:
+    """Amount and base unit of a quantity, e.g. "2 x 500g" -> 1.0 kg.
+
+    Counts ("3 pcs") of an item whose name carries a pack size ("MLK 2PT")
+    are converted to the total size, so they compare per litre or per kg.
+    Quantities that can't be parsed, and zero or negative ones ("0 kg"),
+    count as one piece, so the amount is always positive.
+    """
+    parsed = _parse_quantity(str(quantity if quantity is not None else "").lower().strip(), item_name)
+    if parsed["amount"] <= 0:
+        return {"amount": 1.0, "unit": COUNT_UNIT}
+    return parsed
+
+
+def _parse_quantity(text: str, item_name: str) -> Dict:
+    if text.startswith("-"):
+        text = ""
+    count = 1.0
+    multipack = MULTIPACK_PATTERN.match(text)
+    if multipack:
+        count = float(multipack.group(1))
+        text = multipack.group(2)
+
+    match = QUANTITY_PATTERN.match(text)
+    if match:
+        amount = float(match.group(1).replace(",", ".")) * count
+        unit = match.group(2)
+        if unit in SIZE_UNITS:
+            return to_base_unit(amount, SIZE_UNITS[unit])
+        # "3 pcs", "2 each", "1 bunch": a count
+        count = amount
+    elif not multipack and SIZE_PATTERN.search(text):
+        size = extract_size(text)
+        return to_base_unit(size["amount"], size["unit"])
+
+    size = extract_size(item_name or "")
+    if size and size["amount"] > 0 and count > 0:
+        return to_base_unit(size["amount"] * count, size["unit"])
+    return {"amount": count if count > 0 else 1.0, "unit": COUNT_UNIT}
+
+
+def quantity_columns(quantity, price: float, item_name: str = "") -> Dict:
+    """The amount, unit and unit_price columns of a grocery item"""
+    parsed = parse_quantity(quantity, item_name)
+    return {
+        "amount": parsed["amount"],
+        "unit": parsed["unit"],
+        "unit_price": round(float(price) / parsed["amount"], 4)
+    }
+
+
+def tokenize_product_name(item_name: str) -> List[str]:
+    """Normalized, abbreviation-expanded tokens of an item name, in order"""
+    text = SIZE_PATTERN.sub(" ", item_name.lower().replace("&", " and ").replace("'", ""))
+    tokens = []
+    for raw in re.split(r"[^a-z0-9]+", text):
+        # Bare numbers and counts such as "12pk" or "6x"
+        if not raw or raw[0].isdigit():
+            continue
+        for token in ABBREVIATIONS.get(raw, raw).split():
+            token = singular(token)
+            if len(token) > 1 and token not in STOP_WORDS and token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def parse_product_name(item_name: str) -> Dict:
+    """Product key (order-independent), display name, tokens and pack size"""
+    tokens = tokenize_product_name(item_name or "")
+    if not tokens:
+        fallback = " ".join((item_name or "").lower().split()) or "unknown item"
+        tokens = [fallback]
+    return {
+        "key": " ".join(sorted(tokens)),
+        "name": " ".join(tokens),
+        "tokens": tokens,
+        "size": extract_size(item_name or "")
+    }
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def index_terms(parsed: Dict) -> List[str]:
+    """Inverted index terms for a product: its words and its key's trigrams"""
+    return [f"w:{token}" for token in parsed["tokens"]] + [f"g:{gram}" for gram in sorted(trigrams(parsed["key"]))]
+
+
+class ProductIndex:
+    """Assigns a stable product id to each item name, per user.
+
+    Every normalized key a user has bought maps to a product in
+    ``product_keys``. New keys are matched against the user's existing
+    products through ``product_terms`` (an inverted index of words and
+    trigrams): the products sharing the most terms are scored by trigram
+    similarity and the best one above ``threshold`` is reused, otherwise a
+    new product is created. All work happens on the caller's cursor, inside
+    the caller's transaction.
+    """
+
+    def __init__(self, threshold: float = PRODUCT_MATCH_THRESHOLD):
+        self.threshold = threshold
+
+    def resolve(self, cursor, user_id: int, item_name: str) -> str:
+        """Product id for an item name, creating the product if needed"""
+        parsed = parse_product_name(item_name)
+        row = cursor.execute(
+            'SELECT product_id FROM product_keys WHERE user_id = ? AND key = ?', (user_id, parsed["key"])
+        ).fetchone()
+        if row:
+            return row[0]
+
+        product_id = self._best_match(cursor, user_id, parsed)
+        created = product_id is None
+        if created:
+            product_id = str(uuid.uuid4())
+        # Claim the key first: a concurrent writer may have registered it
+        # since the lookup above, in which case its product wins
+        cursor.execute(
+            'INSERT OR IGNORE INTO product_keys (user_id, key, product_id) VALUES (?, ?, ?)',
+            (user_id, parsed["key"], product_id)
+        )
+        if cursor.rowcount == 0:
+            return cursor.execute(
+                'SELECT product_id FROM product_keys WHERE user_id = ? AND key = ?', (user_id, parsed["key"])
+            ).fetchone()[0]
+        if created:
+            cursor.execute(
+                'INSERT INTO products (id, user_id, key, name, created_at) VALUES (?, ?, ?, ?, ?)',
+                (product_id, user_id, parsed["key"], parsed["name"], datetime.utcnow().isoformat())
+            )
+        cursor.executemany(
+            'INSERT OR IGNORE INTO product_terms (user_id, term, product_id) VALUES (?, ?, ?)',
+            [(user_id, term, product_id) for term in index_terms(parsed)]
+        )
+        return product_id
+
+    def lookup(self, cursor, user_id: int, item_name: str) -> Optional[str]:
+        """Product id an item name would resolve to, without creating one"""
+        parsed = parse_product_name(item_name)
+        row = cursor.execute(
+            'SELECT product_id FROM product_keys WHERE user_id = ? AND key = ?', (user_id, parsed["key"])
+        ).fetchone()
+        if row:
+            return row[0]
+        return self._best_match(cursor, user_id, parsed)
+
+    def _best_match(self, cursor, user_id: int, parsed: Dict) -> Optional[str]:
+        terms = index_terms(parsed)
+        placeholders = ", ".join("?" for _ in terms)
+        candidates = cursor.execute(f'''
+            SELECT product_id,
+                   SUM(CASE WHEN term LIKE 'w:%' THEN 1 ELSE 0 END) AS shared_words
+            FROM product_terms
+            WHERE user_id = ? AND term IN ({placeholders})
+            GROUP BY product_id
+            ORDER BY COUNT(*) DESC
+            LIMIT ?
+        ''', (user_id, *terms, PRODUCT_CANDIDATES)).fetchall()
+        # A match must share at least one whole word, not just letters
+        candidate_ids = [product_id for product_id, shared_words in candidates if shared_words]
+        if not candidate_ids:
+            return None
+
+        placeholders = ", ".join("?" for _ in candidate_ids)
+        keys = cursor.execute(
+            f'SELECT product_id, key FROM product_keys WHERE user_id = ? AND product_id IN ({placeholders})',
+            (user_id, *candidate_ids)
+        ).fetchall()
+
+        grams = trigrams(parsed["key"])
+        best_score, best = 0.0, None
+        for product_id, key in keys:
+            key_grams = trigrams(key)
+            score = 2 * len(grams & key_grams) / (len(grams) + len(key_grams))
+            if score > best_score:
+                best_score, best = score, product_id
+        return best if best_score >= self.threshold else None
+
+
+def backfill_product_ids(cursor, index: Optional[ProductIndex] = None, batch_size: int = 500):
+    """Assign product ids to grocery items that don't have one yet"""
+    index = index or ProductIndex()
+    rows = cursor.execute(
+        'SELECT id, user_id, item_name FROM grocery_items WHERE product_id IS NULL'
+    ).fetchall()
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(
+            'UPDATE grocery_items SET product_id = ? WHERE id = ?',
+            [(index.resolve(cursor, user_id, item_name), item_id)
+             for item_id, user_id, item_name in rows[start:start + batch_size]]
+        )
+
+
+def backfill_unit_prices(cursor, batch_size: int = 500):
+    """Parse the quantity of grocery items that have no unit price yet"""
+    rows = cursor.execute(
+        'SELECT id, quantity, price, item_name FROM grocery_items WHERE unit_price IS NULL'
+    ).fetchall()
+    for start in range(0, len(rows), batch_size):
+        updates = []
+        for item_id, quantity, price, item_name in rows[start:start + batch_size]:
+            columns = quantity_columns(quantity, price or 0, item_name)
+            updates.append((columns["amount"], columns["unit"], columns["unit_price"], item_id))
+        cursor.executemany('UPDATE grocery_items SET amount = ?, unit = ?, unit_price = ? WHERE id = ?', updates)
+
+
+__all__ = [
+    "ProductIndex", "backfill_product_ids", "backfill_unit_prices", "extract_size",
+    "parse_product_name", "parse_quantity", "quantity_columns"
+]
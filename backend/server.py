@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Depends, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -6,12 +7,29 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
+import asyncio
+import json
+import time
 import uuid
 import jwt
 from datetime import datetime, timedelta
 from services.receipt_processor import ReceiptProcessor
-from database import db
+from services.scan_jobs import ScanJobManager, ScanQueueFullError, UserScanLimitError, TERMINAL_STATUSES
+from database import db, DatabaseBusyError, GROCERY_ITEM_FIELDS
+from cache import TTLCache
+from credentials import CredentialBusyError
+from auth_tokens import ACCESS_TOKEN, REFRESH_TOKEN, TokenVerifier
+from analytics import SpendAnalytics
+from config import settings
+from services.item_transfer import (
+    EXPORT_BATCH_SIZE, EXPORT_MEDIA_TYPES, IMPORT_MAX_REPORTED_ERRORS, IMPORT_MAX_SIZE, UnsupportedFormatError,
+    check_export_format, detach_upload, export_items, import_batches, import_format
+)
+from services.uploads import (
+    MULTIPART_OVERHEAD, FormatUnavailableError, UnsupportedUploadError, UploadSizeLimitMiddleware, UploadTooLargeError,
+    receive_upload, upload_pages
+)
 
 
 ROOT_DIR = Path(__file__).parent
@@ -21,9 +39,17 @@ load_dotenv(ROOT_DIR / '.env')
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+
+# Largest number of items accepted by one batch insert
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "1000"))
+
+# Largest number of receipts accepted by one batch scan
+SCAN_BATCH_MAX_FILES = int(os.getenv("SCAN_BATCH_MAX_FILES", "10"))
 
 # Security
 security = HTTPBearer()
+token_verifier = TokenVerifier(SECRET_KEY, ALGORITHM, db.revocations)
 
 # Create the main app without a prefix
 app = FastAPI(
@@ -35,8 +61,91 @@ app = FastAPI(
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Initialize receipt processor
-receipt_processor = ReceiptProcessor()
+# Admin read caches, dropped by database writes that change what they show.
+# Set ADMIN_CACHE_STALE_TTL > 0 to serve stale data while refreshing in the background.
+ADMIN_CACHE_TTL = float(os.getenv("ADMIN_CACHE_TTL", "30"))
+ADMIN_CACHE_STALE_TTL = float(os.getenv("ADMIN_CACHE_STALE_TTL", "0"))
+dashboard_cache = TTLCache("admin_dashboard", maxsize=1, ttl=ADMIN_CACHE_TTL, stale_ttl=ADMIN_CACHE_STALE_TTL)
+users_cache = TTLCache("users", maxsize=1, ttl=ADMIN_CACHE_TTL, stale_ttl=ADMIN_CACHE_STALE_TTL)
+
+
+def invalidate_admin_caches(table: str, user_id: Optional[int]):
+    """Drop cached admin views affected by a write to ``table``"""
+    dashboard_cache.invalidate()
+    if table == "users":
+        users_cache.invalidate()
+
+
+db.add_invalidation_hook(invalidate_admin_caches)
+
+# Per-user spend analytics frames, retired by writes to the user's items
+analytics = SpendAnalytics(db)
+db.add_invalidation_hook(analytics.invalidate)
+
+# Initialize receipt processor; extracted store names are canonicalized
+receipt_processor = ReceiptProcessor(store_resolver=db.canonical_store_name)
+
+# Background receipt scanning
+SCAN_JOB_STREAM_TIMEOUT = 300
+# How often jobs this process isn't running are re-read while waiting on them
+SCAN_JOB_POLL_INTERVAL = float(os.getenv("SCAN_JOB_POLL_INTERVAL", "2"))
+scan_jobs = ScanJobManager(receipt_processor, db)
+
+
+@app.on_event("startup")
+async def start_scan_jobs():
+    """Start the background receipt scan workers"""
+    await scan_jobs.start()
+
+
+@app.on_event("startup")
+async def start_store_backfill():
+    """Canonicalize saved store names when the aliases or matching rules have changed"""
+    async def backfill():
+        try:
+            await db.backfill_store_names(force=False)
+        except Exception as e:
+            logger.error(f"Store name backfill failed: {e}")
+
+    app.state.store_backfill = asyncio.create_task(backfill())
+
+
+@app.on_event("shutdown")
+async def stop_scan_jobs():
+    """Stop the background receipt scan workers"""
+    await scan_jobs.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_receipt_processor():
+    """Release pooled HTTP connections held by the receipt processor"""
+    await receipt_processor.close()
+
+
+@app.exception_handler(DatabaseBusyError)
+async def database_busy_handler(request: Request, exc: DatabaseBusyError):
+    """Turn database backpressure into a retryable 503"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(CredentialBusyError)
+async def credential_busy_handler(request: Request, exc: CredentialBusyError):
+    """Turn password hashing backpressure into a retryable 503"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_database():
+    """Close pooled database connections"""
+    db.close()
 
 
 # Health check endpoint
@@ -83,21 +192,46 @@ class ResetPasswordRequest(BaseModel):
     token: str
     new_password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class Token(BaseModel):
     access_token: str
     token_type: str
     user: dict
+    refresh_token: Optional[str] = None
 
 # Authentication Functions
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return token_verifier.issue(data, expires_delta or timedelta(minutes=15), ACCESS_TOKEN)
+
+def create_refresh_token(user_id: int, session_id: str, refresh_jti: str):
+    return token_verifier.issue(
+        {"user_id": user_id, "sid": session_id, "jti": refresh_jti},
+        timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS), REFRESH_TOKEN
+    )
+
+def refresh_token_expiry() -> float:
+    """Unix time at which a refresh token issued now expires"""
+    return time.time() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS).total_seconds()
+
+def issue_tokens(user: dict, session_id: str, refresh_jti: str) -> dict:
+    """Access and refresh token pair for a user's session, in the Token response shape"""
+    access_token = create_access_token(
+        data={
+            "user_id": user["id"],
+            "username": user["username"],
+            "role": user["role"],
+            "sid": session_id
+        },
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": create_refresh_token(user["id"], session_id, refresh_jti),
+        "token_type": "bearer",
+        "user": user
+    }
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     credentials_exception = HTTPException(
@@ -106,11 +240,16 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_verifier.verify(credentials.credentials)
         user_id: int = payload.get("user_id")
         if user_id is None:
             raise credentials_exception
-        return {"user_id": user_id, "username": payload.get("username"), "role": payload.get("role")}
+        return {
+            "user_id": user_id,
+            "username": payload.get("username"),
+            "role": payload.get("role"),
+            "session_id": payload.get("sid")
+        }
     except jwt.PyJWTError:
         raise credentials_exception
 
@@ -151,21 +290,56 @@ async def login(user_login: UserLogin):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={
-            "user_id": result["user"]["id"],
-            "username": result["user"]["username"],
-            "role": result["user"]["role"]
-        },
-        expires_delta=access_token_expires
+    session = await db.create_session(result["user"]["id"], refresh_token_expiry())
+    return issue_tokens(result["user"], session["session_id"], session["refresh_jti"])
+
+@api_router.post("/token/refresh", response_model=Token)
+async def refresh_token(request: RefreshRequest):
+    """Exchange a refresh token for a new access token and refresh token.
+
+    Each refresh token can be exchanged once; reusing one that was already
+    exchanged revokes its whole session, since one of the two holders is
+    not the user.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
     )
+    try:
+        payload = token_verifier.verify(request.refresh_token, REFRESH_TOKEN)
+    except jwt.PyJWTError:
+        raise credentials_exception
 
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": result["user"]
-    }
+    # Refresh tokens issued before sessions were introduced can't be rotated
+    session_id, refresh_jti = payload.get("sid"), payload.get("jti")
+    if not session_id or not refresh_jti:
+        raise credentials_exception
+
+    # Re-read the user so the new access token carries the current role
+    user = await db.get_user_by_id(payload.get("user_id"))
+    if user is None:
+        raise credentials_exception
+    new_jti = await db.rotate_session(session_id, refresh_jti, refresh_token_expiry())
+    if new_jti is None:
+        raise credentials_exception
+    return issue_tokens(user, session_id, new_jti)
+
+@api_router.post("/logout")
+async def logout(current_user: dict = Depends(get_current_user)):
+    """Revoke the access and refresh tokens of the current session"""
+    if current_user["session_id"]:
+        await db.revoke_session(current_user["session_id"], current_user["user_id"])
+    else:
+        # Access tokens from before sessions: no narrower scope to revoke
+        await db.revoke_user_tokens(current_user["user_id"])
+    return {"message": "Logged out successfully"}
+
+@api_router.post("/logout/all")
+async def logout_everywhere(current_user: dict = Depends(get_current_user)):
+    """Revoke every access and refresh token issued to the current user, on every device"""
+    await db.revoke_user_tokens(current_user["user_id"])
+    return {"message": "Logged out of all sessions"}
 
 @api_router.post("/register")
 async def register_public(user_data: UserRegister):
@@ -252,7 +426,7 @@ async def reset_password(request: ResetPasswordRequest):
 @api_router.get("/users")
 async def get_users(current_user: dict = Depends(get_current_admin_user)):
     """Get all users (admin only)"""
-    users = await db.get_users()
+    users = await users_cache.get_or_compute("all", db.get_users)
     return {"users": users}
 
 @api_router.put("/admin/users/{user_id}")
@@ -302,15 +476,77 @@ async def delete_user(
 @api_router.get("/admin/dashboard")
 async def get_admin_dashboard(current_user: dict = Depends(get_current_admin_user)):
     """Get admin dashboard statistics"""
-    stats = await db.get_user_activity_stats()
+    stats = await dashboard_cache.get_or_compute("stats", db.get_user_activity_stats)
     return stats
 
+@api_router.get("/admin/metrics")
+async def get_admin_metrics(current_user: dict = Depends(get_current_admin_user)):
+    """Get backend performance metrics (admin only)"""
+    return {
+        "database": db.get_pool_stats(),
+        "database_executor": db.get_executor_stats(),
+        "password_hasher": db.passwords.stats(),
+        "auth_tokens": token_verifier.stats(),
+        "caches": {
+            cache.name: cache.stats() for cache in (dashboard_cache, users_cache, analytics.cache)
+        },
+        "receipt_cache": receipt_processor.result_cache.stats() if receipt_processor.result_cache else None,
+        "azure_circuit": receipt_processor.azure_breaker.stats(),
+        "store_names": db.stores.stats(),
+        "scan_jobs": scan_jobs.stats()
+    }
+
+@api_router.post("/admin/stores/backfill")
+async def backfill_store_names(current_user: dict = Depends(get_current_admin_user)):
+    """Rewrite saved store names to their canonical form (admin only)"""
+    try:
+        return await db.backfill_store_names()
+    except DatabaseBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to backfill store names: {str(e)}")
+
 @api_router.get("/me")
 async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """Get current user information"""
     return {"user": current_user}
 
 # Receipt scanning endpoints
+async def read_receipt_upload(file: UploadFile) -> Dict:
+    """Validate an uploaded receipt and return its page images and file info"""
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+
+    try:
+        upload = await receive_upload(file, settings.MAX_UPLOAD_SIZE, settings.ALLOWED_EXTENSIONS)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except FormatUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except UnsupportedUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        pages = await upload_pages(upload)
+    except UnsupportedUploadError as e:
+        upload.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    if upload.format == "pdf":
+        # Rendered pages are copies; an image page is the mapped upload itself,
+        # which is unmapped once the scan drops its last reference
+        upload.close()
+
+    return {
+        "pages": pages,
+        "file_info": {
+            "original_filename": file.filename,
+            "file_size": upload.size,
+            "format": upload.format,
+            "pages": len(pages),
+            "processing_status": "success"
+        }
+    }
+
 @api_router.post("/scan-receipt")
 async def scan_receipt(
     file: UploadFile = File(...),
@@ -320,42 +556,181 @@ async def scan_receipt(
     Process receipt image and extract structured grocery data
     """
     try:
-        # Validate file
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No file provided")
+        upload = await read_receipt_upload(file)
         
-        file_ext = file.filename.split('.')[-1].lower()
-        if file_ext not in ['jpg', 'jpeg', 'png']:
-            raise HTTPException(
-                status_code=400, 
-                detail="File type not allowed. Supported: jpg, jpeg, png"
-            )
-        
-        # Check file size (10MB limit)
-        content = await file.read()
-        if len(content) > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=413, 
-                detail="File too large. Maximum size: 10MB"
-            )
-        
-        # Process receipt
-        result = await receipt_processor.process_receipt(content)
+        # Process receipt; the pages of a PDF are extracted concurrently
+        result = await receipt_processor.process_pages(upload["pages"], current_user["user_id"])
         
         # Add metadata
-        result["file_info"] = {
-            "original_filename": file.filename,
-            "file_size": len(content),
-            "processing_status": "success"
-        }
+        result["file_info"] = upload["file_info"]
         
         return result
         
-    except HTTPException:
+    except (HTTPException, DatabaseBusyError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
+@api_router.post("/scan-receipts:batch")
+async def scan_receipts_batch(
+    files: List[UploadFile] = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Scan several receipts at once.
+
+    All receipts are processed concurrently (Azure calls are bounded by the
+    processor) and each result is streamed back as one NDJSON line as soon
+    as it is ready, so results arrive in completion order, not upload order.
+    """
+    if len(files) > SCAN_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many receipts. Maximum per batch: {SCAN_BATCH_MAX_FILES}"
+        )
+
+    # Uploads are only readable until this handler returns, so read them all
+    # now; an invalid file fails its own line rather than the whole batch
+    uploads = []
+    for index, file in enumerate(files):
+        try:
+            uploads.append((index, file.filename, await read_receipt_upload(file), None))
+        except HTTPException as e:
+            uploads.append((index, file.filename, None, e.detail))
+
+    async def scan(index: int, filename: str, upload: Optional[Dict], error: Optional[str]) -> Dict:
+        line = {"index": index, "filename": filename}
+        if error is not None:
+            return dict(line, status="failed", error=error)
+        try:
+            result = await receipt_processor.process_pages(upload["pages"], current_user["user_id"])
+        except Exception as e:
+            return dict(line, status="failed", error=f"Processing failed: {str(e)}")
+        result["file_info"] = upload["file_info"]
+        return dict(line, status="succeeded", result=result)
+
+    async def results():
+        tasks = [asyncio.create_task(scan(*upload)) for upload in uploads]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            # Stop scanning if the client goes away
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        results(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def scan_job_response(job: Dict) -> Dict:
+    """Public view of a scan job record"""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "filename": job["filename"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "result": job["result"],
+        "error": job["error"]
+    }
+
+async def wait_for_scan_job(job_id: str, user_id: int, timeout: float) -> Optional[Dict]:
+    """Latest record of a job once it finishes or ``timeout`` seconds pass.
+
+    Jobs run by this process wake the waiter as soon as they finish; others
+    (on another worker process) are re-read every SCAN_JOB_POLL_INTERVAL
+    seconds instead.
+    """
+    deadline = time.monotonic() + timeout
+    if await scan_jobs.wait_for(job_id, timeout) is None:
+        while True:
+            job = await db.get_scan_job(job_id, user_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in TERMINAL_STATUSES or remaining <= 0:
+                return job
+            await asyncio.sleep(min(SCAN_JOB_POLL_INTERVAL, remaining))
+    return await db.get_scan_job(job_id, user_id)
+
+@api_router.post("/scan-jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_scan_job(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Queue a receipt image for background scanning and return its job id"""
+    upload = await read_receipt_upload(file)
+
+    try:
+        job = await scan_jobs.submit(
+            current_user["user_id"], file.filename, upload["pages"], upload["file_info"]
+        )
+    except UserScanLimitError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except ScanQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+
+    return scan_job_response(job)
+
+@api_router.get("/scan-jobs/{job_id}")
+async def get_scan_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get scan job status and, once finished, its result.
+
+    With ``wait`` > 0 the request long-polls for up to that many seconds
+    until the job finishes.
+    """
+    job = await db.get_scan_job(job_id, current_user["user_id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+
+    if wait > 0 and job["status"] not in TERMINAL_STATUSES:
+        job = await wait_for_scan_job(job_id, current_user["user_id"], wait) or job
+
+    return scan_job_response(job)
+
+@api_router.get("/scan-jobs/{job_id}/events")
+async def stream_scan_job_events(job_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Server-sent events stream that pushes the job status and its final result.
+
+    Completion is pushed the moment it happens only when this process runs
+    the job; with several worker processes the stream falls back to polling.
+    """
+    job = await db.get_scan_job(job_id, current_user["user_id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+
+    async def events():
+        current = job
+        yield f"event: status\ndata: {json.dumps(scan_job_response(current))}\n\n"
+        deadline = time.monotonic() + SCAN_JOB_STREAM_TIMEOUT
+        while current["status"] not in TERMINAL_STATUSES and time.monotonic() < deadline:
+            latest = await wait_for_scan_job(job_id, current_user["user_id"], min(15, deadline - time.monotonic()))
+            if latest is None:
+                break
+            if latest["status"] == current["status"]:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(scan_job_response(latest))}\n\n"
+            current = latest
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.post("/confirm-receipt-items")
 async def confirm_receipt_items(
     items_data: dict,
@@ -373,25 +748,21 @@ async def confirm_receipt_items(
         if not items:
             raise HTTPException(status_code=400, detail="No items provided")
 
-        # Add items to database
-        added_items = []
-        total_amount = 0.0
-
-        for item in items:
-            grocery_item_data = {
+        # Build all items up front so they can be inserted in one transaction
+        purchase_date = datetime.utcnow().strftime('%Y-%m-%d')
+        grocery_items_data = [
+            {
                 "itemName": item.get('name', 'Unknown Item'),
                 "store": store_name,
                 "quantity": item.get('quantity', '1 kg'),
                 "price": float(item.get('total_price', 0)),
-                "date": datetime.utcnow().strftime('%Y-%m-%d')
+                "date": purchase_date
             }
+            for item in items
+        ]
+        total_amount = sum(item["price"] for item in grocery_items_data)
 
-            # Save to SQLite database
-            saved_item = await db.add_grocery_item(grocery_item_data, user_id)
-            added_items.append(saved_item)
-            total_amount += float(item.get('total_price', 0))
-
-        # Save receipt scan record
+        # Receipt scan record, saved atomically with the items
         scan_data = {
             "filename": items_data.get('filename', 'receipt.jpg'),
             "file_size": items_data.get('file_size', 0),
@@ -403,7 +774,9 @@ async def confirm_receipt_items(
             "scan_result": items_data
         }
 
-        scan_id = await db.save_receipt_scan(scan_data, user_id)
+        result = await db.add_grocery_items_batch(grocery_items_data, user_id, scan_data)
+        added_items = result["items"]
+        scan_id = result["scan_id"]
 
         return {
             "success": True,
@@ -412,16 +785,42 @@ async def confirm_receipt_items(
             "scan_id": scan_id
         }
 
+    except DatabaseBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add items: {str(e)}")
 
 # Grocery items management endpoints
 @api_router.get("/grocery-items")
-async def get_grocery_items(current_user: dict = Depends(get_current_user)):
-    """Get all grocery items for current user"""
+async def get_grocery_items(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    store: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get grocery items for current user, newest first.
+
+    Pass the returned next_cursor back as ``cursor`` to fetch the next page.
+    ``fields`` is a comma-separated list of item fields to return.
+    """
     try:
-        items = await db.get_grocery_items(user_id=current_user["user_id"])
-        return {"items": items}
+        return await db.get_grocery_items_page(
+            user_id=current_user["user_id"],
+            limit=limit,
+            cursor=cursor,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            store=store,
+            date_from=date_from,
+            date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DatabaseBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get items: {str(e)}")
 
@@ -431,9 +830,246 @@ async def add_grocery_item(item_data: dict, current_user: dict = Depends(get_cur
     try:
         saved_item = await db.add_grocery_item(item_data, user_id=current_user["user_id"])
         return {"success": True, "item": saved_item}
+    except DatabaseBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add item: {str(e)}")
 
+@api_router.get("/grocery-items:export")
+async def export_grocery_items(
+    format: str = "csv",
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Download all grocery items of current user as CSV, NDJSON or Parquet.
+
+    Rows are read a page at a time with the same keyset cursor as the item
+    list and streamed as they are encoded, so memory use does not grow with
+    the number of items. ``fields`` is a comma-separated list of item fields.
+    """
+    fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(GROCERY_ITEM_FIELDS)
+    unknown = [f for f in fields if f not in GROCERY_ITEM_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    try:
+        check_export_format(format)
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    user_id = current_user["user_id"]
+
+    async def fetch_page(cursor: Optional[str]) -> Dict:
+        return await db.get_grocery_items_page(user_id=user_id, limit=EXPORT_BATCH_SIZE, cursor=cursor, fields=fields)
+
+    return StreamingResponse(
+        export_items(fetch_page, format, fields),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="grozione-items.{format}"'}
+    )
+
+@api_router.post("/grocery-items:import")
+async def import_grocery_items(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Bulk import grocery items from a CSV or NDJSON file.
+
+    The file is parsed and validated a batch at a time and each batch of
+    valid rows is inserted in one transaction. Progress is streamed back as
+    NDJSON lines (rows read, imported, failed, bytes read), followed by the
+    invalid rows and a final summary. Columns: itemName, store, quantity,
+    price, date (YYYY-MM-DD).
+    """
+    try:
+        fmt = import_format(format, file.filename)
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if file.size is not None and file.size > IMPORT_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"File too large. Maximum size: {IMPORT_MAX_SIZE // (1024 * 1024)}MB")
+
+    # The upload is closed when this handler returns, before the response is streamed
+    handle = detach_upload(file)
+    total_bytes = os.fstat(handle.fileno()).st_size
+    user_id = current_user["user_id"]
+
+    async def progress():
+        imported = failed = rows = 0
+        reported_errors = []
+        batches = import_batches(handle, fmt)
+        try:
+            while True:
+                # Parsing and validation run off the event loop
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                items, errors, rows = batch
+                if items:
+                    try:
+                        await db.add_grocery_items_batch(items, user_id=user_id)
+                        imported += len(items)
+                    except Exception as e:
+                        errors.append({"rows": len(items), "error": f"Failed to save batch: {str(e)}"})
+                        failed += len(items)
+                failed += sum(1 for error in errors if "row" in error)
+                reported_errors.extend(errors[:IMPORT_MAX_REPORTED_ERRORS - len(reported_errors)])
+                yield json.dumps({
+                    "status": "progress",
+                    "rows": rows,
+                    "imported": imported,
+                    "failed": failed,
+                    "bytes_read": min(handle.tell(), total_bytes),
+                    "total_bytes": total_bytes
+                }) + "\n"
+        except Exception as e:
+            yield json.dumps({"status": "failed", "error": f"Import failed: {str(e)}"}) + "\n"
+        finally:
+            handle.close()
+
+        yield json.dumps({
+            "status": "done",
+            "rows": rows,
+            "imported": imported,
+            "failed": failed,
+            "errors": reported_errors
+        }) + "\n"
+
+    return StreamingResponse(
+        progress(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/compare")
+async def compare_prices(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    sort: str = "savings",
+    current_user: dict = Depends(get_current_user)
+):
+    """Compare prices of the same item across stores for current user"""
+    try:
+        return await db.get_price_comparison(
+            user_id=current_user["user_id"], limit=limit, offset=offset, sort=sort
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/price-history")
+async def get_price_history(
+    product_id: Optional[str] = None,
+    item: Optional[str] = None,
+    bucket: str = "week",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    store: Optional[List[str]] = Query(None),
+    by_store: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Unit price history of one product for current user.
+
+    Identify the product by ``product_id`` (as returned with items and
+    comparisons) or by an ``item`` name. ``bucket`` is day, week or month;
+    ``store`` may be repeated to restrict the stores included.
+    """
+    try:
+        history = await db.get_price_history(
+            user_id=current_user["user_id"],
+            product_id=product_id,
+            item_name=item,
+            bucket=bucket,
+            date_from=date_from,
+            date_to=date_to,
+            stores=store,
+            by_store=by_store
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if history is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return history
+
+@api_router.get("/analytics/summary")
+async def get_analytics_summary(current_user: dict = Depends(get_current_user)):
+    """Total spend, item, store and product counts and averages for current user"""
+    return await analytics.summary(current_user["user_id"])
+
+@api_router.get("/analytics/spend")
+async def get_analytics_spend(
+    period: str = "month",
+    by_store: bool = False,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Spend per week or month for current user, optionally split by store"""
+    try:
+        spend = await analytics.spend(
+            current_user["user_id"], period=period, by_store=by_store, date_from=date_from, date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"period": period, "spend": spend}
+
+@api_router.get("/analytics/rolling")
+async def get_analytics_rolling(
+    period: str = "week",
+    window: int = Query(4, ge=1, le=52),
+    current_user: dict = Depends(get_current_user)
+):
+    """Spend per week or month for current user with its rolling average"""
+    try:
+        spend = await analytics.rolling(current_user["user_id"], period=period, window=window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"period": period, "window": window, "spend": spend}
+
+@api_router.get("/analytics/top-items")
+async def get_analytics_top_items(
+    limit: int = Query(10, ge=1, le=100),
+    sort: str = "spend",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Products with the highest spend or most purchases for current user"""
+    try:
+        items = await analytics.top_items(
+            current_user["user_id"], limit=limit, sort=sort, date_from=date_from, date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items}
+
+@api_router.get("/store-summary")
+async def get_store_summary(
+    preview: int = Query(0, ge=0, le=20),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get spend per store for current user, optionally with a preview of recent items"""
+    summary = await db.get_store_summary(user_id=current_user["user_id"], preview=preview)
+    return {"stores": summary}
+
+@api_router.post("/grocery-items:batch")
+async def add_grocery_items_batch(items_data: dict, current_user: dict = Depends(get_current_user)):
+    """Add many grocery items in a single transaction"""
+    items = items_data.get("items", [])
+    if not items:
+        raise HTTPException(status_code=400, detail="No items provided")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many items. Maximum per batch: {MAX_BATCH_ITEMS}")
+
+    try:
+        result = await db.add_grocery_items_batch(items, user_id=current_user["user_id"])
+        return {"success": True, "items": result["items"]}
+    except DatabaseBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add items: {str(e)}")
+
 @api_router.put("/grocery-items/{item_id}")
 async def update_grocery_item(item_id: str, item_data: dict, current_user: dict = Depends(get_current_user)):
     """Update a grocery item"""
@@ -443,7 +1079,7 @@ async def update_grocery_item(item_id: str, item_data: dict, current_user: dict
             return {"success": True, "item": updated_item}
         else:
             raise HTTPException(status_code=404, detail="Item not found")
-    except HTTPException:
+    except (HTTPException, DatabaseBusyError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update item: {str(e)}")
@@ -457,7 +1093,7 @@ async def delete_grocery_item(item_id: str, current_user: dict = Depends(get_cur
             return {"success": True, "message": "Item deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="Item not found")
-    except HTTPException:
+    except (HTTPException, DatabaseBusyError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete item: {str(e)}")
@@ -465,6 +1101,18 @@ async def delete_grocery_item(item_id: str, current_user: dict = Depends(get_cur
 # Include the router in the main app
 app.include_router(api_router)
 
+# Cut off oversized receipt uploads while they are still streaming in.
+# Registered first so it sits inside the other middleware, next to the routes
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/api/scan-receipt": settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+        "/api/scan-jobs": settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+        "/api/scan-receipts:batch": SCAN_BATCH_MAX_FILES * (settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD),
+        "/api/grocery-items:import": IMPORT_MAX_SIZE + MULTIPART_OVERHEAD
+    }
+)
+
 # Security headers middleware
 @app.middleware("http")
 async def add_security_headers(request, call_next):
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit is open"""
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker with a latency SLO.
+
+    Every call outcome is recorded with its latency. A call is "bad" when it
+    failed or took longer than ``slow_call_seconds``. Once the window holds
+    at least ``min_calls`` outcomes and the share of bad calls reaches
+    ``failure_threshold`` the circuit opens and calls are refused for
+    ``open_seconds``. After that up to ``half_open_probes`` calls are let
+    through at a time; a good probe closes the circuit, a bad one reopens it.
+    """
+
+    def __init__(self, name: str, window_seconds: float = 60.0, min_calls: int = 5,
+                 failure_threshold: float = 0.5, slow_call_seconds: float = 20.0,
+                 open_seconds: float = 30.0, half_open_probes: int = 1):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        # (finished_at, ok, latency)
+        self._outcomes: Deque[Tuple[float, bool, float]] = deque()
+        self._rejected = 0
+        self._times_opened = 0
+
+    def _prune(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._times_opened += 1
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a call may go ahead; every allowed call must be followed by
+        ``record_success``, ``record_failure``, ``record_abandoned`` or ``release``"""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self._rejected += 1
+                    return False
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self._rejected += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record_success(self, latency: float):
+        self._record(latency <= self.slow_call_seconds, latency)
+
+    def record_failure(self, latency: float):
+        self._record(False, latency)
+
+    def record_abandoned(self, latency: float):
+        """Record a call given up on after ``latency`` seconds because another
+        backend answered first; it counts as a slow call"""
+        self._record(False, latency)
+
+    def release(self):
+        """Give back an allowed call whose outcome is unknown (e.g. cancelled)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def _record(self, good: bool, latency: float):
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if good:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    self._probes_in_flight = 0
+                else:
+                    self._open(now)
+                return
+            if self._state == OPEN:
+                # A call allowed before the circuit opened finished late
+                return
+
+            self._outcomes.append((now, good, latency))
+            self._prune(now)
+            if len(self._outcomes) >= self.min_calls:
+                bad = sum(1 for _, ok, _ in self._outcomes if not ok)
+                if bad / len(self._outcomes) >= self.failure_threshold:
+                    self._open(now)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile of good calls in the window, or None with too few samples"""
+        with self._lock:
+            self._prune(time.monotonic())
+            latencies = sorted(latency for _, ok, latency in self._outcomes if ok)
+        if len(latencies) < self.min_calls:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def stats(self) -> Dict:
+        """State and window counters for monitoring"""
+        state = self.state
+        p95 = self.latency_percentile(95)
+        with self._lock:
+            self._prune(time.monotonic())
+            calls = len(self._outcomes)
+            bad = sum(1 for _, ok, _ in self._outcomes if not ok)
+            return {
+                "name": self.name,
+                "state": state,
+                "window_calls": calls,
+                "window_bad_calls": bad,
+                "window_bad_ratio": round(bad / calls, 3) if calls else 0.0,
+                "p95_latency": round(p95, 3) if p95 is not None else None,
+                "rejected": self._rejected,
+                "times_opened": self._times_opened
+            }
@@ -0,0 +1,231 @@
+import abc
+import asyncio
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.image_pipeline import binarize, decode_image, segment_lines
+
+try:
+    import pytesseract
+except ImportError:  # optional dependency: local OCR is disabled without it
+    pytesseract = None
+
+LOCAL_OCR_WORKERS = int(os.environ.get('LOCAL_OCR_WORKERS', '2'))
+LOCAL_OCR_TIMEOUT = float(os.environ.get('LOCAL_OCR_TIMEOUT', '20'))
+# Time allowed on top of the tesseract timeout for decoding and line segmentation
+LOCAL_OCR_PREPARE_GRACE = 5.0
+
+# Receipt line parsing
+PRICE_PATTERN = re.compile(r'(-?\d{1,5}[.,]\d{2})\s*[A-Z*]?\s*$')
+QUANTITY_PATTERN = re.compile(r'^(\d{1,3})\s*[xX@*]\s+')
+TOTAL_PATTERN = re.compile(r'\b(total|balance due|amount due|to pay)\b', re.IGNORECASE)
+SKIP_PATTERN = re.compile(
+    r'\b(sub\s*total|change|cash|card|visa|mastercard|vat|tax|savings|discount|tendered|auth)\b',
+    re.IGNORECASE
+)
+
+
+class ExtractionBackend(abc.ABC):
+    """Interface for receipt extraction engines.
+
+    ``extract`` returns the same dict shape as
+    ``ReceiptProcessor.parse_azure_response``: items (itemName, quantity,
+    price, store), store, total, confidence and processing_method.
+    """
+
+    name = "base"
+
+    def is_available(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    async def extract(self, image_bytes: bytes) -> Dict:
+        ...
+
+    def unavailable_reason(self) -> Optional[str]:
+        """Why ``is_available`` is false, for the startup log"""
+        return None
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which the next backend may be started alongside this
+        one, or None to never hedge"""
+        return None
+
+    async def close(self):
+        pass
+
+
+class AzureExtractionBackend(ExtractionBackend):
+    """Azure Document Intelligence prebuilt receipt model"""
+
+    name = "azure"
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def is_available(self) -> bool:
+        return bool(self.processor.endpoint and self.processor.key)
+
+    def unavailable_reason(self) -> Optional[str]:
+        return "set AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT and AZURE_DOCUMENT_INTELLIGENCE_KEY"
+
+    async def extract(self, image_bytes: bytes) -> Dict:
+        return await self.processor.extract_with_azure_document_intelligence(image_bytes)
+
+    def hedge_delay(self) -> Optional[float]:
+        return self.processor.azure_hedge_delay()
+
+
+def parse_receipt_lines(lines: List[str]) -> Dict:
+    """Turn OCR'd receipt lines into items, store name and total"""
+    store = None
+    total = None
+    items = []
+
+    for raw_line in lines:
+        line = " ".join(raw_line.split())
+        if not line:
+            continue
+
+        price_match = PRICE_PATTERN.search(line)
+        if not price_match:
+            # The first text line without a price is usually the store name
+            if store is None and items == [] and re.search(r'[A-Za-z]{3,}', line):
+                store = line.title()
+            continue
+
+        price = float(price_match.group(1).replace(',', '.'))
+        description = line[:price_match.start()].strip(" .:-£$€")
+
+        if TOTAL_PATTERN.search(description) and not SKIP_PATTERN.search(description):
+            if total is None:
+                total = price
+            continue
+        if SKIP_PATTERN.search(description) or not re.search(r'[A-Za-z]', description):
+            continue
+
+        quantity = 1
+        quantity_match = QUANTITY_PATTERN.match(description)
+        if quantity_match:
+            quantity = int(quantity_match.group(1))
+            description = description[quantity_match.end():]
+
+        items.append({
+            "itemName": description,
+            "quantity": f"{quantity} pcs",
+            "price": price,
+            "store": store or "Unknown Store"
+        })
+
+    if total is None:
+        total = round(sum(item["price"] for item in items), 2)
+
+    return {
+        "items": items,
+        "store": store or "Unknown Store",
+        "total": float(total),
+        # Local OCR is less reliable than Azure, and receipts whose
+        # itemised lines don't add up to the total are less reliable still
+        "confidence": 0.6 if items and abs(sum(i["price"] for i in items) - total) < 0.05 else 0.4,
+        "processing_method": "local_ocr"
+    }
+
+
+def run_local_ocr(image_bytes: bytes, timeout: float = 0) -> Dict:
+    """Full local pipeline; runs inside a worker process.
+
+    ``timeout`` (seconds, 0 for none) is enforced by pytesseract, which kills
+    the tesseract process when it runs over, so the worker is freed too.
+    """
+    binary = binarize(decode_image(image_bytes))
+    line_ranges = segment_lines(binary)
+    if not line_ranges:
+        return parse_receipt_lines([])
+
+    # Stack the detected text lines with uniform spacing, dropping the noise
+    # and blank paper between them, and OCR the result in a single pass
+    spacer = np.full((12, binary.shape[1]), 255, np.uint8)
+    strips = []
+    for top, bottom in line_ranges:
+        strips.append(binary[max(0, top - 2):bottom + 2])
+        strips.append(spacer)
+    compact = np.vstack(strips)
+
+    text = pytesseract.image_to_string(compact, config='--psm 6', timeout=timeout)
+    return parse_receipt_lines(text.splitlines())
+
+
+class LocalOCRBackend(ExtractionBackend):
+    """Offline extraction with the OpenCV preprocessing pipeline and Tesseract.
+
+    CPU-heavy work runs in a process pool so it never blocks the event loop.
+    Requires the ``pytesseract`` package (in requirements.txt) and a tesseract
+    binary on the PATH; without the binary the backend reports itself
+    unavailable and is skipped.
+
+    A worker process can't be interrupted from outside, so the timeout is
+    passed down to tesseract itself, which is killed when it runs over and
+    frees its pool slot. Decoding and line segmentation before it are
+    bounded by the image size limits.
+    """
+
+    name = "local"
+
+    def __init__(self, workers: int = LOCAL_OCR_WORKERS, timeout: float = LOCAL_OCR_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._has_binary: Optional[bool] = None
+
+    def is_available(self) -> bool:
+        if pytesseract is None:
+            return False
+        if self._has_binary is None:
+            try:
+                pytesseract.get_tesseract_version()
+                self._has_binary = True
+            except Exception:
+                self._has_binary = False
+        return self._has_binary
+
+    def unavailable_reason(self) -> Optional[str]:
+        if pytesseract is None:
+            return "install the pytesseract package"
+        return "install the tesseract binary (e.g. apt install tesseract-ocr, brew install tesseract)"
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn rather than fork: the server process has live threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def extract(self, image_bytes: bytes) -> Dict:
+        if not self.is_available():
+            raise Exception("Local OCR not available: install pytesseract and tesseract")
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self._get_pool(), run_local_ocr, image_bytes, self.timeout),
+            timeout=self.timeout + LOCAL_OCR_PREPARE_GRACE
+        )
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+if __name__ == "__main__":
+    # Offline check of the local pipeline: python -m services.extraction_backends receipt.jpg
+    import json
+    import sys
+
+    with open(sys.argv[1], "rb") as f:
+        print(json.dumps(run_local_ocr(f.read()), indent=2))
@@ -0,0 +1,246 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Images sent to the extraction backends are normalised to roughly this
+# resolution for a standard 80mm till roll, then re-encoded as JPEG under
+# PREPROCESS_MAX_BYTES
+PREPROCESS_TARGET_DPI = int(os.environ.get('PREPROCESS_TARGET_DPI', '300'))
+RECEIPT_WIDTH_MM = 80
+PREPROCESS_MAX_BYTES = int(os.environ.get('PREPROCESS_MAX_KB', '1024')) * 1024
+PREPROCESS_JPEG_QUALITIES = (85, 75, 65, 50)
+PREPROCESS_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', '2'))
+PREPROCESS_TIMEOUT = float(os.environ.get('PREPROCESS_TIMEOUT', '15'))
+
+# Only crop when the detected paper covers a plausible share of the photo
+MIN_RECEIPT_AREA_RATIO = 0.2
+MAX_RECEIPT_AREA_RATIO = 0.97
+
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def decode_image(image_bytes: bytes, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """Decode encoded image bytes, raising ValueError if they are not an image"""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    img = cv2.imdecode(nparr, flags)
+    if img is None:
+        raise ValueError("Unable to decode image")
+    return img
+
+
+def binarize(img: np.ndarray) -> np.ndarray:
+    """Grayscale, denoise and adaptively threshold an image for OCR"""
+    # Convert to grayscale
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+    # Apply noise reduction
+    denoised = cv2.medianBlur(gray, 3)
+
+    # Apply adaptive thresholding
+    return cv2.adaptiveThreshold(
+        denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, 11, 2
+    )
+
+
+def segment_lines(binary: np.ndarray, min_height: int = 8, gap: int = 2) -> list:
+    """Find text lines in a binarized (black text on white) image.
+
+    Uses the horizontal projection profile: rows containing ink are grouped
+    into bands, bands separated by fewer than ``gap`` blank rows are merged
+    and bands shorter than ``min_height`` are dropped as noise. Returns a
+    list of (top, bottom) row ranges.
+    """
+    ink = (binary < 128).sum(axis=1)
+    # Ignore rows with only a few specks of noise
+    has_ink = ink > max(2, binary.shape[1] // 200)
+
+    lines = []
+    start = None
+    blank = 0
+    for row, inked in enumerate(has_ink):
+        if inked:
+            if start is None:
+                start = row
+            blank = 0
+        elif start is not None:
+            blank += 1
+            if blank > gap:
+                lines.append((start, row - blank + 1))
+                start = None
+                blank = 0
+    if start is not None:
+        lines.append((start, len(has_ink)))
+
+    return [(top, bottom) for top, bottom in lines if bottom - top >= min_height]
+
+
+def target_width() -> int:
+    """Pixel width of a receipt scanned at PREPROCESS_TARGET_DPI"""
+    return int(RECEIPT_WIDTH_MM / 25.4 * PREPROCESS_TARGET_DPI)
+
+
+def decode_downscaled(image_bytes: bytes, min_side: int) -> np.ndarray:
+    """Decode with the largest libjpeg/libpng reduction that keeps the
+    shorter side at least ``min_side`` pixels.
+
+    Reduced decoding skips most of the full-resolution work, which is where
+    the bulk of the time goes for 12+ megapixel phone photos.
+    """
+    try:
+        # Only the header is read here
+        width, height = Image.open(BytesIO(image_bytes)).size
+    except Exception:
+        return decode_image(image_bytes)
+
+    for factor, flags in REDUCED_DECODE_FLAGS:
+        if min(width, height) // factor >= min_side:
+            return decode_image(image_bytes, flags)
+    return decode_image(image_bytes)
+
+
+def order_corners(points: np.ndarray) -> np.ndarray:
+    """Order four corner points as top-left, top-right, bottom-right, bottom-left"""
+    points = points.reshape(4, 2).astype(np.float32)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([
+        points[np.argmin(sums)],
+        points[np.argmin(diffs)],
+        points[np.argmax(sums)],
+        points[np.argmax(diffs)],
+    ], dtype=np.float32)
+
+
+def find_receipt_region(gray: np.ndarray) -> Optional[np.ndarray]:
+    """Corners of the paper in the photo, or None if no clear receipt is found"""
+    # Receipts are bright paper on a darker background: threshold with Otsu
+    # and close the gaps left by the printed text
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, mask = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel_size = max(5, min(gray.shape) // 40) | 1
+    mask = cv2.morphologyEx(
+        mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
+    )
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    paper = max(contours, key=cv2.contourArea)
+    area_ratio = cv2.contourArea(paper) / float(gray.shape[0] * gray.shape[1])
+    if not MIN_RECEIPT_AREA_RATIO <= area_ratio <= MAX_RECEIPT_AREA_RATIO:
+        return None
+    return order_corners(cv2.boxPoints(cv2.minAreaRect(paper)))
+
+
+def deskew_and_crop(img: np.ndarray) -> np.ndarray:
+    """Rotate the receipt upright and crop away the background"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    corners = find_receipt_region(gray)
+    if corners is None:
+        return gray
+
+    top_left, top_right, bottom_right, bottom_left = corners
+    width = int(max(np.linalg.norm(top_right - top_left), np.linalg.norm(bottom_right - bottom_left)))
+    height = int(max(np.linalg.norm(bottom_left - top_left), np.linalg.norm(bottom_right - top_right)))
+    if width < 16 or height < 16:
+        return gray
+
+    destination = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    transform = cv2.getPerspectiveTransform(corners, destination)
+    return cv2.warpPerspective(gray, transform, (width, height), flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_REPLICATE)
+
+
+def resize_to_width(img: np.ndarray, width: int) -> np.ndarray:
+    """Downscale (never upscale) so the narrower side is ``width`` pixels"""
+    current = min(img.shape[:2])
+    if current <= width:
+        return img
+    scale = width / current
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def encode_bounded_jpeg(img: np.ndarray, max_bytes: int) -> bytes:
+    """JPEG-encode, lowering quality and then resolution until under ``max_bytes``"""
+    while True:
+        for quality in PREPROCESS_JPEG_QUALITIES:
+            ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality,
+                                                     cv2.IMWRITE_JPEG_OPTIMIZE, 1])
+            if not ok:
+                raise ValueError("Unable to encode image")
+            if encoded.nbytes <= max_bytes:
+                return encoded.tobytes()
+        if min(img.shape[:2]) < 256:
+            return encoded.tobytes()
+        img = cv2.resize(img, None, fx=0.75, fy=0.75, interpolation=cv2.INTER_AREA)
+
+
+def prepare_for_extraction(image_bytes: bytes) -> Tuple[bytes, dict]:
+    """Downscale, deskew, crop and re-encode a receipt photo.
+
+    Returns the compact JPEG to send to the extraction backends and a few
+    size figures for logging.
+    """
+    width = target_width()
+    # The receipt rarely fills the whole frame, so keep some headroom
+    img = decode_downscaled(image_bytes, int(width * 1.5))
+    decoded_shape = img.shape[:2]
+    receipt = resize_to_width(deskew_and_crop(img), width)
+    encoded = encode_bounded_jpeg(receipt, PREPROCESS_MAX_BYTES)
+    return encoded, {
+        "input_bytes": len(image_bytes),
+        "output_bytes": len(encoded),
+        "decoded_size": [int(decoded_shape[1]), int(decoded_shape[0])],
+        "output_size": [int(receipt.shape[1]), int(receipt.shape[0])]
+    }
+
+
+class ImagePreprocessor:
+    """Runs ``prepare_for_extraction`` in a process pool.
+
+    Decoding and warping a phone photo is CPU-bound, so it runs outside the
+    event loop and outside the GIL.
+    """
+
+    def __init__(self, workers: int = PREPROCESS_WORKERS, timeout: float = PREPROCESS_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn rather than fork: the server process has live threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def prepare(self, image_bytes: bytes) -> Tuple[bytes, dict]:
+        # Handing the image to a worker process serializes it whatever its
+        # type; a memory-mapped upload is only read into memory here, for
+        # the duration of the call
+        if not isinstance(image_bytes, bytes):
+            image_bytes = bytes(image_bytes)
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self._get_pool(), prepare_for_extraction, image_bytes),
+            timeout=self.timeout
+        )
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
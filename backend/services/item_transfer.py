@@ -0,0 +1,244 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency: Parquet export is disabled without it
+    pa = None
+    pq = None
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '2000'))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+IMPORT_MAX_SIZE = int(os.environ.get('IMPORT_MAX_SIZE', str(20 * 1024 * 1024)))
+# Only the first few row errors are reported individually
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+IMPORT_FORMATS = {
+    "csv": ("csv",),
+    "ndjson": ("ndjson", "jsonl"),
+}
+
+# Numeric item fields; everything else is exported as text
+NUMERIC_FIELDS = {"price", "amount", "unitPrice"}
+
+# Accepted import column names (lower-cased) -> item field
+IMPORT_COLUMNS = {
+    "itemname": "itemName", "item_name": "itemName", "item": "itemName", "name": "itemName",
+    "store": "store", "shop": "store",
+    "quantity": "quantity", "qty": "quantity",
+    "price": "price", "total_price": "price",
+    "date": "date",
+}
+
+
+class UnsupportedFormatError(Exception):
+    """Raised when an export or import format is unknown or unavailable"""
+
+
+# Export
+
+def export_formats() -> List[str]:
+    """Export formats this server can produce; Parquet only with pyarrow installed"""
+    return [fmt for fmt in EXPORT_MEDIA_TYPES if fmt != "parquet" or pq is not None]
+
+
+def check_export_format(fmt: str):
+    supported = ", ".join(export_formats())
+    if fmt == "parquet" and pq is None:
+        raise UnsupportedFormatError(
+            f"Parquet export is not supported on this server (pyarrow is not installed). Supported: {supported}"
+        )
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise UnsupportedFormatError(f"Unknown format: {fmt}. Supported: {supported}")
+
+
+class _ChunkSink:
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def writable(self) -> bool:
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _csv_chunk(rows: List[Dict], fields: List[str], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    writer.writerows([[row.get(field) for field in fields] for row in rows])
+    return buffer.getvalue().encode()
+
+
+def _parquet_schema(fields: List[str]):
+    return pa.schema([(field, pa.float64() if field in NUMERIC_FIELDS else pa.string()) for field in fields])
+
+
+async def export_items(fetch_page: Callable[[Optional[str]], Awaitable[Dict]], fmt: str,
+                       fields: List[str]) -> AsyncIterator[bytes]:
+    """Encode every page returned by ``fetch_page`` as it arrives.
+
+    ``fetch_page(cursor)`` returns one keyset page (items, next_cursor,
+    has_more), so only one page of rows is held in memory at a time. Each
+    page becomes a CSV/NDJSON chunk or a Parquet row group.
+    """
+    check_export_format(fmt)
+    sink = writer = None
+    if fmt == "parquet":
+        sink = _ChunkSink()
+        schema = _parquet_schema(fields)
+        writer = pq.ParquetWriter(sink, schema)
+
+    cursor = None
+    first = True
+    try:
+        while True:
+            page = await fetch_page(cursor)
+            rows = page["items"]
+            if fmt == "csv":
+                yield _csv_chunk(rows, fields, header=first)
+            elif fmt == "ndjson":
+                yield "".join(json.dumps(row) + "\n" for row in rows).encode()
+            elif rows:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                yield sink.drain()
+            first = False
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+    finally:
+        if writer is not None:
+            writer.close()
+    if sink is not None:
+        # Parquet footer
+        yield sink.drain()
+
+
+# Import
+
+def import_format(fmt: Optional[str], filename: Optional[str]) -> str:
+    """Import format from an explicit choice or the file extension, defaulting to CSV"""
+    if not fmt and filename and "." in filename:
+        extension = filename.rsplit(".", 1)[1].lower()
+        fmt = next((f for f, extensions in IMPORT_FORMATS.items() if extension in extensions), None)
+    fmt = fmt or "csv"
+    if fmt not in IMPORT_FORMATS:
+        raise UnsupportedFormatError(f"Unknown import format: {fmt}. Supported: {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+
+def detach_upload(file: UploadFile) -> BinaryIO:
+    """Independent handle on an upload's spool file, readable after the request ends"""
+    # fileno() rolls an in-memory spool over to its temporary file
+    handle = os.fdopen(os.dup(file.file.fileno()), "rb")
+    handle.seek(0)
+    return handle
+
+
+def validate_import_row(row: Dict) -> Dict:
+    """Item data from an imported row; raises ValueError describing the first problem"""
+    if not isinstance(row, dict):
+        raise ValueError("Row is not an object")
+    item = {}
+    for column, value in row.items():
+        field = IMPORT_COLUMNS.get(str(column).strip().lower())
+        if field is not None and value is not None and str(value).strip() != "":
+            item[field] = value if field == "price" else str(value).strip()
+
+    if not item.get("itemName"):
+        raise ValueError("Missing item name")
+    if "price" not in item:
+        raise ValueError("Missing price")
+    try:
+        price = item["price"]
+        item["price"] = float(price.strip().lstrip("£$€").replace(",", "")) if isinstance(price, str) else float(price)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid price: {item['price']}")
+    if item["price"] < 0:
+        raise ValueError("Price cannot be negative")
+    if "date" in item:
+        try:
+            datetime.strptime(item["date"], "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"Invalid date (expected YYYY-MM-DD): {item['date']}")
+    return item
+
+
+def _import_rows(handle: BinaryIO, fmt: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """(row number, raw row, parse error) for each row of the file, read incrementally"""
+    text = io.TextIOWrapper(handle, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            # Row numbers count the header as row 1, like a spreadsheet
+            for number, row in enumerate(csv.DictReader(text), start=2):
+                yield number, row, None
+            return
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line), None
+            except json.JSONDecodeError as e:
+                yield number, None, f"Invalid JSON: {e.msg}"
+    finally:
+        # Leave the handle open for the caller (progress reporting and close)
+        text.detach()
+
+
+def import_batches(handle: BinaryIO, fmt: str,
+                   batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[Tuple[List[Dict], List[Dict], int]]:
+    """Parse and validate an import file a batch at a time.
+
+    Yields (valid items, row errors, rows read) for every ``batch_size``
+    rows, so only one batch is held in memory however large the file is.
+    """
+    items, errors, rows = [], [], 0
+    for number, row, error in _import_rows(handle, fmt):
+        rows += 1
+        if error is None:
+            try:
+                items.append(validate_import_row(row))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            errors.append({"row": number, "error": error})
+        if rows % batch_size == 0:
+            yield items, errors, rows
+            items, errors = [], []
+    if rows % batch_size:
+        yield items, errors, rows
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Perceptual hash geometry: a 16x16 difference hash (256 bits) split into
+# 8 bands of 32 bits. Two hashes within 7 bits of each other always share at
+# least one identical band, so near-duplicate candidates are found through
+# the band indexes instead of comparing against every cached receipt.
+PHASH_SIZE = 16
+PHASH_BANDS = 8
+PHASH_BAND_BITS = PHASH_SIZE * PHASH_SIZE // PHASH_BANDS
+MAX_INDEXED_DISTANCE = PHASH_BANDS - 1
+
+
+def content_hash(image_bytes: bytes) -> str:
+    """SHA-256 of the uploaded bytes"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes: bytes) -> Optional[int]:
+    """256-bit difference hash of the image, or None if it cannot be decoded"""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    # A reduced decode is plenty for a 17x16 thumbnail and much cheaper
+    img = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    small = cv2.resize(img, (PHASH_SIZE + 1, PHASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def phash_bands(phash: int) -> Tuple[int, ...]:
+    mask = (1 << PHASH_BAND_BITS) - 1
+    return tuple((phash >> (i * PHASH_BAND_BITS)) & mask for i in range(PHASH_BANDS))
+
+
+class ReceiptResultCache:
+    """On-disk cache of parsed receipt results keyed by image content.
+
+    Results are looked up by exact SHA-256 of the upload first, then by a
+    perceptual hash so a re-photographed or re-encoded copy of the same
+    receipt also hits. Entries belong to the user who scanned the receipt and
+    both lookups only consider that user's entries, so one user never gets
+    another user's items. The store is a small SQLite file; when the stored
+    results exceed ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = 64 * 1024 * 1024, max_distance: int = 6):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.max_distance = min(max_distance, MAX_INDEXED_DISTANCE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size = {max_bytes * 2}")
+        self._init_schema()
+        self._exact_hits = 0
+        self._perceptual_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _init_schema(self):
+        band_columns = ", ".join(f"band{i} INTEGER NOT NULL" for i in range(PHASH_BANDS))
+        with self._conn:
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(receipt_cache)")]
+            if columns and "user_id" not in columns:
+                # Entries from before results were kept per user can't be
+                # attributed to anyone; it is only a cache, so start over
+                self._conn.execute("DROP TABLE receipt_cache")
+            self._conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS receipt_cache (
+                    user_id INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    phash TEXT,
+                    {band_columns},
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, content_hash)
+                )
+            ''')
+            for i in range(PHASH_BANDS):
+                self._conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS idx_receipt_cache_band{i} ON receipt_cache (user_id, band{i})'
+                )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_receipt_cache_last_accessed ON receipt_cache (last_accessed)'
+            )
+
+    def _touch(self, user_id: int, key: str):
+        self._conn.execute(
+            'UPDATE receipt_cache SET last_accessed = ?, hits = hits + 1 WHERE user_id = ? AND content_hash = ?',
+            (time.time(), user_id, key)
+        )
+
+    def lookup_sync(self, image_bytes: bytes, user_id: int) -> Optional[Dict]:
+        """Find the user's cached result for these bytes or a near-duplicate image"""
+        key = content_hash(image_bytes)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT result FROM receipt_cache WHERE user_id = ? AND content_hash = ?', (user_id, key)
+            ).fetchone()
+            if row:
+                self._touch(user_id, key)
+                self._exact_hits += 1
+                return dict(json.loads(row[0]), cache_match="exact")
+
+        if self.max_distance <= 0:
+            with self._lock:
+                self._misses += 1
+            return None
+
+        phash = perceptual_hash(image_bytes)
+        if phash is None:
+            with self._lock:
+                self._misses += 1
+            return None
+
+        bands = phash_bands(phash)
+        conditions = " OR ".join(f"band{i} = ?" for i in range(PHASH_BANDS))
+        with self._lock, self._conn:
+            candidates = self._conn.execute(
+                f'SELECT content_hash, phash, result FROM receipt_cache WHERE user_id = ? AND ({conditions})',
+                (user_id, *bands)
+            ).fetchall()
+            best = None
+            for candidate_key, candidate_phash, result in candidates:
+                distance = bin(int(candidate_phash, 16) ^ phash).count("1")
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, candidate_key, result)
+            if best is None:
+                self._misses += 1
+                return None
+            self._touch(user_id, best[1])
+            self._perceptual_hits += 1
+            return dict(json.loads(best[2]), cache_match="perceptual")
+
+    def store_sync(self, image_bytes: bytes, result: Dict, user_id: int):
+        """Cache a user's parsed result and evict old entries past the size budget"""
+        key = content_hash(image_bytes)
+        phash = perceptual_hash(image_bytes)
+        # Undecodable images are still cached by content hash; their band
+        # values never match a real perceptual hash
+        bands = phash_bands(phash) if phash is not None else (-1,) * PHASH_BANDS
+        payload = json.dumps(result)
+        now = time.time()
+        band_names = ", ".join(f"band{i}" for i in range(PHASH_BANDS))
+        placeholders = ", ".join("?" for _ in range(PHASH_BANDS))
+
+        with self._lock, self._conn:
+            self._conn.execute(f'''
+                INSERT OR REPLACE INTO receipt_cache
+                (user_id, content_hash, phash, {band_names}, result, size, created_at, last_accessed)
+                VALUES (?, ?, ?, {placeholders}, ?, ?, ?, ?)
+            ''', (user_id, key, format(phash, 'x') if phash is not None else None, *bands,
+                  payload, len(payload), now, now))
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM receipt_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            'SELECT user_id, content_hash, size FROM receipt_cache ORDER BY last_accessed'
+        ).fetchall()
+        for user_id, key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM receipt_cache WHERE user_id = ? AND content_hash = ?', (user_id, key))
+            total -= size
+            self._evictions += 1
+
+    async def lookup(self, image_bytes: bytes, user_id: int) -> Optional[Dict]:
+        return await asyncio.to_thread(self.lookup_sync, image_bytes, user_id)
+
+    async def store(self, image_bytes: bytes, result: Dict, user_id: int):
+        await asyncio.to_thread(self.store_sync, image_bytes, result, user_id)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM receipt_cache'
+            ).fetchone()
+            return {
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes,
+                "exact_hits": self._exact_hits,
+                "perceptual_hits": self._perceptual_hits,
+                "misses": self._misses,
+                "evictions": self._evictions
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
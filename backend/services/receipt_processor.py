@@ -1,19 +1,63 @@
 import cv2
 import numpy as np
-import base64
+import asyncio
 import json
+import logging
 import os
-import requests
-from PIL import Image
-from io import BytesIO
-from typing import Dict, List, Optional
+import httpx
+from typing import Callable, Dict, List, Optional
 from dotenv import load_dotenv
+from pathlib import Path
 import time
+import weakref
+
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.receipt_cache import ReceiptResultCache
+from services.image_pipeline import ImagePreprocessor
+from services.extraction_backends import AzureExtractionBackend, ExtractionBackend, LocalOCRBackend
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Azure polling behaviour: start with a short interval and back off
+# exponentially, but never wait longer than the overall deadline.
+AZURE_POLL_INITIAL_INTERVAL = float(os.environ.get('AZURE_POLL_INITIAL_INTERVAL', '1.0'))
+AZURE_POLL_MAX_INTERVAL = float(os.environ.get('AZURE_POLL_MAX_INTERVAL', '5.0'))
+AZURE_POLL_BACKOFF = 1.5
+AZURE_ANALYZE_TIMEOUT = float(os.environ.get('AZURE_ANALYZE_TIMEOUT', '60'))
+AZURE_MAX_CONNECTIONS = int(os.environ.get('AZURE_MAX_CONNECTIONS', '20'))
+# Analyses in flight at once across all scans, to stay under the Azure rate limit
+AZURE_MAX_CONCURRENT_ANALYSES = int(os.environ.get('AZURE_MAX_CONCURRENT_ANALYSES', '4'))
+
+# Azure circuit breaker: open when half of the calls in the window fail or
+# miss the latency SLO, then probe again after the cooldown
+AZURE_CIRCUIT_WINDOW = float(os.environ.get('AZURE_CIRCUIT_WINDOW', '120'))
+AZURE_CIRCUIT_MIN_CALLS = int(os.environ.get('AZURE_CIRCUIT_MIN_CALLS', '5'))
+AZURE_CIRCUIT_FAILURE_RATIO = float(os.environ.get('AZURE_CIRCUIT_FAILURE_RATIO', '0.5'))
+AZURE_SLOW_CALL_SECONDS = float(os.environ.get('AZURE_SLOW_CALL_SECONDS', '20'))
+AZURE_CIRCUIT_OPEN_SECONDS = float(os.environ.get('AZURE_CIRCUIT_OPEN_SECONDS', '30'))
+
+# Hedging: when the primary backend runs past its p95 latency, start the next
+# backend too and take whichever answers first
+HEDGE_ENABLED = os.environ.get('RECEIPT_HEDGE_ENABLED', 'true').lower() == 'true'
+HEDGE_DEFAULT_DELAY = float(os.environ.get('RECEIPT_HEDGE_DEFAULT_DELAY', '10'))
+HEDGE_MIN_DELAY = float(os.environ.get('RECEIPT_HEDGE_MIN_DELAY', '2'))
+
+# Receipt result cache (set RECEIPT_CACHE_MAX_MB=0 to disable)
+RECEIPT_CACHE_PATH = os.environ.get(
+    'RECEIPT_CACHE_PATH', str(Path(__file__).resolve().parent.parent / 'receipt_cache.db')
+)
+RECEIPT_CACHE_MAX_MB = int(os.environ.get('RECEIPT_CACHE_MAX_MB', '64'))
+RECEIPT_CACHE_PHASH_DISTANCE = int(os.environ.get('RECEIPT_CACHE_PHASH_DISTANCE', '6'))
+
+# Extraction backends, tried in order until one succeeds
+EXTRACTION_BACKENDS = [
+    name.strip() for name in os.environ.get('EXTRACTION_BACKENDS', 'azure,local').split(',') if name.strip()
+]
+
 class ReceiptProcessor:
-    def __init__(self):
+    def __init__(self, store_resolver: Optional[Callable[[str], str]] = None):
         # Azure Document Intelligence configuration
         self.endpoint = os.environ.get('AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT')
         self.key = os.environ.get('AZURE_DOCUMENT_INTELLIGENCE_KEY')
@@ -23,34 +67,124 @@ class ReceiptProcessor:
             print("   Please set AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT and AZURE_DOCUMENT_INTELLIGENCE_KEY in .env")
             self.endpoint = None
             self.key = None
-    
-    def preprocess_image(self, image_bytes: bytes) -> Image.Image:
-        """Preprocess image for better OCR accuracy"""
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Apply noise reduction
-        denoised = cv2.medianBlur(gray, 3)
-        
-        # Apply adaptive thresholding
-        thresh = cv2.adaptiveThreshold(
-            denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
+
+        # Shared async HTTP client, created lazily so connections are pooled
+        # across scans instead of being re-established for every request
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._azure_slots: Optional[asyncio.BoundedSemaphore] = None
+        self._azure_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.azure_breaker = CircuitBreaker(
+            "azure",
+            window_seconds=AZURE_CIRCUIT_WINDOW,
+            min_calls=AZURE_CIRCUIT_MIN_CALLS,
+            failure_threshold=AZURE_CIRCUIT_FAILURE_RATIO,
+            slow_call_seconds=AZURE_SLOW_CALL_SECONDS,
+            open_seconds=AZURE_CIRCUIT_OPEN_SECONDS
         )
-        
-        # Convert back to PIL Image
-        return Image.fromarray(thresh)
-    
-    def encode_image_base64(self, image: Image.Image) -> str:
-        """Convert PIL Image to base64 string"""
-        buffer = BytesIO()
-        image.save(buffer, format="PNG")
-        return base64.b64encode(buffer.getvalue()).decode()
+        # Extraction tasks cancelled because the other side of a hedge won
+        self._hedge_losers: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+
+        # Maps raw merchant names to canonical store names
+        self.store_resolver = store_resolver
+
+        # Pluggable extraction engines
+        available_backends = {
+            "azure": lambda: AzureExtractionBackend(self),
+            "local": lambda: LocalOCRBackend()
+        }
+        self.backends: List[ExtractionBackend] = [
+            available_backends[name]() for name in EXTRACTION_BACKENDS if name in available_backends
+        ]
+        self.log_backend_status()
+
+        # Downscaling, deskewing and compression run in worker processes
+        self.preprocessor = ImagePreprocessor()
+
+        # Parsed results of previously scanned images, keyed by content hash
+        self.result_cache: Optional[ReceiptResultCache] = None
+        if RECEIPT_CACHE_MAX_MB > 0:
+            self.result_cache = ReceiptResultCache(
+                RECEIPT_CACHE_PATH,
+                max_bytes=RECEIPT_CACHE_MAX_MB * 1024 * 1024,
+                max_distance=RECEIPT_CACHE_PHASH_DISTANCE
+            )
+
+    def log_backend_status(self):
+        """Report at startup which configured extraction backends can't run"""
+        for name in EXTRACTION_BACKENDS:
+            if name not in {backend.name for backend in self.backends}:
+                logger.warning(f"Unknown extraction backend '{name}' in EXTRACTION_BACKENDS, ignored")
+        unavailable = [backend for backend in self.backends if not backend.is_available()]
+        for backend in unavailable:
+            logger.warning(f"Extraction backend '{backend.name}' is unavailable: {backend.unavailable_reason()}")
+        if len(unavailable) == len(self.backends):
+            logger.warning("No receipt extraction backend is available; scans will need manual entry")
+
+        available = [backend for backend in self.backends if backend.is_available()]
+        if HEDGE_ENABLED and not any(backend.hedge_delay() is not None for backend in available[:-1]):
+            logger.warning("RECEIPT_HEDGE_ENABLED is set but no available backend can be hedged "
+                           "with another, so slow extractions will not be hedged")
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        """Get the pooled async HTTP client used for Azure calls"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=AZURE_MAX_CONNECTIONS,
+                    max_keepalive_connections=AZURE_MAX_CONNECTIONS
+                )
+            )
+        return self._http_client
+
+    def get_azure_slots(self) -> asyncio.BoundedSemaphore:
+        """Semaphore bounding concurrent Azure analyses (one per event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._azure_slots is None or self._azure_slots_loop is not loop:
+            self._azure_slots = asyncio.BoundedSemaphore(AZURE_MAX_CONCURRENT_ANALYSES)
+            self._azure_slots_loop = loop
+        return self._azure_slots
+
+    async def close(self):
+        """Close the pooled HTTP client"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        if self.result_cache is not None:
+            self.result_cache.close()
+            self.result_cache = None
+        for backend in self.backends:
+            await backend.close()
+        self.preprocessor.close()
+
+    @staticmethod
+    def parse_retry_after(response: httpx.Response) -> Optional[float]:
+        """Read Azure's Retry-After header (seconds) if present"""
+        retry_after = response.headers.get('Retry-After')
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            return None
     
+    async def preprocess_image(self, image_bytes: bytes) -> bytes:
+        """Downscale, deskew and compress the photo before extraction.
+
+        ``image_bytes`` may be any buffer, such as a memory-mapped upload;
+        the result is always bytes for the extraction backends.
+        """
+        try:
+            prepared, sizes = await self.preprocessor.prepare(image_bytes)
+        except Exception as e:
+            # Backends can still cope with the original upload
+            logger.warning(f"Image preprocessing failed, sending original: {e}")
+            return bytes(image_bytes)
+        if len(prepared) >= len(image_bytes):
+            return bytes(image_bytes)
+        logger.debug(f"Preprocessed receipt: {sizes['input_bytes']} -> {sizes['output_bytes']} bytes, "
+                     f"{sizes['output_size'][0]}x{sizes['output_size'][1]}px")
+        return prepared
 
     def parse_basic_fallback(self, image_bytes: bytes) -> Dict:
         """Basic fallback when AI processing fails"""
@@ -70,6 +204,39 @@ class ReceiptProcessor:
         if not self.endpoint or not self.key:
             raise Exception("Azure Document Intelligence not configured")
 
+        # While Azure is failing or too slow, skip it instead of waiting out
+        # the full analysis deadline on every scan
+        if not self.azure_breaker.allow_request():
+            raise CircuitOpenError("Azure Document Intelligence circuit is open")
+
+        started = None
+        try:
+            # Receipts scanned together queue here rather than tripping Azure's 429s
+            async with self.get_azure_slots():
+                # Latency is measured from when the call actually goes out
+                started = time.monotonic()
+                result = await self._analyze_with_azure(image_bytes)
+        except asyncio.CancelledError:
+            if started is not None and asyncio.current_task() in self._hedge_losers:
+                # Outrun by the hedge: the slow calls hedging hides still
+                # have to count against the latency SLO
+                self.azure_breaker.record_abandoned(time.monotonic() - started)
+            else:
+                self.azure_breaker.release()
+            raise
+        except Exception:
+            self.azure_breaker.record_failure(time.monotonic() - started if started is not None else 0.0)
+            raise
+        self.azure_breaker.record_success(time.monotonic() - started)
+        return result
+
+    def azure_hedge_delay(self) -> float:
+        """How long to wait on Azure before hedging: its recent p95 latency"""
+        p95 = self.azure_breaker.latency_percentile(95)
+        return max(HEDGE_MIN_DELAY, p95 if p95 is not None else HEDGE_DEFAULT_DELAY)
+
+    async def _analyze_with_azure(self, image_bytes: bytes) -> Dict:
+        """Submit an image and poll until its analysis finishes"""
         # Analyze document endpoint
         analyze_url = f"{self.endpoint}/formrecognizer/documentModels/prebuilt-receipt:analyze?api-version=2023-07-31"
 
@@ -78,8 +245,11 @@ class ReceiptProcessor:
             'Content-Type': 'application/octet-stream'
         }
 
+        client = self.get_http_client()
+        deadline = time.monotonic() + AZURE_ANALYZE_TIMEOUT
+
         # Submit document for analysis
-        response = requests.post(analyze_url, headers=headers, data=image_bytes)
+        response = await client.post(analyze_url, headers=headers, content=image_bytes)
 
         if response.status_code != 202:
             raise Exception(f"Failed to submit document: {response.status_code} - {response.text}")
@@ -89,18 +259,31 @@ class ReceiptProcessor:
         if not operation_location:
             raise Exception("No operation location returned")
 
-        # Poll for results
-        max_attempts = 30
-        for attempt in range(max_attempts):
-            time.sleep(2)  # Wait 2 seconds between polls
+        # Poll for results, honouring Retry-After and backing off exponentially
+        interval = AZURE_POLL_INITIAL_INTERVAL
+        delay = self.parse_retry_after(response)
+        if delay is None:
+            delay = interval
 
-            result_response = requests.get(
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(delay, remaining))
+
+            result_response = await client.get(
                 operation_location,
                 headers={'Ocp-Apim-Subscription-Key': self.key}
             )
 
+            interval = min(interval * AZURE_POLL_BACKOFF, AZURE_POLL_MAX_INTERVAL)
+            retry_after = self.parse_retry_after(result_response)
+            delay = retry_after if retry_after is not None else interval
+
             if result_response.status_code != 200:
-                continue
+                if result_response.status_code == 429 or result_response.status_code >= 500:
+                    continue
+                raise Exception(f"Failed to get analysis result: {result_response.status_code} - {result_response.text}")
 
             result_data = result_response.json()
 
@@ -133,11 +316,13 @@ class ReceiptProcessor:
 
                 item_name = item_fields.get('Description', {}).get('valueString', 'Unknown Item')
                 quantity = item_fields.get('Quantity', {}).get('valueNumber', 1)
+                # Weighed items carry a unit ("0.452 kg"); everything else is a count
+                unit = item_fields.get('QuantityUnit', {}).get('valueString') or 'pcs'
                 price = item_fields.get('TotalPrice', {}).get('valueNumber', 0.0)
 
                 items.append({
                     "itemName": item_name,
-                    "quantity": f"{quantity} pcs",
+                    "quantity": f"{float(quantity):g} {unit.lower()}",
                     "price": float(price),
                     "store": merchant_name
                 })
@@ -157,26 +342,143 @@ class ReceiptProcessor:
             print(f"Error parsing Azure response: {e}")
             return self.parse_basic_fallback(b"")
 
-    async def process_receipt(self, image_bytes: bytes) -> Dict:
-        """Main processing pipeline"""
+    async def process_receipt(self, image_bytes: bytes, user_id: Optional[int] = None) -> Dict:
+        """Main processing pipeline; results are cached per user, and only
+        when ``user_id`` is given"""
+        cache = self.result_cache if user_id is not None else None
         try:
-            # Preprocess image
-            processed_image = self.preprocess_image(image_bytes)
-
-            # Try Azure Document Intelligence first
-            try:
-                result = await self.extract_with_azure_document_intelligence(image_bytes)
-                return result
-            except Exception as azure_error:
-                print(f"Azure Document Intelligence failed: {azure_error}")
+            # Re-uploads of an already scanned receipt are answered from cache
+            if cache is not None:
+                cached = await cache.lookup(image_bytes, user_id)
+                if cached is not None:
+                    return self.canonicalize_stores(cached)
 
-                # Fallback to basic processing
+            backends = [backend for backend in self.backends if backend.is_available()]
+            if not backends:
+                # Nothing to extract with, so don't spend CPU preparing the image
                 result = self.parse_basic_fallback(image_bytes)
-                result["error"] = f"Azure processing failed: {str(azure_error)}"
+                result["error"] = "No receipt extraction backend is configured"
                 return result
 
+            # Preprocess image; the smaller, cleaned up JPEG is what gets extracted
+            processed_image = await self.preprocess_image(image_bytes)
+
+            # Try each configured extraction backend in order
+            errors = []
+            position = 0
+            while position < len(backends):
+                backend = backends[position]
+                hedge = backends[position + 1] if HEDGE_ENABLED and position + 1 < len(backends) else None
+                delay = backend.hedge_delay() if hedge is not None else None
+                try:
+                    if delay is None:
+                        position += 1
+                        result = await backend.extract(processed_image)
+                    else:
+                        # The hedge backend is tried here, so don't retry it below
+                        position += 2
+                        result = await self.extract_hedged(backend, hedge, processed_image, delay)
+                    if cache is not None and result.get("items"):
+                        await cache.store(image_bytes, result, user_id)
+                    return self.canonicalize_stores(result)
+                except Exception as backend_error:
+                    name = backend.name if delay is None else f"{backend.name}+{hedge.name}"
+                    logger.warning(f"{name} extraction failed: {backend_error}")
+                    errors.append(f"{name}: {backend_error}")
+
+            # Fallback to basic processing
+            result = self.parse_basic_fallback(image_bytes)
+            result["error"] = f"Receipt extraction failed ({'; '.join(errors)})"
+            return result
+
         except Exception as e:
             # Ultimate fallback
             result = self.parse_basic_fallback(image_bytes)
             result["error"] = f"Receipt processing failed: {str(e)}"
-            return result
\ No newline at end of file
+            return result
+
+    def canonicalize_stores(self, result: Dict) -> Dict:
+        """Replace raw merchant names in a result with canonical store names"""
+        if self.store_resolver is None or "store" not in result:
+            return result
+        result["store"] = self.store_resolver(result["store"])
+        for item in result.get("items", []):
+            if "store" in item:
+                item["store"] = self.store_resolver(item["store"])
+        return result
+
+    async def extract_hedged(self, primary: ExtractionBackend, hedge: ExtractionBackend,
+                             image_bytes: bytes, delay: float) -> Dict:
+        """Run ``primary``; if it hasn't answered after ``delay`` seconds, also
+        start ``hedge`` and return the first result that has items"""
+        primary_task = asyncio.create_task(primary.extract(image_bytes))
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done:
+            if primary_task.exception() is None:
+                return primary_task.result()
+            # Failed fast (e.g. open circuit): go straight to the hedge backend
+            logger.warning(f"{primary.name} extraction failed: {primary_task.exception()}")
+            try:
+                return await hedge.extract(image_bytes)
+            except Exception as hedge_error:
+                raise Exception(f"{primary_task.exception()}; {hedge.name}: {hedge_error}")
+
+        logger.debug(f"{primary.name} slower than {delay:.1f}s, hedging with {hedge.name}")
+        hedge_task = asyncio.create_task(hedge.extract(image_bytes))
+        pending = {primary_task, hedge_task}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().get("items"):
+                        # Marked before cancelling, so the loser can tell it
+                        # was outrun rather than cancelled with the scan
+                        self._hedge_losers.update(pending)
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # Neither produced items: prefer whichever result there is, primary first
+        for task in (primary_task, hedge_task):
+            if task.exception() is None:
+                return task.result()
+        raise Exception(f"{primary_task.exception()}; {hedge.name}: {hedge_task.exception()}")
+
+    async def process_pages(self, pages: List[bytes], user_id: Optional[int] = None) -> Dict:
+        """Process a multi-page receipt, extracting all pages concurrently"""
+        if len(pages) == 1:
+            return await self.process_receipt(pages[0], user_id)
+
+        results = await asyncio.gather(*(self.process_receipt(page, user_id) for page in pages))
+        return self.merge_page_results(results)
+
+    def merge_page_results(self, results: List[Dict]) -> Dict:
+        """Combine per-page results into one receipt"""
+        extracted = [result for result in results if result.get("items")]
+        if not extracted:
+            return dict(results[0], pages=len(results))
+
+        store = next(
+            (result["store"] for result in extracted if result.get("store") not in (None, "Unknown Store")),
+            "Unknown Store"
+        )
+        items = []
+        for result in extracted:
+            for item in result["items"]:
+                if item.get("store") in (None, "Unknown Store"):
+                    item = dict(item, store=store)
+                items.append(item)
+
+        # The grand total is printed on the last page that has one
+        totals = [result.get("total") for result in extracted if result.get("total")]
+        total = totals[-1] if totals else round(sum(item["price"] for item in items), 2)
+
+        return {
+            "items": items,
+            "store": store,
+            "total": float(total),
+            "confidence": min(result.get("confidence", 0.0) for result in extracted),
+            "processing_method": extracted[0].get("processing_method"),
+            "pages": len(results)
+        }
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCAN_JOB_WORKERS = int(os.environ.get('SCAN_JOB_WORKERS', '4'))
+SCAN_JOB_QUEUE_SIZE = int(os.environ.get('SCAN_JOB_QUEUE_SIZE', '100'))
+SCAN_JOBS_PER_USER = int(os.environ.get('SCAN_JOBS_PER_USER', '3'))
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class ScanQueueFullError(Exception):
+    """Raised when the scan job queue cannot accept more work"""
+
+
+class UserScanLimitError(Exception):
+    """Raised when a user already has the maximum number of active scan jobs"""
+
+
+class ScanJobManager:
+    """Background receipt scanning with a bounded queue and worker pool.
+
+    Submitted images wait in a bounded in-memory queue and are processed by
+    a fixed number of worker tasks. Each user may have at most
+    ``per_user_limit`` jobs queued or running at a time. Job state is
+    persisted through the database so it can be polled by id. Waiters are
+    woken as soon as a job finishes, but only within this process: jobs
+    submitted to another worker process, or before a restart, have to be
+    polled through the database.
+    """
+
+    def __init__(self, processor, database, workers: int = SCAN_JOB_WORKERS,
+                 max_queue: int = SCAN_JOB_QUEUE_SIZE, per_user_limit: int = SCAN_JOBS_PER_USER):
+        self.processor = processor
+        self.db = database
+        self.workers = workers
+        self.max_queue = max_queue
+        self.per_user_limit = per_user_limit
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks = []
+        self._active_per_user: Dict[int, int] = {}
+        self._done_events: Dict[str, asyncio.Event] = {}
+        self._completed = 0
+        self._failed = 0
+
+    async def start(self):
+        """Start the worker tasks; jobs left over from a previous run are failed"""
+        interrupted = await self.db.fail_interrupted_scan_jobs()
+        if interrupted:
+            logger.warning(f"Marked {interrupted} interrupted scan jobs as failed")
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"scan-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Cancel the worker tasks"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def submit(self, user_id: int, filename: str, pages: List[bytes], file_info: Dict) -> Dict:
+        """Queue a receipt's page images for scanning and return the new job record"""
+        if self._queue is None:
+            raise ScanQueueFullError("Scan workers are not running")
+        if self._active_per_user.get(user_id, 0) >= self.per_user_limit:
+            raise UserScanLimitError(
+                f"You already have {self.per_user_limit} receipts being scanned, please wait"
+            )
+        if self._queue.full():
+            raise ScanQueueFullError("Too many receipts are being scanned, please retry shortly")
+
+        job_id = str(uuid.uuid4())
+        self._active_per_user[user_id] = self._active_per_user.get(user_id, 0) + 1
+        self._done_events[job_id] = asyncio.Event()
+        try:
+            job = await self.db.create_scan_job(job_id, user_id, filename, file_info["file_size"])
+            self._queue.put_nowait((job_id, user_id, pages, file_info))
+        except BaseException:
+            self._release(job_id, user_id)
+            raise
+        return job
+
+    def _release(self, job_id: str, user_id: int):
+        remaining = self._active_per_user.get(user_id, 1) - 1
+        if remaining > 0:
+            self._active_per_user[user_id] = remaining
+        else:
+            self._active_per_user.pop(user_id, None)
+        event = self._done_events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self):
+        while True:
+            job_id, user_id, pages, file_info = await self._queue.get()
+            try:
+                await self.db.update_scan_job(job_id, "processing")
+                result = await self.processor.process_pages(pages, user_id)
+                result["file_info"] = file_info
+                await self.db.update_scan_job(job_id, "succeeded", result=result)
+                self._completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scan job {job_id} failed: {e}")
+                self._failed += 1
+                try:
+                    await self.db.update_scan_job(job_id, "failed", error=str(e))
+                except Exception as db_error:
+                    logger.error(f"Could not record failure of scan job {job_id}: {db_error}")
+            finally:
+                self._release(job_id, user_id)
+                self._queue.task_done()
+
+    async def wait_for(self, job_id: str, timeout: float) -> Optional[bool]:
+        """Wait up to ``timeout`` seconds for a job to finish.
+
+        Returns True if it finished and False on timeout. Returns None at once
+        when this process isn't running the job (it already finished, or it
+        belongs to another process); the caller has to check the database.
+        """
+        event = self._done_events.get(job_id)
+        if event is None:
+            return None
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> Dict:
+        """Queue and worker metrics"""
+        return {
+            "workers": len(self._worker_tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "active_jobs": sum(self._active_per_user.values()),
+            "per_user_limit": self.per_user_limit,
+            "completed": self._completed,
+            "failed": self._failed
+        }
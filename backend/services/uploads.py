@@ -0,0 +1,204 @@
+import asyncio
+import ctypes
+import json
+import mmap
+import os
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, UploadFile
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # optional dependency: PDF receipts are rejected without it
+    pdfium = None
+
+# Uploads larger than this are memory-mapped from their spool file instead of
+# being copied into memory
+UPLOAD_MMAP_THRESHOLD = int(os.environ.get('UPLOAD_MMAP_THRESHOLD', str(1024 * 1024)))
+UPLOAD_SNIFF_BYTES = 16
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', '10'))
+PDF_RENDER_DPI = int(os.environ.get('PDF_RENDER_DPI', '200'))
+
+# Formats are identified from the file's leading bytes, never its name
+MAGIC_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"%PDF-", "pdf"),
+)
+FORMAT_EXTENSIONS = {
+    "jpeg": ("jpg", "jpeg"),
+    "png": ("png",),
+    "pdf": ("pdf",),
+}
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+
+class UnsupportedUploadError(Exception):
+    """Raised when an upload is not in an accepted format"""
+
+
+class FormatUnavailableError(UnsupportedUploadError):
+    """Raised for an accepted format whose optional decoder is not installed"""
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Identify jpeg, png or pdf from the first bytes of a file"""
+    for signature, fmt in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return fmt
+    return None
+
+
+def allowed_formats(extensions: Iterable[str]) -> List[str]:
+    """Formats whose usual extensions appear in ``extensions``"""
+    extensions = {ext.lower().lstrip('.') for ext in extensions}
+    return [fmt for fmt, exts in FORMAT_EXTENSIONS.items() if extensions.intersection(exts)]
+
+
+class ReceiptUpload:
+    """A validated upload whose content is exposed as a read-only buffer.
+
+    Small uploads are held as bytes; larger ones are memory-mapped straight
+    from the temporary file the multipart parser spooled them to, so the
+    content is never copied into the Python heap just to be decoded.
+    """
+
+    def __init__(self, filename: str, fmt: str, size: int, buffer, mapping: Optional[mmap.mmap] = None):
+        self.filename = filename
+        self.format = fmt
+        self.size = size
+        self.buffer = buffer
+        self._mapping = mapping
+
+    def close(self):
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+
+
+async def receive_upload(file: UploadFile, max_size: int, extensions: Iterable[str]) -> ReceiptUpload:
+    """Check size and sniffed format of an upload and map its content"""
+    head = await file.read(UPLOAD_SNIFF_BYTES)
+    fmt = sniff_format(head)
+    formats = allowed_formats(extensions)
+    if fmt not in formats:
+        supported = ", ".join(ext for f in formats for ext in FORMAT_EXTENSIONS[f])
+        raise UnsupportedUploadError(f"File type not allowed. Supported: {supported}")
+    if fmt == "pdf" and pdfium is None:
+        raise FormatUnavailableError("PDF receipts are not supported on this server (pypdfium2 is not installed)")
+
+    # The body has already been streamed to a spool file by the multipart
+    # parser (and capped on the way in by UploadSizeLimitMiddleware)
+    spool = file.file
+    size = file.size if file.size is not None else spool.seek(0, os.SEEK_END)
+    if size > max_size:
+        raise UploadTooLargeError(f"File too large. Maximum size: {max_size // (1024 * 1024)}MB")
+
+    spool.seek(0)
+    if size <= UPLOAD_MMAP_THRESHOLD:
+        return ReceiptUpload(file.filename, fmt, size, spool.read())
+    # Copy-on-write so the mapping can back a ctypes buffer; nothing writes to it
+    mapping = mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_COPY)
+    return ReceiptUpload(file.filename, fmt, size, mapping, mapping)
+
+
+def render_pdf_pages(buffer, max_pages: int = PDF_MAX_PAGES, dpi: int = PDF_RENDER_DPI) -> List[bytes]:
+    """Render each page of a PDF receipt to a JPEG image"""
+    if pdfium is None:
+        raise UnsupportedUploadError("PDF receipts are not supported on this server")
+
+    if not isinstance(buffer, bytes):
+        # pdfium reads memory-mapped content in place through a ctypes view
+        buffer = (ctypes.c_char * len(buffer)).from_buffer(buffer)
+    try:
+        document = pdfium.PdfDocument(buffer)
+    except pdfium.PdfiumError as e:
+        raise UnsupportedUploadError(f"Unable to read PDF: {e}")
+    try:
+        if len(document) > max_pages:
+            raise UnsupportedUploadError(f"PDF has too many pages. Maximum: {max_pages}")
+        pages = []
+        for index in range(len(document)):
+            page = document[index]
+            image = page.render(scale=dpi / 72).to_pil().convert("L")
+            encoded = BytesIO()
+            image.save(encoded, format="JPEG", quality=85)
+            pages.append(encoded.getvalue())
+            page.close()
+        return pages
+    finally:
+        document.close()
+
+
+async def upload_pages(upload: ReceiptUpload) -> List:
+    """Receipt images in an upload: the image itself, or one per PDF page.
+
+    An image page is the upload's own buffer, not a copy, so a mapped upload
+    is read in place by hashing and decoding; it stays mapped for as long as
+    the page is referenced and must not be closed while in use. PDF pages are
+    freshly rendered bytes.
+    """
+    if upload.format == "pdf":
+        # pdfium is not thread-safe, so all pages render in one worker thread
+        return await asyncio.to_thread(render_pdf_pages, upload.buffer)
+    return [upload.buffer]
+
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized request bodies on upload routes while they stream in.
+
+    Requests declaring a larger Content-Length are refused before any of the
+    body is read; chunked requests are cut off as soon as the running total
+    passes the limit, instead of after the whole file has been received.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing, which lets HTTPException through
+                    raise HTTPException(status_code=413, detail=self._detail(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    def _detail(limit: int) -> str:
+        return f"File too large. Maximum size: {(limit - MULTIPART_OVERHEAD) // (1024 * 1024)}MB"
+
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = json.dumps({"detail": UploadSizeLimitMiddleware._detail(limit)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,200 @@
+"""
+Store name canonicalization for GroziOne backend
+Maps merchant names as printed on receipts ("TESCO SUPERSTORE 2231") to one
+canonical name per store ("Tesco") using an alias table and a trigram index
+"""
+
+import functools
+import hashlib
+import os
+import re
+import string
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+STORE_MATCH_THRESHOLD = float(os.getenv("STORE_MATCH_THRESHOLD", "0.65"))
+STORE_NAME_CACHE_SIZE = int(os.getenv("STORE_NAME_CACHE_SIZE", "4096"))
+
+# Bump when normalization or matching rules change, so saved names are
+# canonicalized again by the next startup backfill
+STORE_RULES_VERSION = 3
+# Shortest canonical key a longer name may be folded into by prefix
+PREFIX_MATCH_MIN_LENGTH = 4
+
+UNKNOWN_STORE = "Unknown Store"
+
+# Words that describe the branch format rather than the store
+NOISE_WORDS = {
+    "superstore", "supermarket", "supermarkets", "extra", "express", "metro", "local",
+    "store", "stores", "ltd", "limited", "plc", "uk", "gb", "the", "branch"
+}
+
+# (alias, canonical) pairs seeded into the store_aliases table. Aliases are
+# matched after normalization, so case, punctuation and noise words such as
+# "Superstore" need no entries of their own.
+DEFAULT_STORE_ALIASES: List[Tuple[str, str]] = [
+    ("tesco", "Tesco"),
+    ("asda", "Asda"),
+    ("aldi", "Aldi"),
+    ("aldi sud", "Aldi"),
+    ("aldi nord", "Aldi"),
+    ("lidl", "Lidl"),
+    ("best foods", "Best foods"),
+    ("bestfoods", "Best foods"),
+    ("quality", "Quality"),
+    ("quality foods", "Quality"),
+    ("freshco", "Freshco"),
+    ("fresh co", "Freshco"),
+    ("sainsburys", "Sainsbury's"),
+    ("j sainsbury", "Sainsbury's"),
+    ("morrisons", "Morrisons"),
+    ("wm morrison", "Morrisons"),
+    ("waitrose", "Waitrose"),
+    ("waitrose partners", "Waitrose"),
+    ("co op", "Co-op"),
+    ("coop", "Co-op"),
+    ("co operative", "Co-op"),
+    ("co operative food", "Co-op"),
+    ("marks and spencer", "M&S"),
+    ("marks spencer", "M&S"),
+    ("m and s", "M&S"),
+    ("m s", "M&S"),
+    ("m s simply food", "M&S"),
+    ("iceland", "Iceland"),
+]
+
+
+def normalize_store_name(name: str) -> str:
+    """Lowercase, strip punctuation, branch numbers and noise words"""
+    text = name.lower().replace("&", " and ").replace("'", "").replace("’", "")
+    tokens = [token for token in re.split(r"[^a-z0-9]+", text) if token and not token.isdigit()]
+    meaningful = [token for token in tokens if token not in NOISE_WORDS]
+    return " ".join(meaningful or tokens)
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def tidy_store_name(name: str) -> str:
+    """Collapse whitespace and fix the case of all-caps or all-lowercase names"""
+    cleaned = " ".join(name.split())
+    if cleaned.isupper() or cleaned.islower():
+        return string.capwords(cleaned)
+    return cleaned
+
+
+class StoreCanonicalizer:
+    """Resolves raw store names to canonical ones.
+
+    Lookup order: exact alias (after normalization), then the closest
+    canonical store of the alias table by trigram similarity. Candidates
+    come from an inverted trigram index, so only stores sharing at least
+    one trigram with the name are scored. Resolved names are kept in an
+    LRU cache.
+
+    The index is shared by all users, so it only ever holds the curated
+    stores of the alias table. Names that match none of them are tidied
+    and have their branch numbers dropped, but are never added to the
+    index: one user's "Green" must not absorb another's "Green Valley
+    Market".
+    """
+
+    def __init__(self, aliases: Iterable[Tuple[str, str]] = (), threshold: float = STORE_MATCH_THRESHOLD,
+                 cache_size: int = STORE_NAME_CACHE_SIZE):
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self._aliases: Dict[str, str] = {}
+        self._canonical: Dict[str, str] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._index: Dict[str, Set[str]] = {}
+        self.resolve = functools.lru_cache(maxsize=cache_size)(self._resolve)
+        for alias, canonical in aliases:
+            self._add_alias(alias, canonical)
+
+    def _add_canonical(self, canonical: str):
+        key = normalize_store_name(canonical)
+        if not key or key in self._canonical:
+            return
+        self._canonical[key] = canonical
+        grams = trigrams(key)
+        self._trigrams[key] = grams
+        for gram in grams:
+            self._index.setdefault(gram, set()).add(key)
+
+    def _add_alias(self, alias: str, canonical: str):
+        self._add_canonical(canonical)
+        key = normalize_store_name(alias)
+        if key:
+            self._aliases[key] = canonical
+
+    def add_alias(self, alias: str, canonical: str):
+        """Register an alias; cached resolutions are dropped"""
+        with self._lock:
+            self._add_alias(alias, canonical)
+            self.resolve.cache_clear()
+
+    def _best_match(self, key: str) -> Optional[str]:
+        grams = trigrams(key)
+        candidates = set()
+        for gram in grams:
+            candidates.update(self._index.get(gram, ()))
+
+        best_score, best = 0.0, None
+        for candidate in candidates:
+            candidate_grams = self._trigrams[candidate]
+            # Dice coefficient of the trigram sets
+            score = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+            # "quality foods" still belongs to "quality"
+            if len(candidate) >= PREFIX_MATCH_MIN_LENGTH and key.startswith(candidate + " "):
+                score = max(score, 0.9)
+            if score > best_score or (score == best_score and best is not None and candidate < best):
+                best_score, best = score, candidate
+        return best if best_score >= self.threshold else None
+
+    def _resolve(self, name: Optional[str]) -> str:
+        if not name or not name.strip():
+            return UNKNOWN_STORE
+        key = normalize_store_name(name)
+        if not key:
+            return tidy_store_name(name)
+
+        with self._lock:
+            if key in self._aliases:
+                return self._aliases[key]
+            if key in self._canonical:
+                return self._canonical[key]
+            match = self._best_match(key)
+            if match is not None:
+                return self._canonical[match]
+
+        # Unknown stores keep their own name, minus branch numbers
+        words = [word for word in name.split() if not word.isdigit()]
+        return tidy_store_name(" ".join(words) or name)
+
+    def fingerprint(self) -> str:
+        """Digest of the rules and aliases that decide canonical names"""
+        with self._lock:
+            aliases = sorted(self._aliases.items())
+        digest = hashlib.sha256(repr((STORE_RULES_VERSION, self.threshold, aliases)).encode())
+        return digest.hexdigest()
+
+    def stats(self) -> Dict:
+        """Index size and LRU cache counters"""
+        info = self.resolve.cache_info()
+        lookups = info.hits + info.misses
+        with self._lock:
+            return {
+                "canonical_stores": len(self._canonical),
+                "aliases": len(self._aliases),
+                "trigrams": len(self._index),
+                "cache_size": info.currsize,
+                "cache_maxsize": info.maxsize,
+                "cache_hits": info.hits,
+                "cache_misses": info.misses,
+                "cache_hit_ratio": round(info.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+__all__ = ["StoreCanonicalizer", "DEFAULT_STORE_ALIASES", "UNKNOWN_STORE", "normalize_store_name"]
@@ -18,6 +18,7 @@ import "./App.css";
 
 function GroceryApp() {
   const [groceryItems, setGroceryItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [storeSummary, setStoreSummary] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
   const [currentView, setCurrentView] = useState('home');
@@ -42,11 +43,13 @@ function GroceryApp() {
   const loadData = async () => {
     setIsLoading(true);
     try {
-      const [items, summary] = await Promise.all([
-        apiService.getGroceryItems(),
+      // Only the newest page of items; the list loads older ones on demand
+      const [page, summary] = await Promise.all([
+        apiService.getGroceryItemsPage(),
         apiService.getStoreSummary()
       ]);
-      setGroceryItems(items);
+      setGroceryItems(page.items || []);
+      setNextCursor(page.next_cursor || null);
       setStoreSummary(summary);
     } catch (error) {
       console.error('Error loading data:', error);
@@ -55,6 +58,18 @@ function GroceryApp() {
     }
   };
 
+  const loadMoreItems = async () => {
+    if (!nextCursor) {
+      return;
+    }
+    const page = await apiService.getGroceryItemsPage({ cursor: nextCursor });
+    setGroceryItems((items) => [...items, ...(page.items || [])]);
+    setNextCursor(page.next_cursor || null);
+  };
+
+  // The store summaries count every item, loaded or not
+  const totalItemCount = storeSummary.reduce((total, store) => total + (store.itemCount || 0), 0);
+
   const handleAddItem = async (itemData) => {
     try {
       await apiService.addGroceryItem(itemData);
@@ -112,7 +127,7 @@ function GroceryApp() {
       color: 'bg-gradient-to-br from-blue-100 to-indigo-200 dark:from-blue-900/20 dark:to-indigo-900/20',
       hoverColor: 'hover:from-blue-200 hover:to-indigo-300 dark:hover:from-blue-900/30 dark:hover:to-indigo-900/30',
       iconColor: 'text-blue-600 dark:text-blue-400',
-      count: groceryItems.length
+      count: totalItemCount
     },
     {
       id: 'summary',
@@ -204,7 +219,16 @@ function GroceryApp() {
       case 'scan':
         return <ReceiptScanner onItemsAdded={handleReceiptItemsAdded} />;
       case 'list':
-        return <GroceryList items={groceryItems} onUpdate={handleUpdateItem} onDelete={handleDeleteItem} />;
+        return (
+          <GroceryList
+            items={groceryItems}
+            totalCount={totalItemCount}
+            hasMore={nextCursor !== null}
+            onLoadMore={loadMoreItems}
+            onUpdate={handleUpdateItem}
+            onDelete={handleDeleteItem}
+          />
+        );
       case 'summary':
         return <StoreSummary summary={storeSummary} onUpdate={handleUpdateItem} onDelete={handleDeleteItem} />;
       case 'compare':
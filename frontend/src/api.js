@@ -7,20 +7,74 @@ const getAuthHeaders = () => {
   return token ? { Authorization: `Bearer ${token}` } : {};
 };
 
+// Trade the stored refresh token for a new token pair; false if there is none or it was rejected
+let pendingRefresh = null;
+export const refreshSession = () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) {
+    return Promise.resolve(false);
+  }
+  // Requests failing together share one refresh, since each refresh token is replaced on use
+  pendingRefresh = pendingRefresh || fetch(`${API}/token/refresh`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ refresh_token: refreshToken }),
+  })
+    .then(async (response) => {
+      if (!response.ok) {
+        return false;
+      }
+      const data = await response.json();
+      localStorage.setItem('token', data.access_token);
+      localStorage.setItem('refreshToken', data.refresh_token);
+      localStorage.setItem('user', JSON.stringify(data.user));
+      return true;
+    })
+    .catch(() => false)
+    .finally(() => {
+      pendingRefresh = null;
+    });
+  return pendingRefresh;
+};
+
+// fetch with the stored access token, refreshing it and retrying once when it has expired
+export const authFetch = async (url, options = {}) => {
+  const send = () => fetch(url, { ...options, headers: { ...options.headers, ...getAuthHeaders() } });
+  const response = await send();
+  if (response.status === 401 && (await refreshSession())) {
+    return send();
+  }
+  return response;
+};
+
+// Item lists load a page at a time and only the columns they show
+export const ITEMS_PAGE_SIZE = 50;
+const ITEM_LIST_FIELDS = ['id', 'itemName', 'store', 'quantity', 'price', 'date'];
+
 export const api = {
-  // Get all grocery items
-  getGroceryItems: async () => {
+  // Revoke the current session's tokens; other devices stay signed in
+  logout: async () => {
+    const response = await authFetch(`${API}/logout`, { method: 'POST' });
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return response.json();
+  },
+
+  // Get one page of grocery items, newest first, with only the fields the
+  // item lists render. Pass the returned next_cursor as `cursor` for the next
+  // page. Optional filters (store, date_from, date_to) are applied on the server.
+  getGroceryItemsPage: async ({ cursor = null, limit = ITEMS_PAGE_SIZE, ...filters } = {}) => {
     try {
-      const response = await fetch(`${API}/grocery-items`, {
-        headers: {
-          ...getAuthHeaders(),
-        },
-      });
+      const params = new URLSearchParams({ ...filters, limit: String(limit), fields: ITEM_LIST_FIELDS.join(',') });
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
+      const response = await authFetch(`${API}/grocery-items?${params}`);
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
-      const data = await response.json();
-      return data.items || [];
+      return await response.json();
     } catch (error) {
       console.error('Error fetching grocery items:', error);
       throw error;
@@ -30,11 +84,10 @@ export const api = {
   // Add new grocery item
   addGroceryItem: async (item) => {
     try {
-      const response = await fetch(`${API}/grocery-items`, {
+      const response = await authFetch(`${API}/grocery-items`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          ...getAuthHeaders(),
         },
         body: JSON.stringify(item),
       });
@@ -54,11 +107,10 @@ export const api = {
   // Update grocery item
   updateGroceryItem: async (id, item) => {
     try {
-      const response = await fetch(`${API}/grocery-items/${id}`, {
+      const response = await authFetch(`${API}/grocery-items/${id}`, {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
-          ...getAuthHeaders(),
         },
         body: JSON.stringify(item),
       });
@@ -78,11 +130,8 @@ export const api = {
   // Delete grocery item
   deleteGroceryItem: async (id) => {
     try {
-      const response = await fetch(`${API}/grocery-items/${id}`, {
+      const response = await authFetch(`${API}/grocery-items/${id}`, {
         method: 'DELETE',
-        headers: {
-          ...getAuthHeaders(),
-        },
       });
 
       if (!response.ok) {
@@ -97,28 +146,30 @@ export const api = {
     }
   },
 
-  // Get spending summary by store
+  // Get server-side price comparison across stores
+  getPriceComparison: async ({ limit = 100, offset = 0, sort = 'savings' } = {}) => {
+    try {
+      const params = new URLSearchParams({ limit, offset, sort });
+      const response = await authFetch(`${API}/compare?${params}`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching price comparison:', error);
+      throw error;
+    }
+  },
+
+  // Get spending summary by store, with a preview of recent items per store
   getStoreSummary: async () => {
     try {
-      const items = await api.getGroceryItems();
-      
-      // Calculate summary from items
-      const summary = items.reduce((acc, item) => {
-        if (!acc[item.store]) {
-          acc[item.store] = {
-            store: item.store,
-            totalSpent: 0,
-            itemCount: 0,
-            items: []
-          };
-        }
-        acc[item.store].totalSpent += item.price;
-        acc[item.store].itemCount += 1;
-        acc[item.store].items.push(item);
-        return acc;
-      }, {});
-      
-      return Object.values(summary);
+      const response = await authFetch(`${API}/store-summary?preview=4`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const data = await response.json();
+      return data.stores || [];
     } catch (error) {
       console.error('Error getting store summary:', error);
       throw error;
@@ -163,11 +214,7 @@ export const api = {
   // Admin endpoints
   getUsers: async () => {
     try {
-      const response = await fetch(`${API}/users`, {
-        headers: {
-          ...getAuthHeaders(),
-        },
-      });
+      const response = await authFetch(`${API}/users`);
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
@@ -181,11 +228,10 @@ export const api = {
 
   createUser: async (userData) => {
     try {
-      const response = await fetch(`${API}/admin/register`, {
+      const response = await authFetch(`${API}/admin/register`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          ...getAuthHeaders(),
         },
         body: JSON.stringify(userData),
       });
@@ -204,11 +250,10 @@ export const api = {
 
   updateUser: async (userId, userData) => {
     try {
-      const response = await fetch(`${API}/admin/users/${userId}`, {
+      const response = await authFetch(`${API}/admin/users/${userId}`, {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
-          ...getAuthHeaders(),
         },
         body: JSON.stringify(userData),
       });
@@ -227,11 +272,8 @@ export const api = {
 
   deleteUser: async (userId) => {
     try {
-      const response = await fetch(`${API}/admin/users/${userId}`, {
+      const response = await authFetch(`${API}/admin/users/${userId}`, {
         method: 'DELETE',
-        headers: {
-          ...getAuthHeaders(),
-        },
       });
 
       if (!response.ok) {
@@ -248,11 +290,7 @@ export const api = {
 
   getDashboardStats: async () => {
     try {
-      const response = await fetch(`${API}/admin/dashboard`, {
-        headers: {
-          ...getAuthHeaders(),
-        },
-      });
+      const response = await authFetch(`${API}/admin/dashboard`);
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
@@ -267,13 +305,13 @@ export const api = {
 // Fallback to mock API if backend is not available
 export const createAPIWithFallback = () => {
   return {
-    getGroceryItems: async () => {
+    getGroceryItemsPage: async (options) => {
       try {
-        return await api.getGroceryItems();
+        return await api.getGroceryItemsPage(options);
       } catch (error) {
         console.warn('Backend not available, using mock data:', error);
         const { mockAPI } = await import('./mock');
-        return await mockAPI.getGroceryItems();
+        return await mockAPI.getGroceryItemsPage(options);
       }
     },
 
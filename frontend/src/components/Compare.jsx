@@ -1,46 +1,36 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
 import { TrendingDown, TrendingUp, Scale } from 'lucide-react';
+import { api } from '../api';
 
-const Compare = ({ items }) => {
-  // Group items by name (case insensitive)
-  const groupedItems = items.reduce((acc, item) => {
-    const itemName = item.itemName.toLowerCase().trim();
-    if (!acc[itemName]) {
-      acc[itemName] = [];
-    }
-    acc[itemName].push(item);
-    return acc;
-  }, {});
+// Unit prices are per kg, per litre or per piece, whichever the product is bought by
+const formatUnitPrice = (unitPrice, unit) =>
+  `£${unitPrice.toFixed(2)}/${unit === 'pcs' ? 'each' : unit}`;
 
-  // Filter groups that have more than one item from different stores
-  const comparableItems = Object.entries(groupedItems)
-    .filter(([_, itemGroup]) => {
-      // Check if we have items from different stores
-      const uniqueStores = new Set(itemGroup.map(item => item.store));
-      return uniqueStores.size > 1;
-    })
-    .map(([itemName, itemGroup]) => {
-      // Sort by price to find cheapest and most expensive
-      const sortedByPrice = [...itemGroup].sort((a, b) => a.price - b.price);
-      const cheapest = sortedByPrice[0];
-      const mostExpensive = sortedByPrice[sortedByPrice.length - 1];
-      const savings = mostExpensive.price - cheapest.price;
-      const savingsPercentage = savings > 0 ? ((savings / mostExpensive.price) * 100).toFixed(1) : '0.0';
+const Compare = ({ items }) => {
+  const [comparableItems, setComparableItems] = useState([]);
+  const [totalComparable, setTotalComparable] = useState(0);
+  const [totalPotentialSavings, setTotalPotentialSavings] = useState(0);
 
-      return {
-        itemName: itemGroup[0].itemName, // Use original case
-        cheapest,
-        mostExpensive,
-        savings,
-        savingsPercentage,
-        allStores: itemGroup,
-        storeCount: itemGroup.length
-      };
-    })
-    .filter(comparison => comparison.savings > 0) // Only show items with actual price differences
-    .sort((a, b) => b.savings - a.savings); // Sort by highest savings first
+  // Comparison is computed on the server; refetch whenever the item list changes
+  useEffect(() => {
+    let cancelled = false;
+    api.getPriceComparison()
+      .then((data) => {
+        if (!cancelled) {
+          setComparableItems(data.items || []);
+          setTotalComparable(data.total || 0);
+          setTotalPotentialSavings(data.total_savings || 0);
+        }
+      })
+      .catch((error) => {
+        console.error('Error loading price comparison:', error);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [items]);
 
   if (comparableItems.length === 0) {
     return (
@@ -56,15 +46,13 @@ const Compare = ({ items }) => {
     );
   }
 
-  const totalPotentialSavings = comparableItems.reduce((sum, item) => sum + item.savings, 0);
-
   return (
     <div className="w-full space-y-6">
       <Card>
         <CardHeader>
           <CardTitle className="flex items-center gap-2">
             <Scale className="h-5 w-5" />
-            Price Comparison ({comparableItems.length} items)
+            Price Comparison ({totalComparable} items)
           </CardTitle>
         </CardHeader>
         <CardContent>
@@ -108,9 +96,11 @@ const Compare = ({ items }) => {
                       </Badge>
                     </div>
                     <div className="flex items-center gap-4 text-sm">
-                      <span className="text-muted-foreground">Qty: {comparison.cheapest.quantity}</span>
+                      <span className="text-muted-foreground">
+                        Qty: {comparison.cheapest.quantity} for £{comparison.cheapest.price.toFixed(2)}
+                      </span>
                       <span className="font-bold text-green-600 dark:text-green-400">
-                        £{comparison.cheapest.price.toFixed(2)}
+                        {formatUnitPrice(comparison.cheapest.unitPrice, comparison.unit)}
                       </span>
                     </div>
                   </div>
@@ -127,9 +117,11 @@ const Compare = ({ items }) => {
                       </Badge>
                     </div>
                     <div className="flex items-center gap-4 text-sm">
-                      <span className="text-muted-foreground">Qty: {comparison.mostExpensive.quantity}</span>
+                      <span className="text-muted-foreground">
+                        Qty: {comparison.mostExpensive.quantity} for £{comparison.mostExpensive.price.toFixed(2)}
+                      </span>
                       <span className="font-bold text-red-600 dark:text-red-400">
-                        £{comparison.mostExpensive.price.toFixed(2)}
+                        {formatUnitPrice(comparison.mostExpensive.unitPrice, comparison.unit)}
                       </span>
                     </div>
                   </div>
@@ -151,15 +143,15 @@ const Compare = ({ items }) => {
                   <div className="pt-2 border-t">
                     <h4 className="font-medium text-sm mb-2">All Stores:</h4>
                     <div className="flex flex-wrap gap-2">
-                      {comparison.allStores
-                        .sort((a, b) => a.price - b.price)
-                        .map((item, idx) => (
-                          <Badge 
-                            key={idx} 
-                            variant={item.price === comparison.cheapest.price ? "default" : "secondary"}
+                      {[...comparison.allStores]
+                        .sort((a, b) => a.unitPrice - b.unitPrice)
+                        .map((item) => (
+                          <Badge
+                            key={item.id}
+                            variant={item.id === comparison.cheapest.id ? "default" : "secondary"}
                             className="text-xs"
                           >
-                            {item.store}: £{item.price.toFixed(2)}
+                            {item.store}: {formatUnitPrice(item.unitPrice, comparison.unit)}
                           </Badge>
                         ))}
                     </div>
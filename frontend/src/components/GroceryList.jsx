@@ -7,10 +7,11 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '.
 import { Trash2, ShoppingCart, Edit2, Check, X } from 'lucide-react';
 import { useToast } from '../hooks/use-toast';
 
-const GroceryList = ({ items, onDelete, onUpdate }) => {
+const GroceryList = ({ items, totalCount, hasMore = false, onLoadMore, onDelete, onUpdate }) => {
   const { toast } = useToast();
   const [editingId, setEditingId] = useState(null);
   const [editForm, setEditForm] = useState({});
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const storeOptions = [
     'Tesco',
@@ -63,6 +64,21 @@ const GroceryList = ({ items, onDelete, onUpdate }) => {
     }
   };
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      await onLoadMore();
+    } catch (error) {
+      toast({
+        title: "Error",
+        description: "Failed to load more items. Please try again.",
+        variant: "destructive",
+      });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (id, itemName) => {
     try {
       await onDelete(id);
@@ -127,7 +143,7 @@ const GroceryList = ({ items, onDelete, onUpdate }) => {
         <CardHeader>
           <CardTitle className="flex items-center gap-2">
             <ShoppingCart className="h-5 w-5" />
-            Grocery Items ({items.length})
+            Grocery Items ({Math.max(totalCount || 0, items.length)})
           </CardTitle>
         </CardHeader>
       </Card>
@@ -252,6 +268,14 @@ const GroceryList = ({ items, onDelete, onUpdate }) => {
             </CardContent>
           </Card>
         ))}
+
+      {hasMore && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={handleLoadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : `Load more (${items.length} shown)`}
+          </Button>
+        </div>
+      )}
     </div>
   );
 };
@@ -146,7 +146,7 @@ const Login = ({ onLogin }) => {
           setIsSignUp(false);
           setFormData({ username: '', email: '', password: '' });
         } else {
-          login(data.user, data.access_token);
+          login(data.user, data.access_token, data.refresh_token);
           toast({
             title: "Login Successful!",
             description: `Welcome back, ${data.user.username}!`,
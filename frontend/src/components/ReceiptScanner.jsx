@@ -8,7 +8,7 @@ import { Label } from './ui/label';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from './ui/select';
 import { Camera, Upload, Check, X, AlertCircle, Loader2, Scan } from 'lucide-react';
 import { useToast } from '../hooks/use-toast';
-import { useAuth } from '../contexts/AuthContext';
+import { authFetch } from '../api';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -20,7 +20,6 @@ const ReceiptScanner = ({ onItemsAdded }) => {
   const [isConfirming, setIsConfirming] = useState(false);
   const fileInputRef = useRef(null);
   const { toast } = useToast();
-  const { getAuthHeaders } = useAuth();
 
   const storeOptions = [
     'Tesco',
@@ -91,10 +90,10 @@ const ReceiptScanner = ({ onItemsAdded }) => {
     if (!file) return;
 
     // Validate file type
-    if (!file.type.startsWith('image/')) {
+    if (!file.type.startsWith('image/') && file.type !== 'application/pdf') {
       toast({
         title: "Invalid File Type",
-        description: "Please select an image file (JPG, PNG)",
+        description: "Please select an image or PDF file (JPG, PNG, PDF)",
         variant: "destructive",
       });
       return;
@@ -104,7 +103,7 @@ const ReceiptScanner = ({ onItemsAdded }) => {
     if (file.size > 10 * 1024 * 1024) {
       toast({
         title: "File Too Large",
-        description: "Please select an image smaller than 10MB",
+        description: "Please select a file smaller than 10MB",
         variant: "destructive",
       });
       return;
@@ -117,11 +116,8 @@ const ReceiptScanner = ({ onItemsAdded }) => {
       const formData = new FormData();
       formData.append('file', file);
 
-      const response = await fetch(`${API}/scan-receipt`, {
+      const response = await authFetch(`${API}/scan-receipt`, {
         method: 'POST',
-        headers: {
-          ...getAuthHeaders(),
-        },
         body: formData,
       });
 
@@ -189,11 +185,10 @@ const ReceiptScanner = ({ onItemsAdded }) => {
         total_price: item.price || item.total_price || 0
       }));
 
-      const response = await fetch(`${API}/confirm-receipt-items`, {
+      const response = await authFetch(`${API}/confirm-receipt-items`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          ...getAuthHeaders(),
         },
         body: JSON.stringify({
           items: transformedItems,
@@ -271,7 +266,7 @@ const ReceiptScanner = ({ onItemsAdded }) => {
                 <input
                   ref={fileInputRef}
                   type="file"
-                  accept="image/*"
+                  accept="image/*,application/pdf"
                   onChange={handleFileSelect}
                   className="hidden"
                 />
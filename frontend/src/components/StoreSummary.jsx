@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
 import { Button } from './ui/button';
@@ -6,13 +6,38 @@ import { Input } from './ui/input';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from './ui/select';
 import { Store, Package, ChevronRight, ChevronDown, Edit2, Trash2, Check, X } from 'lucide-react';
 import { useToast } from '../hooks/use-toast';
+import { api } from '../api';
 
 const StoreSummary = ({ summary, onUpdate, onDelete }) => {
   const [expandedStore, setExpandedStore] = useState(null);
   const [editingId, setEditingId] = useState(null);
   const [editForm, setEditForm] = useState({});
+  const [storeItems, setStoreItems] = useState({});
+  const [storeCursor, setStoreCursor] = useState(null);
   const { toast } = useToast();
 
+  // The summary only carries a preview of each store's items, so load the
+  // first page for the expanded store (and reload it when the summary changes)
+  useEffect(() => {
+    if (!expandedStore) {
+      return;
+    }
+    let cancelled = false;
+    api.getGroceryItemsPage({ store: expandedStore })
+      .then((page) => {
+        if (!cancelled) {
+          setStoreItems({ [expandedStore]: page.items || [] });
+          setStoreCursor(page.next_cursor || null);
+        }
+      })
+      .catch((error) => {
+        console.error('Error loading store items:', error);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [summary, expandedStore]);
+
   const storeOptions = [
     'Tesco',
     'Asda',
@@ -24,6 +49,17 @@ const StoreSummary = ({ summary, onUpdate, onDelete }) => {
     'Others'
   ];
 
+  const loadMoreStoreItems = async () => {
+    const store = expandedStore;
+    try {
+      const page = await api.getGroceryItemsPage({ store, cursor: storeCursor });
+      setStoreItems((loaded) => ({ [store]: [...(loaded[store] || []), ...(page.items || [])] }));
+      setStoreCursor(page.next_cursor || null);
+    } catch (error) {
+      console.error('Error loading store items:', error);
+    }
+  };
+
   const handleStoreClick = (storeName) => {
     setExpandedStore(expandedStore === storeName ? null : storeName);
     setEditingId(null); // Close any open edit forms
@@ -164,9 +200,9 @@ const StoreSummary = ({ summary, onUpdate, onDelete }) => {
                             {item.itemName}
                           </Badge>
                         ))}
-                        {store.items.length > 4 && (
+                        {store.itemCount > 4 && (
                           <Badge variant="secondary" className="text-xs">
-                            +{store.items.length - 4} more
+                            +{store.itemCount - 4} more
                           </Badge>
                         )}
                       </div>
@@ -178,8 +214,8 @@ const StoreSummary = ({ summary, onUpdate, onDelete }) => {
 
                   {isExpanded && (
                     <div className="space-y-3 mt-4 border-t pt-4">
-                      <h4 className="font-medium text-sm">All Items ({store.items.length}):</h4>
-                      {store.items.map((item) => (
+                      <h4 className="font-medium text-sm">All Items ({store.itemCount}):</h4>
+                      {(storeItems[store.store] || store.items).map((item) => (
                         <div key={item.id} className="p-3 border rounded-lg">
                           {editingId === item.id ? (
                             // Edit Mode
@@ -286,6 +322,11 @@ const StoreSummary = ({ summary, onUpdate, onDelete }) => {
                           )}
                         </div>
                       ))}
+                      {storeItems[store.store] && storeCursor && (
+                        <Button variant="outline" size="sm" className="w-full" onClick={loadMoreStoreItems}>
+                          Load more
+                        </Button>
+                      )}
                     </div>
                   )}
                 </CardContent>
@@ -1,4 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
+import { api } from '../api';
 
 const AuthContext = createContext();
 
@@ -28,6 +29,7 @@ export const AuthProvider = ({ children }) => {
       } catch (error) {
         console.error('Error parsing stored user data:', error);
         localStorage.removeItem('token');
+        localStorage.removeItem('refreshToken');
         localStorage.removeItem('user');
       }
     }
@@ -35,17 +37,25 @@ export const AuthProvider = ({ children }) => {
     setIsLoading(false);
   }, []);
 
-  const login = (userData, accessToken) => {
+  const login = (userData, accessToken, refreshToken) => {
     setUser(userData);
     setToken(accessToken);
     localStorage.setItem('token', accessToken);
     localStorage.setItem('user', JSON.stringify(userData));
+    if (refreshToken) {
+      localStorage.setItem('refreshToken', refreshToken);
+    }
   };
 
   const logout = () => {
+    // Revoke the session's tokens on the server; signing out locally doesn't wait for it
+    if (localStorage.getItem('token')) {
+      api.logout().catch(() => {});
+    }
     setUser(null);
     setToken(null);
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     localStorage.removeItem('user');
   };
 
@@ -58,7 +68,9 @@ export const AuthProvider = ({ children }) => {
   };
 
   const getAuthHeaders = () => {
-    return token ? { Authorization: `Bearer ${token}` } : {};
+    // The stored token is newer than state after a background refresh
+    const currentToken = localStorage.getItem('token') || token;
+    return currentToken ? { Authorization: `Bearer ${currentToken}` } : {};
   };
 
   const value = {
@@ -69,9 +69,9 @@ let groceryItems = [
 let nextId = 9;
 
 export const mockAPI = {
-  // Get all grocery items
-  getGroceryItems: () => {
-    return Promise.resolve([...groceryItems]);
+  // Get grocery items; the mock data always fits in one page
+  getGroceryItemsPage: () => {
+    return Promise.resolve({ items: [...groceryItems], next_cursor: null, has_more: false });
   },
 
   // Add new grocery item
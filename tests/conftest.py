@@ -0,0 +1,28 @@
+"""
+Shared test setup: the backend uses flat imports from backend/, and the
+module-level database must not touch the developer's grozione.db
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+_workdir = tempfile.mkdtemp(prefix="grozione-tests-")
+os.environ.setdefault("DATABASE_PATH", os.path.join(_workdir, "grozione.db"))
+os.environ.setdefault("RECEIPT_CACHE_PATH", os.path.join(_workdir, "receipt_cache.db"))
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh, fully migrated database"""
+    from database import SQLiteDatabase
+
+    db = SQLiteDatabase(str(tmp_path / "test.db"))
+    yield db
+    db.close()
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import jwt
+import pytest
+
+from auth_tokens import ACCESS_TOKEN, REFRESH_TOKEN, RevocationIndex, TokenRevokedError, TokenVerifier
+
+SECRET = "test-secret-long-enough-for-hs256-keys"
+
+
+def make_verifier(revocations=None):
+    return TokenVerifier(SECRET, "HS256", revocations or RevocationIndex())
+
+
+def test_tokens_verify_only_as_their_own_type():
+    verifier = make_verifier()
+    access = verifier.issue({"user_id": 1}, timedelta(minutes=5))
+    refresh = verifier.issue({"user_id": 1}, timedelta(days=1), REFRESH_TOKEN)
+    assert verifier.verify(access)["user_id"] == 1
+    assert verifier.verify(refresh, REFRESH_TOKEN)["user_id"] == 1
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(refresh, ACCESS_TOKEN)
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(access, REFRESH_TOKEN)
+
+
+def test_expired_and_tampered_tokens_are_rejected():
+    verifier = make_verifier()
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(verifier.issue({"user_id": 1}, timedelta(seconds=-1)))
+    with pytest.raises(jwt.InvalidSignatureError):
+        verifier.verify(jwt.encode({"user_id": 1}, "another-secret-long-enough-for-hs256", algorithm="HS256"))
+
+
+def test_user_revocation_rejects_earlier_tokens_even_when_cached():
+    verifier = make_verifier()
+    token = verifier.issue({"user_id": 1}, timedelta(minutes=5))
+    verifier.verify(token)
+    verifier.revocations.revoke(1, time.time())
+    with pytest.raises(TokenRevokedError):
+        verifier.verify(token)
+    # Signing in again after the revocation works straight away
+    assert verifier.verify(verifier.issue({"user_id": 1}, timedelta(minutes=5)))["user_id"] == 1
+
+
+def test_session_revocation_only_affects_that_session():
+    verifier = make_verifier()
+    mine = verifier.issue({"user_id": 1, "sid": "a"}, timedelta(minutes=5))
+    other_device = verifier.issue({"user_id": 1, "sid": "b"}, timedelta(minutes=5))
+    verifier.revocations.revoke_session("a", time.time() + 60)
+    with pytest.raises(TokenRevokedError):
+        verifier.verify(mine)
+    assert verifier.verify(other_device)["sid"] == "b"
+
+
+def test_expired_session_revocations_are_forgotten():
+    revocations = RevocationIndex()
+    revocations.revoke_session("old", time.time() - 1)
+    revocations.revoke_session("new", time.time() + 60)
+    assert revocations.revoked_sessions == 1
+
+
+def test_refresh_token_can_only_be_exchanged_once(database):
+    session = asyncio.run(database.create_session(1, time.time() + 60))
+    first = session["refresh_jti"]
+    second = asyncio.run(database.rotate_session(session["session_id"], first, time.time() + 60))
+    assert second and second != first
+
+    # Replaying the exchanged token ends the session, including its newest token
+    assert asyncio.run(database.rotate_session(session["session_id"], first, time.time() + 60)) is None
+    assert asyncio.run(database.rotate_session(session["session_id"], second, time.time() + 60)) is None
+    assert database.revocations.is_revoked(1, time.time(), session["session_id"])
+
+
+def test_revoking_a_session_leaves_other_sessions_alone(database):
+    phone = asyncio.run(database.create_session(1, time.time() + 60))
+    laptop = asyncio.run(database.create_session(1, time.time() + 60))
+    # Another user's id doesn't revoke the session
+    asyncio.run(database.revoke_session(phone["session_id"], 2))
+    assert not database.revocations.is_revoked(1, time.time(), phone["session_id"])
+
+    asyncio.run(database.revoke_session(phone["session_id"], 1))
+    assert database.revocations.is_revoked(1, time.time(), phone["session_id"])
+    assert not database.revocations.is_revoked(1, time.time(), laptop["session_id"])
+    assert asyncio.run(database.rotate_session(phone["session_id"], phone["refresh_jti"], time.time() + 60)) is None
+    assert asyncio.run(database.rotate_session(laptop["session_id"], laptop["refresh_jti"], time.time() + 60))
+
+
+def test_revocations_survive_a_restart(tmp_path):
+    from database import SQLiteDatabase
+
+    path = str(tmp_path / "restart.db")
+    db = SQLiteDatabase(path)
+    session = asyncio.run(db.create_session(1, time.time() + 60))
+    asyncio.run(db.revoke_session(session["session_id"], 1))
+    asyncio.run(db.revoke_user_tokens(2))
+    db.close()
+
+    db = SQLiteDatabase(path)
+    try:
+        assert db.revocations.is_revoked(1, time.time(), session["session_id"])
+        assert db.revocations.is_revoked(2, time.time() - 60)
+    finally:
+        db.close()
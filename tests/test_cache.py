@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from cache import TTLCache
+
+
+def test_entries_expire_and_evict_least_recently_used():
+    cache = TTLCache("test", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    cache.set("short", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.stats()["evictions"] == 2
+
+
+def test_invalidate_one_key_or_everything():
+    cache = TTLCache("test", ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    cache.invalidate()
+    assert cache.get("b") is None
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_value_computed_across_an_invalidation_is_not_stored():
+    cache = TTLCache("test", ttl=60)
+
+    async def scenario():
+        async def compute():
+            # A write lands while the old value is being computed
+            cache.invalidate()
+            return "old"
+
+        assert await cache.get_or_compute("key", compute) == "old"
+        assert cache.get("key") is None
+
+        async def recompute():
+            return "new"
+
+        assert await cache.get_or_compute("key", recompute) == "new"
+        assert cache.get("key") == "new"
+
+    asyncio.run(scenario())
+
+
+def test_invalidated_entries_are_never_served_stale():
+    cache = TTLCache("test", ttl=0.01, stale_ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        assert await cache.get_or_compute("key", compute) == 1
+        await asyncio.sleep(0.02)
+        # Expired but within stale_ttl: served while a refresh runs
+        assert await cache.get_or_compute("key", compute) == 1
+        await asyncio.sleep(0)
+        assert cache.get("key") == 2
+        cache.invalidate()
+        assert await cache.get_or_compute("key", compute) == 3
+
+    asyncio.run(scenario())
+
+
+def test_database_writes_fire_invalidation_hooks(database):
+    fired = []
+    database.add_invalidation_hook(lambda table, user_id: fired.append((table, user_id)))
+    asyncio.run(database.add_grocery_item(
+        {"item_name": "Milk", "store": "Tesco", "quantity": "1", "price": 1.0, "date": "2024-01-01"}, user_id=1
+    ))
+    assert ("grocery_items", 1) in fired
+
+
+def test_analytics_frames_survive_other_users_writes(database):
+    from analytics import SpendAnalytics
+
+    analytics = SpendAnalytics(database)
+    database.add_invalidation_hook(analytics.invalidate)
+    item = {"item_name": "Milk", "store": "Tesco", "quantity": "1", "price": 1.0, "date": "2024-01-01"}
+
+    async def scenario():
+        frame = await analytics.frame(1)
+        await database.create_user("newcomer", "a-long-enough-password")
+        await database.add_grocery_item(item, user_id=2)
+        assert await analytics.frame(1) is frame
+        await database.add_grocery_item(item, user_id=1)
+        assert await analytics.frame(1) is not frame
+
+    asyncio.run(scenario())
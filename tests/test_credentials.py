@@ -0,0 +1,60 @@
+import asyncio
+import hashlib
+
+from credentials import PasswordHasher, build_context
+
+
+def make_hasher():
+    return PasswordHasher(workers=1, context=build_context(pbkdf2_rounds=1000))
+
+
+def legacy_hash(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def test_new_hashes_are_salted_and_need_no_upgrade():
+    hasher = make_hasher()
+    try:
+        first = asyncio.run(hasher.hash("secret"))
+        assert first.startswith("$pbkdf2-sha256$")
+        assert asyncio.run(hasher.hash("secret")) != first
+        assert asyncio.run(hasher.verify("secret", first)) == (True, None)
+        assert asyncio.run(hasher.verify("wrong", first)) == (False, None)
+    finally:
+        hasher.shutdown()
+
+
+def test_legacy_hash_verifies_and_is_upgraded():
+    hasher = make_hasher()
+    try:
+        valid, new_hash = asyncio.run(hasher.verify("secret", legacy_hash("secret")))
+        assert valid
+        assert new_hash.startswith("$pbkdf2-sha256$")
+        assert asyncio.run(hasher.verify("secret", new_hash)) == (True, None)
+        assert asyncio.run(hasher.verify("wrong", legacy_hash("secret"))) == (False, None)
+        assert hasher.stats()["rehashed"] == 1
+    finally:
+        hasher.shutdown()
+
+
+def test_unknown_or_malformed_hashes_fail():
+    hasher = make_hasher()
+    try:
+        assert asyncio.run(hasher.verify("secret", None)) == (False, None)
+        assert asyncio.run(hasher.verify("secret", "not a hash")) == (False, None)
+    finally:
+        hasher.shutdown()
+
+
+def test_login_replaces_a_legacy_hash(database):
+    with database.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO users (username, password_hash, role, created_at) VALUES ('old', ?, 'user', '2024-01-01')",
+            (legacy_hash("secret"),)
+        )
+
+    assert asyncio.run(database.authenticate_user("old", "wrong"))["success"] is False
+    assert asyncio.run(database.authenticate_user("old", "secret"))["success"] is True
+    stored = database.get_connection().execute("SELECT password_hash FROM users WHERE username = 'old'").fetchone()[0]
+    assert stored.startswith("$pbkdf2-sha256$")
+    assert asyncio.run(database.authenticate_user("old", "secret"))["success"] is True
@@ -0,0 +1,172 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from database import MIGRATIONS, SQLiteDatabase, decode_cursor, encode_cursor
+
+# Schema of a database created before versioned migrations
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    email TEXT UNIQUE,
+    password_hash TEXT NOT NULL,
+    role TEXT DEFAULT 'user',
+    created_at TEXT NOT NULL,
+    last_login TEXT,
+    is_active INTEGER DEFAULT 1
+);
+CREATE TABLE status_checks (
+    id TEXT PRIMARY KEY,
+    client_name TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    user_id INTEGER
+);
+CREATE TABLE grocery_items (
+    id TEXT PRIMARY KEY,
+    item_name TEXT NOT NULL,
+    store TEXT NOT NULL,
+    quantity TEXT NOT NULL,
+    price REAL NOT NULL,
+    date TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    user_id INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE receipt_scans (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    processing_status TEXT NOT NULL,
+    confidence_score REAL,
+    store_name TEXT,
+    total_amount REAL,
+    items_count INTEGER,
+    scan_result TEXT,
+    created_at TEXT NOT NULL,
+    user_id INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE password_reset_tokens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    token TEXT UNIQUE NOT NULL,
+    expires_at TEXT NOT NULL,
+    used INTEGER DEFAULT 0,
+    created_at TEXT NOT NULL
+);
+"""
+
+BASELINE_ITEMS = [
+    ("i1", "TSC SEMI SKM MLK 2PT", "TESCO SUPERSTORE 2231", "1", 1.5, "2024-01-02"),
+    ("i2", "Semi Skimmed Milk 2 Pints", "Tesco", "1 pcs", 1.4, "2024-01-09"),
+    ("i3", "Loose Carrots", "Aldi", "0 kg", 0.6, "2024-01-09"),
+    ("i4", "Bananas", "Aldi", "a bunch", 1.1, "2024-01-10"),
+]
+
+
+def make_baseline_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute(
+        "INSERT INTO users (username, password_hash, role, created_at) VALUES ('admin', 'x', 'admin', '2024-01-01')"
+    )
+    conn.executemany(
+        "INSERT INTO grocery_items (id, item_name, store, quantity, price, date, created_at, user_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+        [item + (item[5] + "T12:00:00",) for item in BASELINE_ITEMS]
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_database_migrates_to_the_latest_version(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    make_baseline_db(path)
+
+    db = SQLiteDatabase(path)
+    try:
+        conn = db.get_connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-1][0]
+
+        items = {row[0]: row[1:] for row in conn.execute(
+            "SELECT id, product_id, amount, unit, unit_price FROM grocery_items"
+        )}
+        # Both spellings of the milk are one product, priced per litre
+        assert items["i1"][0] is not None and items["i1"][0] == items["i2"][0]
+        assert items["i1"][2] == "l"
+        # Zero and unparseable quantities count as one piece
+        assert items["i3"][1:] == (1.0, "pcs", 0.6)
+        assert items["i4"][1:] == (1.0, "pcs", 1.1)
+
+        assert conn.execute("SELECT COUNT(*) FROM price_history").fetchone()[0] == len(BASELINE_ITEMS)
+        summaries = dict(conn.execute("SELECT store, item_count FROM store_summaries WHERE user_id = 1"))
+        assert summaries["Aldi"] == 2
+    finally:
+        db.close()
+
+    # Reopening finds nothing left to apply
+    db = SQLiteDatabase(path)
+    try:
+        assert db.get_connection().execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-1][0]
+    finally:
+        db.close()
+
+
+def insert_items(database, rows):
+    with database.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO grocery_items (id, item_name, store, quantity, price, date, created_at, user_id) "
+            "VALUES (?, ?, ?, '1', 1.0, '2024-01-01', ?, ?)",
+            rows
+        )
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    cursor = encode_cursor("2024-01-01T12:00:00", "abc")
+    assert decode_cursor(cursor) == ("2024-01-01T12:00:00", "abc")
+    for garbage in ("", "not-a-cursor", encode_cursor("x", "y")[:-3]):
+        with pytest.raises(ValueError):
+            decode_cursor(garbage)
+
+
+def test_keyset_pages_cover_every_item_once_in_order(database):
+    # Items sharing a created_at are ordered by id, so pages can't skip or repeat them
+    rows = [(f"item-{n:02d}", f"Item {n}", "Aldi", f"2024-01-0{1 + n // 4}T12:00:00", 1) for n in range(10)]
+    insert_items(database, rows + [("other-user", "Item", "Aldi", "2024-01-09T12:00:00", 2)])
+
+    async def read_all():
+        ids, cursor = [], None
+        while True:
+            page = await database.get_grocery_items_page(1, limit=3, cursor=cursor, fields=["id"])
+            ids.extend(item["id"] for item in page["items"])
+            assert len(page["items"]) <= 3
+            if not page["has_more"]:
+                assert page["next_cursor"] is None
+                return ids
+            cursor = page["next_cursor"]
+
+    expected = [row[0] for row in sorted(rows, key=lambda row: (row[3], row[0]), reverse=True)]
+    assert asyncio.run(read_all()) == expected
+
+
+def test_keyset_page_rejects_unknown_fields(database):
+    with pytest.raises(ValueError):
+        asyncio.run(database.get_grocery_items_page(1, fields=["password_hash"]))
+
+
+def test_price_comparison_picks_entries_by_unit_price(database):
+    async def scenario():
+        for store, quantity, price in (("Tesco", "2 l", 2.0), ("Aldi", "1 l", 1.5), ("Aldi", "500 ml", 0.9)):
+            await database.add_grocery_item(
+                {"item_name": "Orange Juice", "store": store, "quantity": quantity, "price": price,
+                 "date": "2024-01-01"}, user_id=1
+            )
+        return await database.get_price_comparison(1)
+
+    comparison = asyncio.run(scenario())["items"][0]
+    assert (comparison["entryCount"], comparison["storeCount"]) == (3, 2)
+    # The cheapest per litre costs more in total than the dearest per litre
+    assert comparison["cheapest"]["store"] == "Tesco" and comparison["cheapest"]["unitPrice"] == 1.0
+    assert comparison["mostExpensive"]["unitPrice"] == 1.8
+    assert comparison["savings"] == 0.4
+    assert {entry["id"] for entry in comparison["allStores"]} >= {comparison["cheapest"]["id"]}
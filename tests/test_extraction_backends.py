@@ -0,0 +1,30 @@
+import pytest
+
+from services.extraction_backends import ExtractionBackend, LocalOCRBackend, parse_receipt_lines
+
+
+def test_backend_must_implement_extract():
+    with pytest.raises(TypeError):
+        ExtractionBackend()
+
+
+def test_parse_receipt_lines():
+    result = parse_receipt_lines([
+        "TESCO EXPRESS",
+        "2 x Bananas 1.20",
+        "Milk 4 pints 1.45",
+        "Card 2.65",
+        "TOTAL 2.65",
+    ])
+    assert result["store"] == "Tesco Express"
+    assert [(i["itemName"], i["quantity"], i["price"]) for i in result["items"]] == [
+        ("Bananas", "2 pcs", 1.20), ("Milk 4 pints", "1 pcs", 1.45)
+    ]
+    assert result["total"] == 2.65
+    assert result["confidence"] == 0.6
+
+
+def test_local_backend_explains_why_it_is_unavailable():
+    backend = LocalOCRBackend()
+    if not backend.is_available():
+        assert "tesseract" in backend.unavailable_reason()
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+
+import pytest
+
+from services import receipt_processor as rp
+from services.circuit_breaker import CircuitBreaker
+from services.extraction_backends import AzureExtractionBackend, ExtractionBackend
+
+ITEMS = {"items": [{"itemName": "Milk", "quantity": "1 pcs", "price": 1.0, "store": "Tesco"}],
+         "store": "Tesco", "total": 1.0, "confidence": 0.6, "processing_method": "fake"}
+
+
+class FastBackend(ExtractionBackend):
+    name = "fast"
+
+    async def extract(self, image_bytes):
+        await asyncio.sleep(0.01)
+        return ITEMS
+
+
+@pytest.fixture
+def processor():
+    processor = rp.ReceiptProcessor()
+    processor.endpoint, processor.key = "https://azure.invalid", "key"
+    yield processor
+    asyncio.run(processor.close())
+
+
+def test_abandoned_calls_open_the_circuit():
+    breaker = CircuitBreaker("test", min_calls=2, failure_threshold=0.5)
+    breaker.record_success(0.1)
+    breaker.record_abandoned(3.0)
+    assert breaker.state == "open"
+
+
+def test_azure_call_outrun_by_hedge_counts_as_bad(processor, monkeypatch):
+    async def slow_analysis(image_bytes):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(processor, "_analyze_with_azure", slow_analysis)
+    result = asyncio.run(processor.extract_hedged(AzureExtractionBackend(processor), FastBackend(), b"img", 0.05))
+    assert result is ITEMS
+    stats = processor.azure_breaker.stats()
+    assert (stats["window_calls"], stats["window_bad_calls"]) == (1, 1)
+
+
+def test_other_cancellation_only_releases(processor, monkeypatch):
+    async def slow_analysis(image_bytes):
+        await asyncio.sleep(10)
+
+    async def cancel_scan():
+        task = asyncio.create_task(processor.extract_with_azure_document_intelligence(b"img"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    monkeypatch.setattr(processor, "_analyze_with_azure", slow_analysis)
+    asyncio.run(cancel_scan())
+    assert processor.azure_breaker.stats()["window_calls"] == 0
+
+
+def test_warns_when_nothing_can_be_hedged(processor, caplog):
+    processor.backends = [AzureExtractionBackend(processor)]
+    with caplog.at_level(logging.WARNING, logger=rp.__name__):
+        processor.log_backend_status()
+    assert "will not be hedged" in caplog.text
+
+
+def test_cancelling_a_hedged_scan_only_releases(processor, monkeypatch):
+    async def slow_analysis(image_bytes):
+        await asyncio.sleep(10)
+
+    class SlowBackend(FastBackend):
+        async def extract(self, image_bytes):
+            await asyncio.sleep(10)
+
+    async def cancel_scan():
+        task = asyncio.create_task(
+            processor.extract_hedged(AzureExtractionBackend(processor), SlowBackend(), b"img", 0.01)
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    monkeypatch.setattr(processor, "_analyze_with_azure", slow_analysis)
+    asyncio.run(cancel_scan())
+    assert processor.azure_breaker.stats()["window_calls"] == 0
@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from services import item_transfer
+from services.item_transfer import UnsupportedFormatError, check_export_format, export_formats, export_items
+
+
+def collect(fmt, pages):
+    async def fetch_page(cursor):
+        return pages[int(cursor or 0)]
+
+    async def run():
+        return b"".join([chunk async for chunk in export_items(fetch_page, fmt, ["itemName", "price"])])
+
+    return asyncio.run(run())
+
+
+def test_export_streams_every_page():
+    pages = [
+        {"items": [{"itemName": "Milk", "price": 1.5}], "next_cursor": "1", "has_more": True},
+        {"items": [{"itemName": "Bread", "price": 1.1}], "next_cursor": None, "has_more": False},
+    ]
+    assert collect("csv", pages).decode().splitlines() == ["itemName,price", "Milk,1.5", "Bread,1.1"]
+    assert len(collect("ndjson", pages).splitlines()) == 2
+
+
+def test_parquet_is_only_offered_with_pyarrow(monkeypatch):
+    monkeypatch.setattr(item_transfer, "pq", None)
+    assert export_formats() == ["csv", "ndjson"]
+    with pytest.raises(UnsupportedFormatError, match=r"pyarrow is not installed\)\. Supported: csv, ndjson$"):
+        check_export_format("parquet")
+    with pytest.raises(UnsupportedFormatError, match="Supported: csv, ndjson$"):
+        check_export_format("xlsx")
@@ -0,0 +1,64 @@
+import sqlite3
+
+from products import ProductIndex, parse_product_name, parse_quantity, quantity_columns
+
+
+def test_product_key_ignores_word_order_abbreviations_and_sizes():
+    assert parse_product_name("Semi Skimmed Milk 2L")["key"] == parse_product_name("MILK SEMI-SKIMMED")["key"]
+    assert parse_product_name("Chkn Brst Fillets")["key"] == parse_product_name("Chicken Breast Fillet")["key"]
+
+
+def test_resolve_reuses_products_per_user(database):
+    conn = database.get_connection()
+    index = ProductIndex()
+    with conn:
+        milk = index.resolve(conn.cursor(), 1, "Whole Milk 4 Pints")
+        assert index.resolve(conn.cursor(), 1, "MILK WHOLE") == milk
+        assert index.resolve(conn.cursor(), 1, "Bananas") != milk
+        # Products are never shared between users
+        assert index.resolve(conn.cursor(), 2, "Whole Milk") != milk
+    assert index.lookup(conn.cursor(), 1, "whole milk") == milk
+    assert index.lookup(conn.cursor(), 1, "Sourdough Bread") is None
+
+
+def test_resolve_returns_the_product_of_a_concurrent_writer(database):
+    # Another writer registers the same new name between the key lookup and
+    # the insert; both sides must end up with its product
+    index = ProductIndex()
+    other = sqlite3.connect(str(database.db_path), timeout=5)
+    try:
+        def racing_match(cursor, user_id, parsed):
+            with other:
+                winner = ProductIndex().resolve(other.cursor(), user_id, "Greek Yoghurt")
+            racing_match.winner = winner
+            return None
+
+        conn = database.get_connection()
+        with conn:
+            index._best_match = racing_match
+            product_id = index.resolve(conn.cursor(), 1, "Greek Yoghurt")
+    finally:
+        other.close()
+
+    assert product_id == racing_match.winner
+    assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 1
+
+
+def test_parse_quantity_converts_sizes_to_base_units():
+    assert parse_quantity("2 x 500g") == {"amount": 1.0, "unit": "kg"}
+    assert parse_quantity("750 ml") == {"amount": 0.75, "unit": "l"}
+    assert parse_quantity("3 pcs") == {"amount": 3.0, "unit": "pcs"}
+    # Counts of a sized item become the total size
+    assert parse_quantity("2", "Semi Skimmed Milk 4PT") == {"amount": 4.546088, "unit": "l"}
+
+
+def test_parse_quantity_falls_back_to_one_piece():
+    for quantity in (None, "", "a few", "0", "0 kg", "2 x 0g", "0.0001 g", "-1 kg", "-3"):
+        assert parse_quantity(quantity) == {"amount": 1.0, "unit": "pcs"}, quantity
+    # A zero pack size in the name is ignored rather than used
+    assert parse_quantity("3 pcs", "MILK 0PT") == {"amount": 3.0, "unit": "pcs"}
+
+
+def test_quantity_columns_never_divide_by_zero():
+    assert quantity_columns("0 kg", 2.5) == {"amount": 1.0, "unit": "pcs", "unit_price": 2.5}
+    assert quantity_columns("500g", 2.5) == {"amount": 0.5, "unit": "kg", "unit_price": 5.0}
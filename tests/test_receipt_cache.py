@@ -0,0 +1,56 @@
+import sqlite3
+
+import cv2
+import numpy as np
+
+from services.receipt_cache import ReceiptResultCache
+
+RESULT = {"items": [{"itemName": "Milk", "price": 1.5}], "store": "Tesco", "total": 1.5}
+
+
+def receipt_image(quality=95):
+    img = np.full((400, 300), 255, np.uint8)
+    for row in range(40, 360, 30):
+        cv2.putText(img, f"ITEM {row} 1.{row % 100:02d}", (20, row), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 0, 2)
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def test_exact_and_perceptual_hits_for_the_same_user(tmp_path):
+    cache = ReceiptResultCache(str(tmp_path / "cache.db"))
+    try:
+        cache.store_sync(receipt_image(), RESULT, user_id=1)
+        assert cache.lookup_sync(receipt_image(), 1)["cache_match"] == "exact"
+        # Re-encoded copy of the same photo
+        assert cache.lookup_sync(receipt_image(quality=70), 1)["cache_match"] == "perceptual"
+    finally:
+        cache.close()
+
+
+def test_users_never_see_each_others_results(tmp_path):
+    cache = ReceiptResultCache(str(tmp_path / "cache.db"))
+    try:
+        cache.store_sync(receipt_image(), RESULT, user_id=1)
+        assert cache.lookup_sync(receipt_image(), 2) is None
+        assert cache.lookup_sync(receipt_image(quality=70), 2) is None
+
+        # The same receipt scanned by both users is cached for each of them
+        cache.store_sync(receipt_image(), dict(RESULT, store="Aldi"), user_id=2)
+        assert cache.lookup_sync(receipt_image(), 1)["store"] == "Tesco"
+        assert cache.lookup_sync(receipt_image(), 2)["store"] == "Aldi"
+    finally:
+        cache.close()
+
+
+def test_unscoped_entries_from_older_versions_are_dropped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE receipt_cache (content_hash TEXT PRIMARY KEY, result TEXT NOT NULL)")
+    conn.execute("INSERT INTO receipt_cache VALUES ('abc', '{}')")
+    conn.commit()
+    conn.close()
+
+    cache = ReceiptResultCache(path)
+    try:
+        assert cache.stats()["entries"] == 0
+    finally:
+        cache.close()
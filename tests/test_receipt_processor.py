@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from services.receipt_processor import ReceiptProcessor
+
+
+@pytest.fixture
+def processor():
+    processor = ReceiptProcessor()
+    yield processor
+    asyncio.run(processor.close())
+
+
+def test_no_backend_skips_preprocessing(processor, monkeypatch):
+    async def fail(image_bytes):
+        raise AssertionError("preprocessing should be skipped")
+
+    processor.backends = []
+    monkeypatch.setattr(processor, "preprocess_image", fail)
+    result = asyncio.run(processor.process_receipt(b"not really an image"))
+    assert result["processing_method"] == "fallback"
+    assert result["error"] == "No receipt extraction backend is configured"
+
+
+def test_cached_results_are_scoped_to_the_scanning_user(processor, tmp_path):
+    from services.extraction_backends import ExtractionBackend
+    from services.receipt_cache import ReceiptResultCache
+
+    class FakeBackend(ExtractionBackend):
+        name = "fake"
+        calls = 0
+
+        async def extract(self, image_bytes):
+            FakeBackend.calls += 1
+            return {"items": [{"itemName": "Milk", "price": 1.5, "store": "Tesco"}], "store": "Tesco", "total": 1.5}
+
+    async def passthrough(image_bytes):
+        return bytes(image_bytes)
+
+    processor.backends = [FakeBackend()]
+    processor.preprocess_image = passthrough
+    processor.result_cache = ReceiptResultCache(str(tmp_path / "cache.db"))
+
+    assert "cache_match" not in asyncio.run(processor.process_receipt(b"receipt", user_id=1))
+    assert asyncio.run(processor.process_receipt(b"receipt", user_id=1))["cache_match"] == "exact"
+    assert "cache_match" not in asyncio.run(processor.process_receipt(b"receipt", user_id=2))
+    assert FakeBackend.calls == 2
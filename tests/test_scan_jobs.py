@@ -0,0 +1,27 @@
+import asyncio
+
+from services.scan_jobs import ScanJobManager
+
+
+class FakeProcessor:
+    async def process_pages(self, pages, user_id=None):
+        await asyncio.sleep(0.05)
+        return {"items": [], "store": "Tesco", "total": 0.0}
+
+
+def test_wait_for_tells_finished_from_timed_out_and_unknown(database):
+    async def scenario():
+        manager = ScanJobManager(FakeProcessor(), database, workers=1)
+        await manager.start()
+        try:
+            job = await manager.submit(1, "r.jpg", [b"img"], {"file_size": 3})
+            assert await manager.wait_for(job["id"], 0.001) is False
+            assert await manager.wait_for(job["id"], 5) is True
+            # Finished, or never run by this process: only the database knows
+            assert await manager.wait_for(job["id"], 5) is None
+            assert await manager.wait_for("other-process-job", 5) is None
+            return await database.get_scan_job(job["id"], 1)
+        finally:
+            await manager.stop()
+
+    assert asyncio.run(scenario())["status"] == "succeeded"
@@ -0,0 +1,59 @@
+from store_names import DEFAULT_STORE_ALIASES, UNKNOWN_STORE, StoreCanonicalizer, normalize_store_name
+
+
+def make_canonicalizer():
+    return StoreCanonicalizer(DEFAULT_STORE_ALIASES)
+
+
+def test_normalize_drops_branch_numbers_and_noise_words():
+    assert normalize_store_name("TESCO SUPERSTORE 2231") == "tesco"
+    assert normalize_store_name("Marks & Spencer") == "marks and spencer"
+
+
+def test_aliases_and_close_variants_resolve_to_the_canonical_name():
+    stores = make_canonicalizer()
+    assert stores.resolve("TESCO SUPERSTORE 2231") == "Tesco"
+    assert stores.resolve("J Sainsbury plc") == "Sainsbury's"
+    assert stores.resolve("Sainsburys Local") == "Sainsbury's"
+    assert stores.resolve("Morrisson") == "Morrisons"
+    assert stores.resolve("") == UNKNOWN_STORE
+
+
+def test_prefix_rule_folds_into_curated_stores():
+    assert make_canonicalizer().resolve("Quality Foods Wembley") == "Quality"
+
+
+def test_unknown_stores_are_tidied_but_never_merged():
+    stores = make_canonicalizer()
+    assert stores.resolve("GREEN") == "Green"
+    assert stores.resolve("Green Valley Market") == "Green Valley Market"
+    assert stores.resolve("GREEN VALLEY MARKET 12") == "Green Valley Market"
+    # A name saved once is no target for someone else's similar name
+    assert stores.resolve("Fresh Market") == "Fresh Market"
+    assert stores.resolve("Fresh Markets") == "Fresh Markets"
+    assert stores.stats()["canonical_stores"] == len({canonical for _, canonical in DEFAULT_STORE_ALIASES})
+
+
+def test_fingerprint_changes_with_the_aliases():
+    stores = make_canonicalizer()
+    before = stores.fingerprint()
+    assert make_canonicalizer().fingerprint() == before
+    stores.add_alias("tesco extra metro", "Tesco")
+    assert stores.fingerprint() == before
+    stores.add_alias("spar", "Spar")
+    assert stores.fingerprint() != before
+
+
+def test_startup_backfill_runs_once_per_rule_set(database):
+    import asyncio
+
+    with database.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO grocery_items (id, item_name, store, quantity, price, date, created_at, user_id) "
+            "VALUES ('a', 'Milk', 'TESCO EXTRA 12', '1 pcs', 1.0, '2025-01-01', '2025-01-01', 1)"
+        )
+
+    first = asyncio.run(database.backfill_store_names(force=False))
+    assert first["skipped"] is False and first["items_updated"] == 1
+    assert asyncio.run(database.backfill_store_names(force=False))["skipped"] is True
+    assert asyncio.run(database.backfill_store_names())["skipped"] is False
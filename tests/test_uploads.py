@@ -0,0 +1,62 @@
+import asyncio
+import io
+import mmap
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from services import uploads
+from services.image_pipeline import ImagePreprocessor
+
+
+def make_upload(content: bytes, filename: str) -> UploadFile:
+    return UploadFile(io.BytesIO(content), size=len(content), filename=filename, headers=Headers())
+
+
+def noisy_png(side: int) -> bytes:
+    image = np.random.default_rng(0).integers(0, 255, (side, side, 3), dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def test_large_image_pages_are_the_mapping_itself(monkeypatch, tmp_path):
+    content = noisy_png(800)
+    assert len(content) > 1024
+    monkeypatch.setattr(uploads, "UPLOAD_MMAP_THRESHOLD", 1024)
+    spool = open(tmp_path / "spool", "w+b")
+    spool.write(content)
+    spool.seek(0)
+    upload_file = UploadFile(spool, size=len(content), filename="receipt.png", headers=Headers())
+
+    upload = asyncio.run(uploads.receive_upload(upload_file, 10 * 1024 * 1024, ["png"]))
+    pages = asyncio.run(uploads.upload_pages(upload))
+    assert isinstance(upload.buffer, mmap.mmap)
+    assert pages == [upload.buffer]
+
+    # The worker process gets the mapped content intact
+    preprocessor = ImagePreprocessor(workers=1)
+    try:
+        prepared, sizes = asyncio.run(preprocessor.prepare(pages[0]))
+    finally:
+        preprocessor.close()
+    assert sizes["input_bytes"] == len(content)
+    assert prepared[:3] == b"\xff\xd8\xff"
+
+
+def test_small_upload_is_held_as_bytes():
+    upload = asyncio.run(uploads.receive_upload(make_upload(noisy_png(8), "r.png"), 1024 * 1024, ["png"]))
+    assert asyncio.run(uploads.upload_pages(upload)) == [upload.buffer]
+    assert isinstance(upload.buffer, bytes)
+
+
+def test_format_is_sniffed_not_taken_from_the_name():
+    with pytest.raises(uploads.UnsupportedUploadError):
+        asyncio.run(uploads.receive_upload(make_upload(b"GIF89a....", "receipt.png"), 1024, ["png", "jpg"]))
+
+
+def test_pdf_without_pdfium_is_format_unavailable(monkeypatch):
+    monkeypatch.setattr(uploads, "pdfium", None)
+    with pytest.raises(uploads.FormatUnavailableError):
+        asyncio.run(uploads.receive_upload(make_upload(b"%PDF-1.7\n...", "receipt.pdf"), 1024, ["pdf"]))